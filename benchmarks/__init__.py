@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the NowTrade simulation engine.
+
+Run them from the repository root with: python -m benchmarks.run --help
+"""
@@ -0,0 +1,179 @@
+"""
+Runs the example strategies on synthetic OHLCV data and reports the number
+of bars simulated per second and the peak memory of every run, compared
+against a stored baseline.
+
+    python -m benchmarks.run --save
+    python -m benchmarks.run
+
+Every run happens in its own process so the peak memory of a run is not
+affected by the previous ones.  By default the runs of more than EVENT_BARS
+bars (of all symbols) are simulated in vectorized mode, event mode being
+too slow for them; use --mode to force one.  The baseline is not committed
+as it depends on the machine: store one with --save before comparing.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import multiprocessing
+import pandas as pd
+from nowtrade import symbol_list, dataset, strategy
+from nowtrade.data_connection import SyntheticConnection
+from benchmarks.strategies import STRATEGIES
+
+BARS = [1000, 10000, 100000]
+SYMBOLS = [1, 10]
+AUTO = 'auto'
+EVENT_BARS = 10000 # Largest run simulated in event mode by AUTO
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+class MissingBaseline(Exception):
+    """
+    Exception used when there is no baseline to compare the results with.
+    """
+    pass
+
+def benchmark(name, bars, symbols, mode=strategy.EVENT, seed=0):
+    """
+    Simulates the strategy name on bars synthetic bars for every one of the
+    symbols and returns the number of bars (of all symbols) simulated per
+    second, the simulation time and the peak memory (MB) of the process.
+    """
+    names = ['SYM%s' %number for number in range(symbols)]
+    data = dataset.Dataset(symbol_list.SymbolList(names),
+                           SyntheticConnection(bars, seed), None, None, 0)
+    data.load_data()
+    strat = STRATEGIES[name](data)
+    start = time.time()
+    strat.simulate(mode)
+    seconds = time.time() - start
+    return {'bars_per_second': bars * symbols / seconds,
+            'seconds': seconds,
+            'peak_memory': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+
+def _benchmark(args):
+    """
+    Pool helper unpacking the benchmark arguments.
+    """
+    return benchmark(*args)
+
+def run_mode(bars, symbols, mode=AUTO):
+    """
+    The simulation mode of a run: event mode up to EVENT_BARS bars (of all
+    symbols) and vectorized mode above when mode is AUTO.
+    """
+    if mode != AUTO:
+        return mode
+    return strategy.EVENT if bars * symbols <= EVENT_BARS else strategy.VECTORIZED
+
+def run(names, bars_list, symbols_list, mode=AUTO, seed=0):
+    """
+    Runs every combination of strategy, number of bars and number of
+    symbols, each one in a new process.
+    @rtype: dict
+    @return: Results keyed by name-bars-symbols-mode.
+    """
+    results = {}
+    for name in names:
+        for bars in bars_list:
+            for symbols in symbols_list:
+                simulation_mode = run_mode(bars, symbols, mode)
+                run_key = key(name, bars, symbols, simulation_mode)
+                pool = multiprocessing.Pool(1, maxtasksperchild=1)
+                try:
+                    result = pool.apply(_benchmark, ((name, bars, symbols, simulation_mode,
+                                                      seed),))
+                finally:
+                    pool.terminate()
+                results[run_key] = result
+                print '%s: %.0f bars/s, %.1f MB' \
+                      %(run_key, result['bars_per_second'], result['peak_memory'])
+                sys.stdout.flush()
+    return results
+
+def key(name, bars, symbols, mode):
+    """
+    The baseline key of a run.
+    """
+    return '%s-%s-%s-%s' %(name, bars, symbols, mode)
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compares the results with the baseline.  A run is a regression when it
+    simulates fewer bars per second or uses more memory than its baseline
+    by more than tolerance (0.2 = 20%).
+    @rtype: pandas.DataFrame
+    """
+    rows = []
+    for run_key in sorted(results):
+        result = results[run_key]
+        base = baseline.get(run_key)
+        row = {'run': run_key, 'bars_per_second': result['bars_per_second'],
+               'peak_memory': result['peak_memory'], 'speed': None,
+               'memory': None, 'regression': False}
+        if base:
+            row['speed'] = result['bars_per_second'] / base['bars_per_second']
+            row['memory'] = result['peak_memory'] / base['peak_memory']
+            row['regression'] = row['speed'] < 1 - tolerance or \
+                                row['memory'] > 1 + tolerance
+        rows.append(row)
+    return pd.DataFrame(rows, columns=['run', 'bars_per_second', 'peak_memory',
+                                       'speed', 'memory', 'regression']).set_index('run')
+
+def load_baseline(filename=BASELINE):
+    """
+    Returns the stored baseline.  Raises MissingBaseline when there is none.
+    """
+    if not os.path.exists(filename):
+        raise MissingBaseline('No baseline at %s, store one with --save' %filename)
+    with open(filename) as baseline_file:
+        return json.load(baseline_file)
+
+def save_baseline(results, filename=BASELINE):
+    """
+    Stores the results as the new baseline, keeping the runs not redone.
+    """
+    try:
+        baseline = load_baseline(filename)
+    except MissingBaseline:
+        baseline = {}
+    baseline.update(results)
+    with open(filename, 'w') as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+
+def main(argv=None):
+    """
+    Command line entry point.  Returns 1 when a regression is found.
+    """
+    parser = argparse.ArgumentParser(description='NowTrade simulation benchmarks')
+    parser.add_argument('--strategies', nargs='+', default=sorted(STRATEGIES),
+                        choices=sorted(STRATEGIES))
+    parser.add_argument('--bars', nargs='+', type=int, default=BARS)
+    parser.add_argument('--symbols', nargs='+', type=int, default=SYMBOLS)
+    parser.add_argument('--mode', default=AUTO,
+                        choices=[AUTO, strategy.EVENT, strategy.VECTORIZED])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save', action='store_true',
+                        help='Store the results as the new baseline')
+    args = parser.parse_args(argv)
+    try:
+        baseline = load_baseline(args.baseline)
+    except MissingBaseline, error:
+        if not args.save:
+            parser.error(str(error))
+        baseline = {}
+    results = run(args.strategies, args.bars, args.symbols, args.mode, args.seed)
+    table = compare(results, baseline, args.tolerance)
+    print table.to_string()
+    if args.save:
+        save_baseline(results, args.baseline)
+        return 0
+    return 1 if table['regression'].any() else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+The example strategies (see examples/) rebuilt for every symbol of a dataset
+so they can be benchmarked on synthetic data.
+"""
+from nowtrade import technical_indicator, criteria, criteria_group, \
+                     trading_profile, trading_amount, trading_fee, strategy
+from nowtrade.action import Long, Short, LongExit, ShortExit
+
+def _trading_profile():
+    """
+    Trading profile shared by all the benchmark strategies.
+    """
+    return trading_profile.TradingProfile(100000, trading_amount.StaticAmount(1000),
+                                          trading_fee.StaticFee(5))
+
+def crossover(data):
+    """
+    SMA 50/100 crossover with a 5% trailing stop (examples/crossover.py).
+    """
+    groups = []
+    for symbol in data.symbol_list:
+        sma50 = technical_indicator.SMA(symbol.close, 50)
+        sma100 = technical_indicator.SMA(symbol.close, 100)
+        data.add_technical_indicator(sma50)
+        data.add_technical_indicator(sma100)
+        groups.append(criteria_group.CriteriaGroup([criteria.CrossingAbove(sma50, sma100)],
+                                                   Long(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.TrailingStop(symbol, 0.05,
+                                                                          percent=True)],
+                                                   LongExit(), symbol))
+    return strategy.Strategy(data, groups, _trading_profile())
+
+def rsi(data):
+    """
+    RSI 28 with the SMA 100 slope, stop loss and take profit
+    (examples/rsi_strategy.py).
+    """
+    groups = []
+    for symbol in data.symbol_list:
+        rsi28 = technical_indicator.RSI(symbol.close, 28)
+        sma100 = technical_indicator.SMA(symbol.close, 100)
+        sma100_previous = technical_indicator.Shift(sma100.value, 1)
+        data.add_technical_indicator(rsi28)
+        data.add_technical_indicator(sma100)
+        data.add_technical_indicator(sma100_previous)
+        groups.append(criteria_group.CriteriaGroup([criteria.Above(rsi28.value, 60),
+                                                    criteria.Above(sma100.value,
+                                                                   sma100_previous.value)],
+                                                   Long(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.Below(rsi28.value, 40),
+                                                    criteria.Below(sma100.value,
+                                                                   sma100_previous.value)],
+                                                   Short(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.StopLoss(symbol, 0.01,
+                                                                      percent=True)],
+                                                   LongExit(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.TakeProfit(symbol, 50)],
+                                                   LongExit(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.StopLoss(symbol, 0.01, short=True,
+                                                                      percent=True)],
+                                                   ShortExit(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.TakeProfit(symbol, 50, short=True)],
+                                                   ShortExit(), symbol))
+    return strategy.Strategy(data, groups, _trading_profile())
+
+def adx(data):
+    """
+    ADX 28 with directional indicators and a 10 bar exit (examples/adx.py).
+    """
+    groups = []
+    for symbol in data.symbol_list:
+        adx28 = technical_indicator.ADX(symbol, 28)
+        data.add_technical_indicator(adx28)
+        groups.append(criteria_group.CriteriaGroup([criteria.Above(adx28.value, 30),
+                                                    criteria.Above(adx28.minus_di, 30),
+                                                    criteria.Below(adx28.plus_di, 20)],
+                                                   Long(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.BarsSinceLong(symbol, 10)],
+                                                   LongExit(), symbol))
+    return strategy.Strategy(data, groups, _trading_profile())
+
+def double7(data):
+    """
+    Double 7 with the SMA 100 trend filter (examples/double7.py).
+    """
+    groups = []
+    for symbol in data.symbol_list:
+        sma100 = technical_indicator.SMA(symbol.close, 100)
+        high7 = technical_indicator.Max(symbol.close, 7)
+        low7 = technical_indicator.Min(symbol.close, 7)
+        data.add_technical_indicator(sma100)
+        data.add_technical_indicator(high7)
+        data.add_technical_indicator(low7)
+        groups.append(criteria_group.CriteriaGroup([criteria.Above(symbol.close, sma100.value),
+                                                    criteria.Equals(symbol.close, low7.value)],
+                                                   Long(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.Below(symbol.close, sma100.value),
+                                                    criteria.Equals(symbol.close, high7.value)],
+                                                   Short(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.StopLoss(symbol, 5)],
+                                                   LongExit(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.TakeProfit(symbol, 10)],
+                                                   LongExit(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.StopLoss(symbol, 5, short=True)],
+                                                   ShortExit(), symbol))
+        groups.append(criteria_group.CriteriaGroup([criteria.TakeProfit(symbol, 10, short=True)],
+                                                   ShortExit(), symbol))
+    return strategy.Strategy(data, groups, _trading_profile())
+
+STRATEGIES = {'crossover': crossover, 'rsi': rsi, 'adx': adx, 'double7': double7}
@@ -9,6 +9,8 @@ start = datetime.datetime(1980, 01, 01)
 end = datetime.datetime(2015, 01, 01)
 d = dataset.Dataset(sl, dc, start, end)
 d.load_data()
+# Calendar criteria compare these columns instead of converting every datetime
+d.add_calendar_features()
 # Go Long in November , Exit in May, every year.
 enter_crit = criteria.IsMonth(11)
 exit_crit = criteria.IsMonth(5)
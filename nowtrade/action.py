@@ -16,6 +16,36 @@ ACTIONS_MAP = {1: 'LONG',
                -1: 'LONG_EXIT',
                -2: 'SHORT_EXIT'}
 
+def determine_action(values):
+    """
+    Returns the action to take given the actions of several criteria
+    groups, handling conflicting actions.  Exits take precedence over
+    entries and opposite actions cancel each other.
+    """
+    if LONG in values and SHORT in values or \
+       LONG_EXIT in values and SHORT_EXIT in values:
+        return NO_ACTION
+    if LONG_EXIT in values:
+        return LONG_EXIT
+    if SHORT_EXIT in values:
+        return SHORT_EXIT
+    if LONG in values:
+        return LONG
+    if SHORT in values:
+        return SHORT
+    return NO_ACTION
+
+def status_change(action):
+    """
+    Returns how an action changes a symbol's status.
+    """
+    # Replace SHORT with -1 and SHORT_EXIT with 1
+    if action == SHORT:
+        return -1
+    elif action == SHORT_EXIT:
+        return 1
+    return action
+
 class Action(object):
     """
     Abstract Action object represents an action to be taken in the market.
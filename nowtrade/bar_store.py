@@ -0,0 +1,326 @@
+"""
+The bar store module keeps the realtime data of a running strategy in
+preallocated numpy arrays instead of a pandas DataFrame that gets rebuilt
+on every new bar.
+"""
+import numpy as np
+import pandas as pd
+from nowtrade import logger
+
+class BarStore(object):
+    """
+    Holds one typed numpy array per column along with the index of every bar.
+    The arrays are preallocated and grow geometrically when full, which
+    makes appending a bar an amortized O(1) operation.
+
+    Rows live between the start and end cursors of the arrays.  New bars are
+    written at the end cursor.
+
+    When max_bars is specified, only the last max_bars bars are kept.  The
+    arrays then hold twice that many bars and the kept bars are moved back
+    to the front once the end is reached, so memory and the cost of
+    appending a bar stay constant.
+
+    Bars missing from a column hold NaN (None for objects) like
+    combine_first(), integer columns are converted to floats to hold them,
+    unless the column was added with an explicit fill value.
+    """
+    def __init__(self, capacity=1024, growth=2, max_bars=None):
+        if max_bars is not None:
+            capacity = 2 * max_bars
+        self.capacity = capacity
+        self.growth = growth
+        self.max_bars = max_bars
+        self.start = 0
+        self.end = 0
+        self.columns = {}
+        self.column_names = []
+        self.fills = {} # Explicit fill value of the columns, see add_column()
+        self.index = None
+        self.index_name = None
+        self.timezone = None
+        self.logger = logger.Logger(self.__class__.__name__)
+    def __str__(self):
+        return 'BarStore(capacity=%s, growth=%s, max_bars=%s)' \
+                %(self.capacity, self.growth, self.max_bars)
+    def __repr__(self):
+        return 'BarStore(capacity=%s, growth=%s, max_bars=%s)' \
+                %(self.capacity, self.growth, self.max_bars)
+    def __len__(self):
+        return self.end - self.start
+    def __contains__(self, column):
+        return column in self.columns
+
+    def is_empty(self):
+        """
+        Returns True when no bar is stored.
+        """
+        return self.end == self.start
+
+    def add_column(self, column, dtype=np.float64, fill=None):
+        """
+        Adds a new typed column to the store.  Existing bars, and the bars
+        appended later without a value for the column, are set to fill.
+        Without fill they are missing: an integer column is then stored as
+        floats when there are existing bars (see _missing()).
+        """
+        if column in self.columns:
+            return
+        if fill is None:
+            if np.dtype(dtype).kind in 'biu' and not self.is_empty():
+                dtype = np.float64
+            fill = _missing(np.dtype(dtype))
+        else:
+            self.fills[column] = fill
+        self.columns[column] = np.empty(self.capacity, dtype=dtype)
+        self.columns[column][self.start:self.end] = fill
+        self.column_names.append(column)
+
+    def get(self, column, position=-1):
+        """
+        Returns the value of a column for the bar at position.  Negative
+        positions are relative to the last bar.
+        """
+        return self.columns[column][self._position(position)]
+
+    def set(self, column, value, position=-1):
+        """
+        Sets the value of a column for the bar at position.  Negative
+        positions are relative to the last bar.
+        """
+        self.columns[column][self._position(position)] = value
+
+    def set_values(self, column, values):
+        """
+        Sets the values of a column for every bar stored.
+        """
+        self.columns[column][self.start:self.end] = values
+
+    def get_index(self, position=-1):
+        """
+        Returns the index value (usually a Timestamp) of the bar at position.
+        """
+        value = self.index[self._position(position)]
+        if self.index.dtype.kind != 'M':
+            return value
+        timestamp = pd.Timestamp(value)
+        if self.timezone is not None:
+            timestamp = timestamp.tz_localize('UTC').tz_convert(self.timezone)
+        return timestamp
+
+    def merge(self, data_frame):
+        """
+        Same as combine_first() with the data_frame provided.  New bars are
+        appended after the last one, bars that are already stored only have
+        their missing (NaN) values filled.
+        """
+        if data_frame.empty:
+            return
+        if not data_frame.index.is_monotonic_increasing:
+            data_frame = data_frame.sort_index()
+        if self.index is None:
+            self._create_index(data_frame.index)
+        for column in data_frame.columns:
+            if column not in self.columns:
+                self.add_column(column, _column_dtype(data_frame[column]))
+        keys = _index_values(data_frame.index)
+        split = 0
+        if self.end > self.start:
+            split = np.searchsorted(keys, self.index[self.end - 1], side='right')
+        for row in range(split):
+            self._combine_row(keys[row], data_frame, row)
+        self._append(keys[split:], data_frame[split:])
+
+    def tail(self, bars=None):
+        """
+        Returns a DataFrame holding a copy of the last bars stored, or all
+        of them when bars is None.  Changes to the DataFrame do not affect
+        the store.
+        """
+        if self.index is None:
+            return pd.DataFrame()
+        start = self.start
+        if bars is not None:
+            start = max(self.start, self.end - bars)
+        data = dict((column, self.columns[column][start:self.end]) \
+                    for column in self.column_names)
+        return pd.DataFrame(data, index=self._make_index(start, self.end),
+                            columns=self.column_names)
+
+    def data_frame(self):
+        """
+        Returns a DataFrame holding a copy of every bar stored.
+        """
+        return self.tail()
+
+    def share(self):
+        """
+        Returns a new store holding read-only views of the bars and columns
+        of this one.  Columns added to the new store are its own, which
+        lets several strategies share the same market data.  No new data
+        should be merged into the new store.
+        """
+        shared = BarStore(self.capacity, self.growth)
+        shared.max_bars = self.max_bars
+        shared.start = self.start
+        shared.end = self.end
+        shared.index_name = self.index_name
+        shared.timezone = self.timezone
+        if self.index is not None:
+            shared.index = _read_only(self.index)
+        for column in self.column_names:
+            shared.columns[column] = _read_only(self.columns[column])
+        shared.column_names = list(self.column_names)
+        shared.fills = dict(self.fills)
+        return shared
+
+    def _position(self, position):
+        """
+        Converts a relative position to an array position.
+        """
+        if position < 0:
+            return self.end + position
+        return self.start + position
+
+    def _create_index(self, index):
+        """
+        Creates the index array based on the type of the first index merged.
+        """
+        self.index_name = index.name
+        if isinstance(index, pd.DatetimeIndex):
+            self.timezone = index.tz
+            self.index = np.empty(self.capacity, dtype='datetime64[ns]')
+        else:
+            self.index = np.empty(self.capacity, dtype=index.dtype)
+
+    def _make_index(self, start, end):
+        """
+        Builds a pandas Index out of the index array between start and end.
+        """
+        values = self.index[start:end]
+        if values.dtype.kind == 'M':
+            index = pd.DatetimeIndex(values, name=self.index_name)
+            if self.timezone is not None:
+                index = index.tz_localize('UTC').tz_convert(self.timezone)
+            return index
+        return pd.Index(values, name=self.index_name)
+
+    def _reserve(self, bars):
+        """
+        Makes sure there is enough room to append bars.  Moves the bars back
+        to the front of the arrays when possible, otherwise grows the arrays
+        geometrically.
+        """
+        if self.end + bars <= self.capacity:
+            return
+        length = len(self)
+        capacity = self.capacity
+        if length + bars > capacity:
+            capacity = max(self.capacity * self.growth, length + bars)
+            self.logger.debug('Growing from %s to %s bars' %(self.capacity, capacity))
+        for column in self.column_names:
+            self.columns[column] = _resize(self.columns[column], self.start, self.end, capacity)
+        self.index = _resize(self.index, self.start, self.end, capacity)
+        self.capacity = capacity
+        self.start = 0
+        self.end = length
+
+    def _append(self, keys, data_frame):
+        """
+        Appends the bars of data_frame after the last bar stored.
+        """
+        bars = len(keys)
+        if bars == 0:
+            return
+        self._reserve(bars)
+        for column in self.column_names:
+            if column in data_frame:
+                values = data_frame[column].values
+                if self.columns[column].dtype.kind in 'biu' and values.dtype.kind not in 'biu':
+                    self._upcast(column)
+                self.columns[column][self.end:self.end + bars] = values
+            elif column in self.fills:
+                self.columns[column][self.end:self.end + bars] = self.fills[column]
+            else:
+                if self.columns[column].dtype.kind in 'biu':
+                    self._upcast(column)
+                self.columns[column][self.end:self.end + bars] = \
+                    _missing(self.columns[column].dtype)
+        self.index[self.end:self.end + bars] = keys
+        self.end += bars
+        if self.max_bars is not None and len(self) > self.max_bars:
+            self.start = self.end - self.max_bars
+
+    def _combine_row(self, key, data_frame, row):
+        """
+        Fills the missing values of an existing bar with the values of row.
+        Bars older than the last bar that are not stored yet require the
+        whole store to be rebuilt.
+        """
+        position = self.start + np.searchsorted(self.index[self.start:self.end], key)
+        if position == self.start and self.max_bars is not None \
+           and len(self) == self.max_bars and self.index[position] != key:
+            return # Older than every bar kept
+        if position == self.end or self.index[position] != key:
+            self.logger.debug('Rebuilding store to insert bar %s' %key)
+            combined = self.data_frame().combine_first(data_frame[row:row + 1])
+            fills = self.fills
+            self.__init__(max(self.capacity, len(combined)), self.growth, self.max_bars)
+            self.fills = fills
+            self.merge(combined)
+            return
+        for column in data_frame.columns:
+            current = self.columns[column][position]
+            if current != current: # NaN
+                self.columns[column][position] = data_frame[column].values[row]
+
+    def _upcast(self, column):
+        """
+        Converts an integer (or boolean) column to floats so that it can
+        hold NaN values.
+        """
+        self.columns[column] = self.columns[column].astype(np.float64)
+
+def _index_values(index):
+    """
+    Returns the raw numpy values of an index (UTC for timezone aware indexes).
+    """
+    return np.asarray(index.values)
+
+def _column_dtype(series):
+    """
+    Returns the numpy dtype used to store a pandas Series.
+    Numbers keep their type, everything else is stored as objects.
+    """
+    if series.dtype.kind in 'iuf':
+        return series.dtype
+    try:
+        series.values.astype(np.float64)
+        return np.float64
+    except (TypeError, ValueError):
+        return object
+
+def _missing(dtype):
+    """
+    Returns the value used for bars missing from a column of dtype, which
+    cannot be an integer dtype.
+    """
+    if dtype.kind in 'fc':
+        return np.nan
+    return None
+
+def _read_only(values):
+    """
+    Returns a read-only view of an array.
+    """
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+def _resize(values, start, end, capacity):
+    """
+    Returns a new array of the specified capacity holding values[start:end].
+    """
+    resized = np.empty(capacity, dtype=values.dtype)
+    resized[:end - start] = values[start:end]
+    return resized
@@ -1,9 +1,13 @@
 """
 Module used to define strategy enter/exit criteria.
 """
+# pylint: disable=too-many-lines
+from collections import deque
 import numpy as np
+import pandas as pd
 from nowtrade import logger
-from nowtrade.action import Long, Short, LongExit, ShortExit
+from nowtrade.dataset import YEAR, MONTH, DAY, WEEKDAY
+from nowtrade.action import Long, Short, LongExit, ShortExit, LONG, SHORT
 from nowtrade.technical_indicator import TechnicalIndicator
 
 class Criteria(object):
@@ -12,17 +16,134 @@ class Criteria(object):
     All criteria must have a num_bars_required variable that corresponds
     to the number of bars it requires to provide a valid bool value.
     The apply function of all criteria must return a single boolean value.
+
+    Criteria that depend on the strategy's own ACTIONS/STATUS/PL/CHANGE
+    columns must set path_dependent to True.  Those columns only exist once
+    the strategy has decided what to do on every previous bar.
+
+    Criteria groups stop applying criteria at the first False and order
+    them by cost and rejection rate.  Criteria that update their own state
+    in apply() (IE: TrailingStop) must set stateful to True so they are
+    applied on every bar regardless, and forget that state in reset().  The cost is the relative cost of
+    apply() used to order criteria until their actual cost is measured.
     """
     def __init__(self):
         self.logger = logger.Logger(self.__class__.__name__)
         # Some TIs don't require the entire data_frame history.
         self.num_bars_required = None # Requires all history by default
+        self.path_dependent = False
+        self.stateful = False
+        self.cost = 2
+    def apply(self, data_frame):
+        """
+        This needs to be implemented for all criteria.
+        @return bool The criteria status on the last bar of the data_frame
+        """
+        pass
+    def reset(self):
+        """
+        Forgets the state of a stateful criteria.  Called by the strategy
+        before every simulation, see Strategy.simulate().
+        """
+        pass
+    def evaluate_all(self, data_frame):
+        """
+        Evaluates the criteria on every bar of the data_frame provided.
+        Falls back on calling apply() once per bar with the same window the
+        strategy would supply.  Subclasses should override this with a
+        vectorized implementation whenever possible.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        results = np.zeros(len(data_frame), dtype=bool)
+        for i in range(len(data_frame)):
+            start = 0
+            if self.num_bars_required:
+                start = max(0, i + 1 - self.num_bars_required)
+            results[i] = bool(self.apply(data_frame[start:i + 1]))
+        return results
+    def key(self):
+        """
+        Identity of the criteria: its class and parameters.  Criteria with
+        the same key always give the same result on the same bars, so
+        criteria groups only apply them once per bar.
+        Stateful criteria are only identical to themselves.
+        """
+        if self.stateful:
+            return (self,)
+        return (self.__class__,) + tuple((name, _key(value)) \
+                                         for name, value in sorted(vars(self).items()) \
+                                         if name not in ('logger', 'cost'))
+
+def _key(value):
+    """
+    Hashable version of a criteria parameter.
+    """
+    if isinstance(value, Criteria):
+        return value.key()
+    if isinstance(value, (list, tuple)):
+        return tuple(_key(item) for item in value)
+    if value is None or isinstance(value, (bool, int, long, float, basestring)):
+        return value
+    return str(value)
+
+def _calendar_feature(data_frame, feature):
+    """
+    Returns the calendar feature (IE: YEAR) of every bar as a numpy array.
+    Uses the column calculated by Dataset.add_calendar_features() when
+    available and the datetime index of the bars otherwise.
+    """
+    try:
+        return np.asarray(data_frame[feature])
+    except KeyError:
+        return np.asarray(getattr(pd.DatetimeIndex(data_frame.index), feature.lower()))
+
+def _last_status(criteria, data_frame):
+    """
+    Returns the status of the criteria on the last bar of the data_frame.
+    The criteria is only applied on the last bars it requires, which keeps
+    the cost of criteria working on every bar they are given (IE: IsYear
+    without calendar feature columns) constant however long the data_frame.
+    """
+    if criteria.num_bars_required and len(data_frame) > criteria.num_bars_required:
+        data_frame = data_frame[-criteria.num_bars_required:]
+    status = np.asarray(criteria.apply(data_frame))
+    if status.ndim:
+        return bool(status[-1])
+    return bool(status)
+
+def _values(data_frame, param):
+    """
+    Returns the numpy values of a data_frame column or the value itself
+    if param is a number.
+    """
+    if isinstance(param, (int, long, float)):
+        return param
+    return data_frame[param].values
+
+def _lookback(results, lookback):
+    """
+    Shifts a boolean result array so that bar i holds the result of bar
+    i - lookback + 1.  The first lookback - 1 bars are always False.
+    """
+    if lookback <= 1:
+        return results
+    shifted = np.zeros(len(results), dtype=bool)
+    shifted[lookback - 1:] = results[:len(results) - lookback + 1]
+    return shifted
 
 class BarsSinceAction(Criteria):
     """
     Criteria for the number of bars that have passed since an particular
     action has occured.  Useful when strategies need to exit the market
     X bars after having entered.
+
+    The bars where the action occured within the last periods bars are
+    tracked as the bars come, so apply() only looks at the last bar and
+    must be applied on every bar (stateful).  evaluate_all() counts the bars
+    since the last occurence of the action for every bar at once.
+    The first bar applied after reset() goes through every bar of the
+    data_frame.  The vectorized simulation and StrategyBatch give every
+    strategy its own copy of the criteria.
     """
     def __init__(self, symbol, action, periods, condition=None):
         Criteria.__init__(self)
@@ -30,8 +151,14 @@ class BarsSinceAction(Criteria):
         self.action = action.raw()
         self.periods = periods
         self.condition = str(condition).upper()
-        self.num_bars_required = self.periods + 1
+        self.num_bars_required = 1
         self.label = 'BarsSinceAction_%s_%s_%s_%s' %(symbol, action, periods, condition)
+        self.path_dependent = True
+        self.stateful = True
+        self.bars = 0 # Bars seen so far
+        self.occurences = deque() # Bars of the last periods where the action occured
+        self.last_bar = None
+        self.result = False # Result on the last bar
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'BarsSinceAction(symbol=%s, action=%s, periods=%s, condition=%s)' \
@@ -41,20 +168,58 @@ class BarsSinceAction(Criteria):
     def apply(self, data_frame):
         """
         Apply the BarsSinceAction criteria to the data_frame provided.
+        The first call (or the first one after reset()) goes through every
+        bar of the data_frame, the following ones only through the last bar.
         @return Series(bool) The criteria status
         """
+        last_bar = data_frame.index[-1]
+        if isinstance(last_bar, np.datetime64):
+            last_bar = pd.Timestamp(last_bar)
+        if self.last_bar is not None and last_bar == self.last_bar:
+            return self.result # Already applied on this bar
+        actions = data_frame['ACTIONS_%s' %self.symbol]
+        if self.last_bar is None:
+            new_actions = np.asarray(actions)
+        else:
+            new_actions = np.asarray(actions[-1:])
+        for action in new_actions:
+            self.bars += 1
+            if action == self.action:
+                self.occurences.append(self.bars)
+        while self.occurences and self.bars - self.occurences[0] > self.periods:
+            self.occurences.popleft()
+        self.last_bar = last_bar
+        self.result = self._result()
+        return self.result
+    def reset(self):
+        self.bars = 0
+        self.occurences.clear()
+        self.last_bar = None
+        self.result = False
+    def _result(self):
+        """
+        Returns the criteria status from the action occurences.
+        """
         if self.condition == 'OVER':
-            values = data_frame['ACTIONS_%s' %self.symbol][-1-self.periods:].values
-            return self.action not in values
+            return not self.occurences
         elif self.condition == 'UNDER':
-            if self.periods < 1:
-                return False
-            values = data_frame['ACTIONS_%s' %self.symbol][-self.periods:].values
-            return self.action in values
-        else:
-            if len(data_frame['ACTIONS_%s' %self.symbol]) >= self.num_bars_required:
-                return self.action == data_frame['ACTIONS_%s' %self.symbol][-1-self.periods]
-            return False
+            return bool(self.occurences) and self.bars - self.occurences[-1] < self.periods
+        return bool(self.occurences) and self.bars - self.occurences[0] == self.periods
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        occured = np.asarray(data_frame['ACTIONS_%s' %self.symbol]) == self.action
+        if self.condition not in ('OVER', 'UNDER'):
+            return _lookback(occured, self.periods + 1)
+        # Bars where the action occured, preceded by one long before the first bar
+        occurences = np.concatenate(([-self.periods - 1], np.flatnonzero(occured)))
+        bars = np.arange(len(occured))
+        bars_since = bars - occurences[np.searchsorted(occurences, bars, side='right') - 1]
+        if self.condition == 'OVER':
+            return bars_since > self.periods
+        return bars_since < self.periods
 
 class BarsSinceLong(BarsSinceAction):
     """
@@ -107,6 +272,8 @@ class InMarket(Criteria):
         self.symbol = str(symbol)
         self.label = 'InMarket_%s' %symbol
         self.num_bars_required = 1
+        self.path_dependent = True
+        self.cost = 1
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'InMarket(symbol=%s)' %self.symbol
@@ -118,9 +285,14 @@ class InMarket(Criteria):
         @return Series(bool) The criteria status
         """
         try:
-            return data_frame['STATUS_%s' %self.symbol][-1] != 0
+            return self.holds(data_frame['STATUS_%s' %self.symbol][-1])
         except KeyError:
             return False
+    def holds(self, status):
+        """
+        Returns True when the status (see the STATUS column) is a position.
+        """
+        return status != 0
 
 class IsLong(Criteria):
     """
@@ -132,6 +304,8 @@ class IsLong(Criteria):
         self.symbol = str(symbol)
         self.label = 'IsLong_%s' %symbol
         self.num_bars_required = 1
+        self.path_dependent = True
+        self.cost = 1
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'IsLong(symbol=%s)' %self.symbol
@@ -143,9 +317,14 @@ class IsLong(Criteria):
         @return Series(bool) The criteria status
         """
         try:
-            return data_frame['STATUS_%s' %self.symbol][-1] > 0
+            return self.holds(data_frame['STATUS_%s' %self.symbol][-1])
         except KeyError:
             return False
+    def holds(self, status):
+        """
+        Returns True when the status (see the STATUS column) is a Long position.
+        """
+        return status > 0
 
 class IsShort(Criteria):
     """
@@ -157,6 +336,8 @@ class IsShort(Criteria):
         self.symbol = str(symbol)
         self.label = 'IsShort_%s' %symbol
         self.num_bars_required = 1
+        self.path_dependent = True
+        self.cost = 1
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'IsShort(symbol=%s)' %self.symbol
@@ -168,9 +349,14 @@ class IsShort(Criteria):
         @return Series(bool) The criteria status
         """
         try:
-            return data_frame['STATUS_%s' %self.symbol][-1] < 0
+            return self.holds(data_frame['STATUS_%s' %self.symbol][-1])
         except KeyError:
             return False
+    def holds(self, status):
+        """
+        Returns True when the status (see the STATUS column) is a Short position.
+        """
+        return status < 0
 
 class StopLoss(Criteria):
     """
@@ -186,6 +372,7 @@ class StopLoss(Criteria):
         self.percent = percent
         self.label = 'StopLoss_%s_%s_%s_%s' %(symbol, value, short, percent)
         self.num_bars_required = 1
+        self.path_dependent = True
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'StopLoss(symbol=%s, value=%s, short=%s, percent=%s)' \
@@ -201,6 +388,12 @@ class StopLoss(Criteria):
             check_value = data_frame['CHANGE_PERCENT_%s' %self.symbol][-1]
         else:
             check_value = data_frame['CHANGE_VALUE_%s' %self.symbol][-1]
+        return self.triggered(check_value)
+    def triggered(self, check_value):
+        """
+        Returns True when the change (value or percent) of the ongoing
+        trade, check_value, reaches the stop loss.
+        """
         if not np.isnan(check_value):
             if self.short:
                 return check_value >= self.value
@@ -221,6 +414,7 @@ class TakeProfit(Criteria):
         self.short = short
         self.label = 'TakeProfit_%s_%s_%s' %(symbol, value, short)
         self.num_bars_required = 1
+        self.path_dependent = True
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'TakeProfit(symbol=%s, value=%s, short=%s)' %(self.symbol, self.value, self.short)
@@ -231,7 +425,12 @@ class TakeProfit(Criteria):
         Apply the TakeProfit criteria to the data_frame provided.
         @return Series(bool) The criteria status
         """
-        check_value = data_frame['PL_%s' %self.symbol][-1]
+        return self.triggered(data_frame['PL_%s' %self.symbol][-1])
+    def triggered(self, check_value):
+        """
+        Returns True when the P/L of the ongoing trade, check_value,
+        reaches the take profit.
+        """
         if not np.isnan(check_value):
             if self.short:
                 return check_value <= -self.value
@@ -242,6 +441,9 @@ class TakeProfit(Criteria):
 class TrailingStop(Criteria):
     """
     Criteria used to apply a trailing stop exit rule to a strategy.
+
+    The stop starts over on the first bar of every trade (see new_stop()),
+    it only follows the trade it belongs to.
     """
     def __init__(self, symbol, value, short=False, percent=False):
         Criteria.__init__(self)
@@ -249,13 +451,12 @@ class TrailingStop(Criteria):
         self.value = abs(value)
         self.short = short
         self.percent = percent
-        # Keep track of the trailing stop.
-        if self.short:
-            self.stop = self.value
-        else:
-            self.stop = -self.value
+        # Keep track of the trailing stop of the ongoing trade.
+        self.stop = self.new_stop()
         self.label = 'TrailingStop_%s_%s_%s_%s' %(symbol, value, short, percent)
         self.num_bars_required = 1
+        self.path_dependent = True
+        self.stateful = True # Updates the stop on every bar
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'TrailingStop(symbol=%s, value=%s, short=%s, percent=%s)' \
@@ -267,26 +468,45 @@ class TrailingStop(Criteria):
         Apply the TrailingStop criteria to the data_frame provided.
         @return Series(bool) The criteria status
         """
+        if data_frame['ACTIONS_%s' %self.symbol][-1] in (LONG, SHORT): # New trade
+            self.stop = self.new_stop()
         if self.percent:
             current_value = data_frame['CHANGE_PERCENT_%s' %self.symbol][-1]
         else:
             current_value = data_frame['CHANGE_VALUE_%s' %self.symbol][-1]
+        triggered, self.stop = self.trail(self.stop, current_value)
+        return triggered
+    def reset(self):
+        self.stop = self.new_stop()
+    def new_stop(self):
+        """
+        Returns the stop on the first bar of a trade.
+        """
+        if self.short:
+            return self.value
+        return -self.value
+    def trail(self, stop, current_value):
+        """
+        Returns True when the change (value or percent) of the ongoing
+        trade, current_value, goes past the stop, along with the stop
+        updated to follow current_value.
+        """
         if not np.isnan(current_value):
             if self.short:
-                if current_value > self.stop:
-                    return True
+                if current_value > stop:
+                    return True, stop
                 else:
                     # Update the trailing stop if needed.
-                    if current_value + self.value < self.stop:
-                        self.stop = current_value + self.value
+                    if current_value + self.value < stop:
+                        stop = current_value + self.value
             else:
-                if current_value < self.stop:
-                    return True
+                if current_value < stop:
+                    return True, stop
                 else:
                     # Update the trailing stop if needed.
-                    if current_value - self.value > self.stop:
-                        self.stop = current_value - self.value
-        return False
+                    if current_value - self.value > stop:
+                        stop = current_value - self.value
+        return False, stop
 
 class IsYear(Criteria):
     """
@@ -311,7 +531,13 @@ class IsYear(Criteria):
         Apply the IsYear criteria to the data_frame provided.
         @return Series(bool) The criteria status
         """
-        return data_frame.index.year == self.year
+        return _calendar_feature(data_frame, YEAR) == self.year
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        return np.asarray(_calendar_feature(data_frame, YEAR) == self.year, dtype=bool)
 
 class IsMonth(Criteria):
     """
@@ -337,7 +563,13 @@ class IsMonth(Criteria):
         Apply the IsMonth criteria to the data_frame provided.
         @return Series(bool) The criteria status
         """
-        return data_frame.index.month == self.month
+        return _calendar_feature(data_frame, MONTH) == self.month
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        return np.asarray(_calendar_feature(data_frame, MONTH) == self.month, dtype=bool)
 
 class IsDay(Criteria):
     """
@@ -363,7 +595,13 @@ class IsDay(Criteria):
         Apply the IsDay criteria to the data_frame provided.
         @return Series(bool) The criteria status
         """
-        return data_frame.index.day == self.day
+        return _calendar_feature(data_frame, DAY) == self.day
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        return np.asarray(_calendar_feature(data_frame, DAY) == self.day, dtype=bool)
 
 class IsWeekDay(Criteria):
     """
@@ -389,7 +627,13 @@ class IsWeekDay(Criteria):
         Apply the IsWeekDay criteria to the data_frame provided.
         @return Series(bool) The criteria status
         """
-        return data_frame.index.weekday == self.weekday
+        return _calendar_feature(data_frame, WEEKDAY) == self.weekday
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        return np.asarray(_calendar_feature(data_frame, WEEKDAY) == self.weekday, dtype=bool)
 IsWeekday = IsWeekDay
 
 class Above(Criteria):
@@ -425,6 +669,14 @@ class Above(Criteria):
             return data_frame[self.param1][-self.lookback] > self.param2
         else:
             return data_frame[self.param1][-self.lookback] > data_frame[self.param2][-self.lookback]
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        with np.errstate(invalid='ignore'):
+            results = _values(data_frame, self.param1) > _values(data_frame, self.param2)
+        return _lookback(np.asarray(results, dtype=bool), self.lookback)
 
 class Below(Criteria):
     """
@@ -459,6 +711,14 @@ class Below(Criteria):
             return data_frame[self.param1][-self.lookback] < self.param2
         else:
             return data_frame[self.param1][-self.lookback] < data_frame[self.param2][-self.lookback]
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        with np.errstate(invalid='ignore'):
+            results = _values(data_frame, self.param1) < _values(data_frame, self.param2)
+        return _lookback(np.asarray(results, dtype=bool), self.lookback)
 
 class Equals(Criteria):
     """
@@ -495,6 +755,14 @@ class Equals(Criteria):
         else:
             return data_frame[self.param1][-self.lookback] == \
                    data_frame[self.param2][-self.lookback]
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        with np.errstate(invalid='ignore'):
+            results = _values(data_frame, self.param1) == _values(data_frame, self.param2)
+        return _lookback(np.asarray(results, dtype=bool), self.lookback)
 Equal = Equals
 
 class InRange(Criteria):
@@ -538,6 +806,16 @@ class InRange(Criteria):
             results = ((data_frame[self.technical_indicator] >= data_frame[self.min_range]) & \
                        (data_frame[self.technical_indicator] <= data_frame[self.max_range]))
         return results.iloc[-1]
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        values = data_frame[self.technical_indicator].values
+        with np.errstate(invalid='ignore'):
+            results = (values >= _values(data_frame, self.min_range)) & \
+                      (values <= _values(data_frame, self.max_range))
+        return np.asarray(results, dtype=bool)
 
 class Not(Criteria):
     """
@@ -548,6 +826,9 @@ class Not(Criteria):
         self.criteria = criteria
         self.label = 'Not_%s' %criteria
         self.num_bars_required = criteria.num_bars_required
+        self.path_dependent = criteria.path_dependent
+        self.stateful = criteria.stateful
+        self.cost = criteria.cost
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Not(criteria=%s)' %self.criteria
@@ -558,9 +839,200 @@ class Not(Criteria):
         Apply the Not criteria to the data_frame provided.
         @return Series(bool) The criteria status
         """
-        if not self.criteria.apply(data_frame):
+        if not _last_status(self.criteria, data_frame):
             return True
         return False
+    def reset(self):
+        self.criteria.reset()
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        return ~np.asarray(self.criteria.evaluate_all(data_frame), dtype=bool)
+
+class AnyOf(Criteria):
+    """
+    Criteria used to determine if at least minimum of several criteria are
+    True.  Nests with any other criteria, including And, Or and AnyOf.
+
+    apply() stops applying the criteria as soon as the result is known,
+    stateful criteria are always applied.  evaluate_all() adds up the
+    vectorized results of the criteria.
+    """
+    def __init__(self, criteria_list, minimum):
+        """
+        @type criteria_list: list
+        @type minimum: int
+        """
+        Criteria.__init__(self)
+        self.criteria_list = criteria_list
+        self.minimum = minimum
+        self.label = 'AnyOf_%s_%s' %(criteria_list, minimum)
+        bars_required = [criteria.num_bars_required for criteria in criteria_list]
+        self.num_bars_required = None if None in bars_required else max(bars_required)
+        self.path_dependent = any(criteria.path_dependent for criteria in criteria_list)
+        self.stateful = any(criteria.stateful for criteria in criteria_list)
+        self.cost = sum(criteria.cost for criteria in criteria_list)
+        # Stateful criteria first since they are always applied, then the cheapest
+        self.order = sorted(criteria_list, key=lambda criteria: (not criteria.stateful,
+                                                                 criteria.cost))
+        self.logger.info('Initialized - %s' %self)
+    def __str__(self):
+        return 'AnyOf(criteria_list=%s, minimum=%s)' %(self.criteria_list, self.minimum)
+    def __repr__(self):
+        return self.label
+    def apply(self, data_frame):
+        """
+        Apply the AnyOf criteria to the data_frame provided.
+        @return bool The criteria status
+        """
+        passed = 0
+        remaining = len(self.order)
+        for criteria in self.order:
+            if not criteria.stateful and \
+               (passed >= self.minimum or passed + remaining < self.minimum):
+                break
+            remaining -= 1
+            if _last_status(criteria, data_frame):
+                passed += 1
+        return passed >= self.minimum
+    def reset(self):
+        for criteria in self.criteria_list:
+            criteria.reset()
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        passed = np.zeros(len(data_frame), dtype=np.int64)
+        for criteria in self.criteria_list:
+            passed += np.asarray(criteria.evaluate_all(data_frame), dtype=bool)
+        return passed >= self.minimum
+
+class And(AnyOf):
+    """
+    Same as AnyOf, but every criteria must be True.
+    """
+    def __init__(self, criteria_list):
+        AnyOf.__init__(self, criteria_list, len(criteria_list))
+        self.label = 'And_%s' %criteria_list
+    def __str__(self):
+        return 'And(criteria_list=%s)' %self.criteria_list
+
+class Or(AnyOf):
+    """
+    Same as AnyOf, but any criteria must be True.
+    """
+    def __init__(self, criteria_list):
+        AnyOf.__init__(self, criteria_list, 1)
+        self.label = 'Or_%s' %criteria_list
+    def __str__(self):
+        return 'Or(criteria_list=%s)' %self.criteria_list
+
+class CountInLastBars(Criteria):
+    """
+    Criteria used to determine if another criteria was True on at least
+    minimum of the last periods bars (the current bar included).
+
+    The results of the criteria on the last periods bars are tracked as
+    the bars come, so apply() only applies the criteria on the last bar and
+    must be applied on every bar (stateful).  evaluate_all() counts them
+    with a cumulative sum.  Both cost the same whatever the periods.
+    The first bar applied after reset() rebuilds the results from the
+    bars of the data_frame, which always holds enough of them (see
+    num_bars_required).  The vectorized simulation and StrategyBatch give
+    every strategy its own copy of the criteria.
+    """
+    def __init__(self, criteria, periods, minimum):
+        """
+        @type criteria: Criteria
+        @type periods: int
+        @type minimum: int
+        """
+        Criteria.__init__(self)
+        self.criteria = criteria
+        self.periods = periods
+        self.minimum = minimum
+        self.label = 'CountInLastBars_%s_%s_%s' %(criteria, periods, minimum)
+        self.num_bars_required = None # Every bar required by the criteria
+        if criteria.num_bars_required:
+            self.num_bars_required = criteria.num_bars_required + periods - 1
+        self.path_dependent = criteria.path_dependent
+        self.stateful = True
+        self.cost = criteria.cost
+        self.results = deque(maxlen=periods) # Results on the last periods bars
+        self.count = 0 # True results on the last periods bars
+        self.last_bar = None
+        self.logger.info('Initialized - %s' %self)
+    def __str__(self):
+        return 'CountInLastBars(criteria=%s, periods=%s, minimum=%s)' \
+                %(self.criteria, self.periods, self.minimum)
+    def __repr__(self):
+        return self.label
+    def apply(self, data_frame):
+        """
+        Apply the CountInLastBars criteria to the data_frame provided.
+        The first call (or the first one after reset()) applies the
+        criteria on the last periods bars of the data_frame, the following
+        ones only on the last bar.
+        @return bool The criteria status
+        """
+        last_bar = data_frame.index[-1]
+        if isinstance(last_bar, np.datetime64):
+            last_bar = pd.Timestamp(last_bar)
+        if self.last_bar is not None and last_bar == self.last_bar:
+            return self.count >= self.minimum # Already applied on this bar
+        if self.last_bar is None:
+            for end in range(max(1, len(data_frame) - self.periods + 1), len(data_frame)):
+                self._add(_last_status(self.criteria, data_frame[:end]))
+        self._add(_last_status(self.criteria, data_frame))
+        self.last_bar = last_bar
+        return self.count >= self.minimum
+    def _add(self, result):
+        """
+        Keeps track of the criteria result on a new bar.
+        """
+        if len(self.results) == self.periods:
+            self.count -= self.results[0]
+        self.results.append(result)
+        self.count += result
+    def reset(self):
+        self.criteria.reset()
+        self.results.clear()
+        self.count = 0
+        self.last_bar = None
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        counts = np.cumsum(np.asarray(self.criteria.evaluate_all(data_frame), dtype=np.int64))
+        windows = counts.copy()
+        windows[self.periods:] -= counts[:-self.periods]
+        return windows >= self.minimum
+
+class ForBars(CountInLastBars):
+    """
+    Same as CountInLastBars, but the criteria must have been True on each
+    of the last periods bars.
+    """
+    def __init__(self, criteria, periods):
+        CountInLastBars.__init__(self, criteria, periods, periods)
+        self.label = 'ForBars_%s_%s' %(criteria, periods)
+    def __str__(self):
+        return 'ForBars(criteria=%s, periods=%s)' %(self.criteria, self.periods)
+
+class AnyOfLastBars(CountInLastBars):
+    """
+    Same as CountInLastBars, but the criteria must have been True on any
+    of the last periods bars.
+    """
+    def __init__(self, criteria, periods):
+        CountInLastBars.__init__(self, criteria, periods, 1)
+        self.label = 'AnyOfLastBars_%s_%s' %(criteria, periods)
+    def __str__(self):
+        return 'AnyOfLastBars(criteria=%s, periods=%s)' %(self.criteria, self.periods)
 
 class CrossingAbove(Criteria):
     """
@@ -602,6 +1074,22 @@ class CrossingAbove(Criteria):
             if value1_previous <= value2_previous and value1_now > value2_now:
                 return True
         return False
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        results = np.zeros(len(data_frame), dtype=bool)
+        value1 = data_frame[self.param1].values
+        value2 = _values(data_frame, self.param2)
+        if isinstance(value2, np.ndarray):
+            value2_previous = value2[:-1]
+            value2 = value2[1:]
+        else:
+            value2_previous = value2
+        with np.errstate(invalid='ignore'):
+            results[1:] = (value1[:-1] <= value2_previous) & (value1[1:] > value2)
+        return results
 
 class CrossingBelow(Criteria):
     """
@@ -643,3 +1131,19 @@ class CrossingBelow(Criteria):
             if value1_previous >= value2_previous and value1_now < value2_now:
                 return True
         return False
+    def evaluate_all(self, data_frame):
+        """
+        Vectorized version of apply() for every bar of the data_frame.
+        @return numpy.ndarray(bool) The criteria status for every bar
+        """
+        results = np.zeros(len(data_frame), dtype=bool)
+        value1 = data_frame[self.param1].values
+        value2 = _values(data_frame, self.param2)
+        if isinstance(value2, np.ndarray):
+            value2_previous = value2[:-1]
+            value2 = value2[1:]
+        else:
+            value2_previous = value2
+        with np.errstate(invalid='ignore'):
+            results[1:] = (value1[:-1] >= value2_previous) & (value1[1:] < value2)
+        return results
@@ -1,11 +1,16 @@
 """
 Criteria group module associates various criteria with corresponding actions.
 """
+import time
+import numpy as np
 from nowtrade.criteria import InMarket, IsLong, IsShort, Not
 from nowtrade.action import Long, LongExit, Short, ShortExit, \
                             LONG, LONG_EXIT, SHORT, SHORT_EXIT, NO_ACTION
 from nowtrade import logger
 
+# Number of results after which the criteria are ordered again
+REORDER_INTERVAL = 50
+
 class InvalidAction(Exception):
     """
     Exception raised when an invalid action is submitted to a criteria group.
@@ -37,6 +42,15 @@ class CriteriaGroup(object):
             self.criteria_list.append(IsShort(self.symbol))
             self._action = SHORT_EXIT
         else: raise InvalidAction()
+        # Criteria evaluation order and statistics, see get_result()
+        self._order = []
+        self._keys = []
+        self._times = []
+        self._timed_calls = []
+        self._calls = []
+        self._rejections = []
+        self._results = 0
+        self._cost_unit = 1.0
         self.logger = logger.Logger(self.__class__.__name__)
         self.logger.info('New Criteria Group - %s for %s (%s)' \
                          %(str(action).upper(), symbol, criteria_list))
@@ -48,19 +62,201 @@ class CriteriaGroup(object):
         return 'CriteriaGroup(criteria_list=%s, action=%s, symbol=%s)' \
                               %(self.criteria_list, self.action, self.symbol)
 
-    def get_result(self, data_frame):
+    def raw_action(self):
+        """
+        The raw (int) representation of this criteria group's action.
+        """
+        return self._action
+
+    def get_result(self, data_frame, profiler=None, cache=None, trace=None):
         """
         Get the results of this criteria group based on the data_frame
         provided. If all criteria are True, return the action.
+        Stops at the first criteria that is False, only the stateful
+        criteria are always applied.  The criteria are ordered by their
+        cost per rejection, starting with their declared cost and then
+        with the time and rejection rate measured every REORDER_INTERVAL
+        results, so cheap and selective criteria are applied first.
+        The criteria are only timed on the last result before they are
+        ordered again, or on every result when a profiler is given.
+        @type profiler: Profiler
+        @param profiler: Records the time spent applying every criteria.
+        @type cache: dict
+        @param cache: Results of the criteria already applied on the same
+        data_frame by other criteria groups, keyed by Criteria.key().  The
+        results of the criteria applied here are added to it.
+        @type trace: Trace
+        @param trace: Records the outcome of every criteria on the last bar.
+        """
+        if len(self._order) != len(self.criteria_list):
+            self._reset_order()
+        if trace is not None:
+            applied = [False] * len(self.criteria_list)
+            results = [False] * len(self.criteria_list)
+        timed = profiler is not None or (self._results + 1) % REORDER_INTERVAL == 0
+        debug = self.logger.debug_enabled()
+        passed = True
+        for position in self._order:
+            criteria = self.criteria_list[position]
+            if not passed and not criteria.stateful:
+                continue
+            if timed:
+                start = time.time()
+                result = self._cached(position, _apply, data_frame, profiler, cache)
+                self._times[position] += time.time() - start
+                self._timed_calls[position] += 1
+            else:
+                result = self._cached(position, _apply, data_frame, profiler, cache)
+            self._calls[position] += 1
+            if debug:
+                self.logger.debug('Criteria - %s: %s' %(criteria, result))
+            if trace is not None:
+                applied[position] = True
+                results[position] = bool(result)
+            if not result:
+                self._rejections[position] += 1
+                passed = False
+        if trace is not None:
+            trace.record(self, applied, results)
+        self._results += 1
+        if self._results % REORDER_INTERVAL == 0:
+            self._reorder()
+        if passed:
+            return self._action
+        return NO_ACTION
+
+    def _cached(self, position, function, data_frame, profiler, cache):
+        """
+        Returns the result of function (_apply or _evaluate_all) for the
+        criteria at position, from the cache when it holds the result of the
+        same criteria or of its negation.
+        """
+        key, negated_key = self._keys[position]
+        if cache is not None:
+            if key in cache:
+                return cache[key]
+            if negated_key in cache:
+                return _negate(cache[negated_key])
+        criteria = self.criteria_list[position]
+        if profiler is None:
+            result = function(criteria, data_frame)
+        else:
+            result = profiler.call((function.__name__.strip('_'), criteria),
+                                   function, criteria, data_frame)
+        if cache is not None:
+            cache[key] = result
+            if negated_key is not None:
+                cache[negated_key] = _negate(result)
+        return result
+
+    def _reset_order(self):
+        """
+        Orders the criteria by declared cost and forgets their statistics.
+        """
+        self._keys = [_keys(criteria) for criteria in self.criteria_list]
+        self._times = [0.0] * len(self.criteria_list)
+        self._timed_calls = [0] * len(self.criteria_list)
+        self._calls = [0] * len(self.criteria_list)
+        self._rejections = [0] * len(self.criteria_list)
+        self._cost_unit = 1.0
+        self._order = sorted(range(len(self.criteria_list)), key=self._rank)
+
+    def _reorder(self):
+        """
+        Orders the criteria by measured cost per rejection.  The declared
+        cost of criteria not applied yet is converted to seconds using the
+        time per declared cost of the criteria that were.
+        """
+        declared = sum(self._timed_calls[position] * self._declared_cost(position) \
+                       for position in self._order)
+        if declared:
+            self._cost_unit = sum(self._times) / declared
+        self._order.sort(key=self._rank)
+
+    def _declared_cost(self, position):
+        """
+        Declared cost of the criteria at position.
+        """
+        criteria = self.criteria_list[position]
+        if criteria.num_bars_required is None: # Whole history
+            return criteria.cost * 10
+        return criteria.cost
+
+    def _rank(self, position):
+        """
+        Sort key of the criteria at position: stateful criteria first since
+        they are always applied, then by cost per rejection.  The rejection
+        rate is smoothed so criteria rarely applied are not written off.
+        """
+        criteria = self.criteria_list[position]
+        if criteria.stateful:
+            return -1
+        calls = self._calls[position]
+        if self._timed_calls[position]:
+            cost = self._times[position] / self._timed_calls[position]
+        else:
+            cost = self._declared_cost(position) * self._cost_unit
+        return cost * (calls + 2.0) / (self._rejections[position] + 1.0)
+
+    def evaluate_all(self, data_frame, profiler=None, cache=None, trace=None):
+        """
+        Vectorized version of get_result() for every bar of the data_frame.
+        Only the criteria that are not path dependent can be evaluated ahead
+        of time, the path dependent ones still need to be applied on every
+        bar once the previous actions are known.
+        @type profiler: Profiler
+        @param profiler: Records the time spent evaluating every criteria.
+        @type cache: dict
+        @param cache: Same as get_result(), for the results of every bar.
+        @type trace: Trace
+        @param trace: Records the outcome of the criteria that are not path
+        dependent on every bar.
+        @return numpy.ndarray(bool) True for the bars where all the criteria
+        that are not path dependent are True
         """
-        results = []
-        for criteria in self.criteria_list:
-            result = None
-            if criteria.num_bars_required is not None:
-                result = criteria.apply(data_frame[-criteria.num_bars_required:])
-            else: result = criteria.apply(data_frame)
-            results.append(result)
-            self.logger.debug('Criteria - %s: %s' %(criteria, result))
-        if False in results:
-            return NO_ACTION
-        else: return self._action
+        if len(self._order) != len(self.criteria_list):
+            self._reset_order()
+        if trace is not None:
+            applied = np.zeros((len(data_frame), len(self.criteria_list)), dtype=bool)
+            passed = np.zeros((len(data_frame), len(self.criteria_list)), dtype=bool)
+        results = np.ones(len(data_frame), dtype=bool)
+        for position, criteria in enumerate(self.criteria_list):
+            if not criteria.path_dependent:
+                result = self._cached(position, _evaluate_all, data_frame, profiler, cache)
+                results &= result
+                if trace is not None:
+                    applied[:, position] = True
+                    passed[:, position] = result
+        if trace is not None:
+            trace.record_all(self, applied, passed)
+        return results
+
+def _apply(criteria, data_frame):
+    """
+    Applies the criteria to the bars of the data_frame it requires.
+    """
+    if criteria.num_bars_required is not None:
+        return criteria.apply(data_frame[-criteria.num_bars_required:])
+    return criteria.apply(data_frame)
+
+def _evaluate_all(criteria, data_frame):
+    """
+    Evaluates the criteria on every bar of the data_frame.
+    """
+    return criteria.evaluate_all(data_frame)
+
+def _keys(criteria):
+    """
+    Returns the key of the criteria and the key of the criteria it negates.
+    """
+    if isinstance(criteria, Not):
+        return criteria.key(), criteria.criteria.key()
+    return criteria.key(), None
+
+def _negate(result):
+    """
+    Negates a criteria result, a single value or an array of every bar.
+    """
+    if isinstance(result, np.ndarray):
+        return ~result.astype(bool)
+    return not result
@@ -4,9 +4,11 @@ Also makes it easy to store this data locally for future strategy testing.
 """
 import urllib2
 import zipfile
+import zlib
 import datetime
 from StringIO import StringIO
 import pandas_datareader.data as web
+import numpy as np
 import pandas as pd
 from pandas import read_csv
 from nowtrade import logger
@@ -383,6 +385,49 @@ class MongoDatabaseConnection(DataConnection):
                 values['_id'] = row[0]
                 self.database[symbol].insert(values)
 
+class SyntheticConnection(DataConnection):
+    """
+    Generates random walk OHLCV data.  Used for benchmarks and tests that
+    need more data than what can be stored in the repository.
+    The data of every symbol is seeded by the seed provided and the symbol
+    name so the same symbol always gets the same bars.
+    """
+    def __init__(self, bars=1000, seed=0, start=datetime.datetime(2000, 01, 03),
+                 freq='T', volatility=0.001):
+        DataConnection.__init__(self)
+        self.bars = bars
+        self.seed = seed
+        self.start = start
+        self.freq = freq
+        self.volatility = volatility
+    def __repr__(self):
+        return 'SyntheticConnection(bars=%s, seed=%s, start=%s, freq=%s, volatility=%s)' \
+                %(self.bars, self.seed, self.start, self.freq, self.volatility)
+
+    def get_data(self, symbol, start=None, end=None):
+        """
+        Returns a dataframe of self.bars bars for the symbol requested,
+        limited to the start and end datetimes if provided.
+        """
+        symbol = str(symbol).upper()
+        seed = (self.seed + zlib.crc32(symbol)) & 0xffffffff
+        random = np.random.RandomState(seed) # pylint: disable=no-member
+        close = 100 * np.exp(np.cumsum(random.normal(0, self.volatility, self.bars)))
+        open_ = np.empty(self.bars)
+        open_[0] = 100
+        open_[1:] = close[:-1]
+        open_ *= 1 + random.normal(0, self.volatility / 4, self.bars)
+        spread = np.abs(random.normal(0, self.volatility / 2, (2, self.bars)))
+        high = np.maximum(open_, close) * (1 + spread[0])
+        low = np.minimum(open_, close) * (1 - spread[1])
+        volume = random.randint(100000, 10000000, self.bars)
+        index = pd.date_range(self.start, periods=self.bars, freq=self.freq, name='Date')
+        ret = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close,
+                            'Volume': volume, 'Adj Close': close}, index=index,
+                           columns=['Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close'])
+        ret.rename(columns=lambda name: '%s_%s' %(symbol, name), inplace=True)
+        return ret[start:end]
+
 def populate_mongo_day(symbols, start, end, database='symbol-data'):
     """
     Helper function to populate a local mongo db with daily stock data.
@@ -2,9 +2,19 @@
 The dataset module uses a data connection to retrieve symbol data for strategy
 simulation.
 """
+import numpy as np
 import pandas as pd
 from nowtrade import logger
 
+# Calendar feature columns, see Dataset.add_calendar_features()
+YEAR = 'YEAR'
+MONTH = 'MONTH'
+DAY = 'DAY'
+WEEKDAY = 'WEEKDAY'
+MINUTE_OF_DAY = 'MINUTE_OF_DAY'
+SESSION = 'SESSION'
+CALENDAR_FEATURES = [YEAR, MONTH, DAY, WEEKDAY, MINUTE_OF_DAY, SESSION]
+
 class Dataset(object):
     """
     The Dataset object utilizes the pandas DataFrame as a backend for all
@@ -21,7 +31,13 @@ class Dataset(object):
         self.granularity = granularity
         self.data_connection = data_connection
         self.data_frame = pd.DataFrame()
-        self.technical_indicators = []
+        self.technical_indicators = [] # Distinct, dependencies first
+        # Technical indicators calculated, by key (see add_technical_indicator())
+        self.indicator_graph = {}
+        # Skip the calculation of technical indicators already in data_frame
+        self.reuse_technical_indicators = False
+        # IndicatorCache the technical indicators are loaded from when set
+        self.indicator_cache = None
         self.logger = logger.Logger(self.__class__.__name__)
         self.logger.info('symbol_list: %s  \
                           data_connection: %s  \
@@ -88,6 +104,9 @@ end_datetime=%s, periods=%s, granularity=%s)' \
         """
         assert len(self.data_frame) > 0, 'No data loaded yet'
         self.logger.info('Resampling data to %s' %timeframe)
+        # Calendar features are calculated again on the new bars
+        features = [feature for feature in CALENDAR_FEATURES if feature in self.data_frame]
+        self.data_frame = self.data_frame.drop(features, axis=1)
         if symbol:
             self._resample(timeframe, volume, adjusted_close, symbol)
         else: # Do all symbols in symbol list
@@ -95,6 +114,8 @@ end_datetime=%s, periods=%s, granularity=%s)' \
                 self._resample(timeframe, volume, adjusted_close, str(symbol))
             # Drop rows that have all NaN's
             self.data_frame = self.data_frame.dropna(how='all') # Only when ALL columns are NaN
+        if features:
+            self.add_calendar_features(MINUTE_OF_DAY in features)
         self.logger.debug('Resampling result: %s' %self.data_frame)
 
     def _resample(self, timeframe, volume, adjusted_close, symbol):
@@ -117,18 +138,159 @@ end_datetime=%s, periods=%s, granularity=%s)' \
         if adjusted_close:
             self.data_frame['%s_AdjClose' %symbol] = out['%s_AdjClose' %symbol]
 
+    def add_calendar_features(self, intraday=None):
+        """
+        Calculates the calendar features of every bar once from the index
+        of the data_frame: the YEAR, MONTH, DAY and WEEKDAY (0 is Monday)
+        columns, along with the MINUTE_OF_DAY and SESSION (days since
+        1970-01-01) columns for intraday data.
+        The calendar criteria (IsYear, IsMonth, IsDay, IsWeekDay) compare
+        these columns instead of converting the datetime of every bar.
+        @type intraday: bool
+        @param intraday: True to add the intraday features, None to add them
+        only when the bars are not all at midnight.
+        """
+        assert not self.data_frame.empty, 'No data loaded yet'
+        index = pd.DatetimeIndex(self.data_frame.index)
+        if index.tz is not None: # Local date and time of the bars
+            index = index.tz_localize(None)
+        minute_of_day = index.hour * 60 + index.minute
+        if intraday is None:
+            intraday = bool(np.any(minute_of_day))
+        self.logger.info('Adding calendar features (intraday=%s)' %intraday)
+        self.data_frame[YEAR] = index.year
+        self.data_frame[MONTH] = index.month
+        self.data_frame[DAY] = index.day
+        self.data_frame[WEEKDAY] = index.weekday
+        if intraday:
+            self.data_frame[MINUTE_OF_DAY] = minute_of_day
+            self.data_frame[SESSION] = index.values.astype('datetime64[D]').astype(np.int64)
+
     def add_technical_indicator(self, technical_indicator):
         """
         Add the technical indicator to the dataset.
         Must be performed before refering a technical indicator in a
         running strategy.
+        The dataset keeps a graph of its technical indicators keyed by their
+        class, parameters and inputs (see TechnicalIndicator.key()).  The
+        technical indicators given as input to this one are added first,
+        and a technical indicator identical to one already calculated is
+        not calculated again: the one already calculated is kept instead
+        (IE: the same SMA used by several strategies or combinations of
+        parameters of an optimizer).
+        When reuse_technical_indicators is set, a new technical indicator
+        whose values are already in the data_frame is not calculated either.
+        When an indicator_cache is set, technical indicators are loaded from
+        it when possible and stored in it once calculated.
+        @rtype: TechnicalIndicator
+        @return: The technical indicator holding the values.
+        """
+        for dependency in technical_indicator.dependencies:
+            self.add_technical_indicator(dependency)
+        key = technical_indicator.key()
+        node = self.indicator_graph.get(key)
+        if node is None:
+            self.logger.info('Adding technical indicator: %s' %technical_indicator)
+            node = self.indicator_graph[key] = technical_indicator
+            calculate = not self.reuse_technical_indicators or node.value not in self.data_frame
+        else:
+            self.logger.info('Reusing technical indicator: %s' %node)
+            calculate = node.value not in self.data_frame # The bars were replaced
+        if calculate:
+            self._calculate_technical_indicator(node)
+        if node not in self.technical_indicators:
+            self.technical_indicators.append(node)
+        return node
+
+    def add_technical_indicators(self, technical_indicators):
+        """
+        Same as calling add_technical_indicator() for every technical
+        indicator, except that the technical indicators of the same class
+        and data supporting a batch (SMA, Max and Min) are calculated
+        together, for all their periods in a single pass.  The ones in the
+        indicator_cache are loaded from it instead, like the others.
+        IE: A sweep over the periods of a SMA in an optimizer (see the
+        technical_indicators of the Optimizer):
+            dataset.add_technical_indicators([SMA(close, period) for period in range(5, 201)])
+        @type technical_indicators: list
+        @rtype: list
+        @return: The technical indicators holding the values.
+        """
+        families = {} # Technical indicators to batch by class and data
+        for technical_indicator in technical_indicators:
+            if technical_indicator.batch is None:
+                continue
+            for dependency in technical_indicator.dependencies:
+                self.add_technical_indicator(dependency)
+            key = technical_indicator.key()
+            if key in self.indicator_graph or technical_indicator.data not in self.data_frame or \
+               self.reuse_technical_indicators and technical_indicator.value in self.data_frame:
+                continue
+            family = families.setdefault((technical_indicator.__class__, \
+                                          technical_indicator.data), {})
+            family.setdefault(key, technical_indicator)
+        for (batch_class, data), family in families.items():
+            calculate = []
+            for technical_indicator in family.values():
+                self.indicator_graph[technical_indicator.key()] = technical_indicator
+                address = self._cache_address(technical_indicator)
+                if address is None or not self.indicator_cache.load(address, self.data_frame):
+                    calculate.append((technical_indicator, address))
+            if not calculate:
+                continue
+            self.logger.info('Calculating %s %s of %s in a batch' \
+                             %(len(calculate), batch_class.__name__, data))
+            values = batch_class.batch(self.data_frame[data].values, \
+                                       [technical_indicator.period \
+                                        for technical_indicator, _ in calculate])
+            for row, (technical_indicator, address) in enumerate(calculate):
+                columns = set(self.data_frame.columns)
+                self.data_frame[technical_indicator.value] = values[row]
+                self._cache_store(technical_indicator, address, columns)
+        return [self.add_technical_indicator(technical_indicator) \
+                for technical_indicator in technical_indicators]
+
+    def _calculate_technical_indicator(self, technical_indicator):
+        """
+        Sets the values of the technical indicator in the data_frame, from
+        the indicator_cache when possible.
         """
-        self.logger.info('Adding technical indicator: %s' %technical_indicator)
+        address = self._cache_address(technical_indicator)
+        if address is not None and self.indicator_cache.load(address, self.data_frame):
+            return
+        columns = set(self.data_frame.columns)
         technical_indicator.results(self.data_frame)
-        self.technical_indicators.append(technical_indicator)
+        self._cache_store(technical_indicator, address, columns)
+
+    def _cache_address(self, technical_indicator):
+        """
+        Returns the indicator_cache address of the technical indicator, None
+        when there is no indicator_cache or it cannot be cached.
+        """
+        if self.indicator_cache is None:
+            return None
+        return self.indicator_cache.address(technical_indicator, self.data_frame)
+
+    def _cache_store(self, technical_indicator, address, columns):
+        """
+        Stores the columns set by the technical indicator (the ones not in
+        columns) in the indicator_cache at address.
+        """
+        if address is not None and technical_indicator.value not in columns and \
+           technical_indicator.value in self.data_frame:
+            self.indicator_cache.store(address, self.data_frame, \
+                                       [column for column in self.data_frame.columns \
+                                        if column not in columns])
 
     def update_technical_indicators(self):
         """
         Loops through each TI and brings it's values up to the latest time slice
+        (IE: after loading new bars in live trading).
+        SMA, EMA, RSI, ATR, Max, Min, BBANDS, STOCH and ADX keep streaming
+        state and only process the new bars in constant time per bar, their
+        first update processes every bar.  The other technical indicators
+        calculate their results again over every bar.
         """
-        pass
+        for technical_indicator in self.technical_indicators:
+            self.logger.debug('Updating technical indicator: %s' %technical_indicator)
+            technical_indicator.update(self.data_frame)
@@ -0,0 +1,129 @@
+"""
+The exit kernel runs the position state machine of a single symbol strategy
+in one loop over numpy arrays.  The entry and exit signals of the criteria
+groups are evaluated ahead of time, the kernel then resolves the position
+checks (InMarket, IsLong, IsShort) and the StopLoss, TakeProfit and
+TrailingStop exits bar by bar with the checks of the criteria themselves
+(holds(), triggered(), trail()) instead of applying them on a window of bars.
+The stops of the TrailingStop criteria are kept by the kernel for the
+duration of each trade, the criteria are left untouched.
+
+The actions are executed and the P/L metrics calculated by the Report of the
+strategy, the same way as the other simulations.
+"""
+import numpy as np
+from nowtrade.action import LONG, SHORT, NO_ACTION, determine_action, status_change
+from nowtrade.criteria import Not, InMarket, IsLong, IsShort, StopLoss, \
+                              TakeProfit, TrailingStop
+
+POSITION_CRITERIA = (InMarket, IsLong, IsShort)
+EXIT_CRITERIA = (StopLoss, TakeProfit, TrailingStop)
+
+def kernel_checks(criteria_list, symbol):
+    """
+    Returns the path dependent criteria of a criteria group as kernel checks:
+    (criteria, negated) tuples.  Returns None when one of them can not be
+    resolved by the kernel.
+    """
+    checks = []
+    for criteria in criteria_list:
+        if not criteria.path_dependent:
+            continue
+        negated = criteria.__class__ is Not
+        if negated:
+            criteria = criteria.criteria
+        if str(getattr(criteria, 'symbol', None)) != symbol:
+            return None
+        if criteria.__class__ in POSITION_CRITERIA or \
+           criteria.__class__ in EXIT_CRITERIA and not negated:
+            checks.append((criteria, negated))
+        else:
+            return None
+    return checks
+
+def exit_kernel(open_, close, groups, report, symbol, datetime):
+    """
+    Runs the position state machine of a single symbol strategy.
+    Follows the same rules as Strategy.process_new_data(): the action
+    decided on a bar is executed by the report on the open of the next bar.
+    @type open_: numpy.ndarray
+    @type close: numpy.ndarray
+    @type groups: list
+    @param groups: (raw action, entry/exit signal for every bar, kernel
+    checks) of every criteria group, see kernel_checks().
+    @type report: Report
+    @param report: Executes the actions and calculates the P/L metrics.
+    @type symbol: str
+    @type datetime: function
+    @param datetime: Returns the datetime of the bar at a position
+    (IE: BarStore.get_index).
+    @rtype: tuple
+    @return: The ACTIONS and STATUS columns, the P/L, change value and change
+    percent of every bar (one column each) and the action to execute on the
+    bar after the last one.
+    """
+    actions = np.zeros(len(open_), dtype=np.int64)
+    statuses = np.zeros(len(open_), dtype=np.int64)
+    metrics = np.empty((len(open_), 3))
+    # The criteria groups that can pass while short, flat and long
+    positions = dict((position, _position_groups(groups, position)) for position in (-1, 0, 1))
+    trailing_stops = set(criteria for _, _, checks in groups for criteria, _ in checks \
+                         if criteria.__class__ is TrailingStop)
+    stops = dict((criteria, criteria.new_stop()) for criteria in trailing_stops)
+    triggered = dict((criteria, False) for criteria in trailing_stops)
+    status = 0
+    upcoming = NO_ACTION
+    for i, open_value in enumerate(open_):
+        action = upcoming
+        status += status_change(action)
+        bar_metrics = report.get_preprocess_metrics(symbol, action, status, open_value, close[i])
+        if action != NO_ACTION:
+            report.execute_action(symbol, action, {'%s_Open' %symbol: open_value}, datetime(i))
+        actions[i] = action
+        statuses[i] = status
+        metrics[i] = bar_metrics
+        # The trailing stops start over on every trade and, being stateful,
+        # follow it on every bar
+        for criteria in trailing_stops:
+            if action == LONG or action == SHORT:
+                stops[criteria] = criteria.new_stop()
+            triggered[criteria], stops[criteria] = \
+                criteria.trail(stops[criteria], _check_value(criteria, bar_metrics))
+        upcoming = determine_action([raw_action for raw_action, signal, exits \
+                                     in positions[(status > 0) - (status < 0)] \
+                                     if signal[i] and _triggered(exits, bar_metrics, triggered)])
+    return actions, statuses, metrics, upcoming
+
+def _position_groups(groups, position):
+    """
+    Returns the raw action, signal and exit criteria of the criteria groups
+    whose position checks pass when the status is position.
+    """
+    return [(raw_action, signal, [criteria for criteria, _ in checks \
+                                  if criteria.__class__ in EXIT_CRITERIA]) \
+            for raw_action, signal, checks in groups \
+            if all(criteria.holds(position) != negated for criteria, negated in checks \
+                   if criteria.__class__ in POSITION_CRITERIA)]
+
+def _triggered(exits, metrics, trailing_stops):
+    """
+    Returns True when every exit criteria is triggered by the metrics
+    (P/L, change value and change percent) of the bar.  The results of the
+    TrailingStop criteria are already known (trailing_stops).
+    """
+    for criteria in exits:
+        if criteria.__class__ is TrailingStop:
+            if not trailing_stops[criteria]:
+                return False
+        elif not criteria.triggered(_check_value(criteria, metrics)):
+            return False
+    return True
+
+def _check_value(criteria, metrics):
+    """
+    Returns the metric of the bar checked by an exit criteria: the P/L for
+    TakeProfit, the change value or change percent for the others.
+    """
+    if criteria.__class__ is TakeProfit:
+        return metrics[0]
+    return metrics[2] if criteria.percent else metrics[1]
@@ -0,0 +1,104 @@
+"""
+The indicator batch module calculates the same technical indicator for
+many periods in a single pass over the data (IE: every SMA of a parameter
+sweep over periods 5 to 200).  See Dataset.add_technical_indicators().
+
+Every function returns a 2-D numpy array holding one row per period (in
+the order of the periods) and one column per bar.
+"""
+import numpy as np
+
+class InvalidPeriod(Exception):
+    """
+    Exception used when a period lower than 1 is requested.
+    """
+    pass
+
+def rolling_mean(values, periods):
+    """
+    Same as pandas.rolling_mean() (the SMA technical indicator) for every
+    period.  Every mean is the difference of a single cumulative sum of
+    the values, so each period costs O(n) whatever its length.
+    @type values: numpy.ndarray
+    @type periods: list
+    @rtype: numpy.ndarray
+    """
+    values = np.asarray(values, dtype=np.float64)
+    nans = np.isnan(values)
+    # Centered values keep the cumulative sum small and precise
+    offset = values[~nans].mean() if not nans.all() else 0.0
+    totals = _cumulative_sum(np.where(nans, 0.0, values - offset))
+    nan_counts = _cumulative_sum(nans.astype(np.int64))
+    results = np.full((len(periods), len(values)), np.nan)
+    for row, period in enumerate(periods):
+        _check_period(period)
+        if period > len(values):
+            continue
+        means = (totals[period:] - totals[:-period]) / period + offset
+        means[nan_counts[period:] != nan_counts[:-period]] = np.nan
+        results[row, period - 1:] = means
+    return results
+
+def rolling_max(values, periods):
+    """
+    Same as pandas.rolling_max() (the Max technical indicator) for every
+    period.  See _rolling_extreme().
+    @type values: numpy.ndarray
+    @type periods: list
+    @rtype: numpy.ndarray
+    """
+    return _rolling_extreme(values, periods, np.maximum)
+
+def rolling_min(values, periods):
+    """
+    Same as pandas.rolling_min() (the Min technical indicator) for every
+    period.  See _rolling_extreme().
+    @type values: numpy.ndarray
+    @type periods: list
+    @rtype: numpy.ndarray
+    """
+    return _rolling_extreme(values, periods, np.minimum)
+
+def _rolling_extreme(values, periods, function):
+    """
+    Rolling maximum or minimum (function) for every period using a sparse
+    table: level k holds the extreme of the 2**k values starting at every
+    bar, built from level k - 1 in O(n).  The extreme of any window is then
+    the extreme of the two, possibly overlapping, windows of the longest
+    level that fits in it.  Windows holding a NaN value are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    periods = list(periods)
+    for period in periods:
+        _check_period(period)
+    longest = min(max(periods), len(values)) if periods else 0
+    levels = [values]
+    while 2 ** len(levels) <= longest:
+        half = 2 ** (len(levels) - 1)
+        levels.append(function(levels[-1][:-half], levels[-1][half:]))
+    results = np.full((len(periods), len(values)), np.nan)
+    for row, period in enumerate(periods):
+        if period > len(values):
+            continue
+        level = int(period).bit_length() - 1
+        span = 2 ** level
+        table = levels[level]
+        results[row, period - 1:] = function(table[:len(values) - period + 1], \
+                                             table[period - span:])
+    return results
+
+def _cumulative_sum(values):
+    """
+    Returns the cumulative sum of the values preceded by 0, the sum of
+    the window [start:end] being totals[end] - totals[start].
+    """
+    totals = np.zeros(len(values) + 1, dtype=values.dtype)
+    np.cumsum(values, out=totals[1:])
+    return totals
+
+def _check_period(period):
+    """
+    Raises InvalidPeriod unless the period is 1 or higher.
+    """
+    if period < 1:
+        raise InvalidPeriod('Must be a positive period: %s' %period)
@@ -0,0 +1,189 @@
+"""
+The indicator cache module keeps the values of technical indicators on disk
+so that they are not calculated again every time a dataset is rebuilt
+(IE: when a research notebook restarts).  See Dataset.indicator_cache.
+"""
+import os
+import hashlib
+import tempfile
+import numpy as np
+from nowtrade import logger
+
+# Changing the file format or the way entries are addressed invalidates
+# every entry
+VERSION = 1
+EXTENSION = '.npy'
+
+class IndicatorCache(object):
+    """
+    Content addressed cache of technical indicator columns.
+
+    Every entry is addressed by the key of the technical indicator (its
+    class, parameters and inputs) and a fingerprint of the bars it was
+    calculated on: the index and the values of its input columns.  The same
+    technical indicator calculated on the same data is always found, while
+    new or changed bars simply lead to a new entry.  Technical indicators
+    whose inputs are unknown (IE: NeuralNetwork) are never cached.
+
+    An entry is a single NumPy file holding one field per column, loaded
+    memory mapped.  The least recently used entries are removed once the
+    entries take more than max_bytes.
+
+    Example:
+        dataset.indicator_cache = IndicatorCache('~/.nowtrade/indicators')
+        dataset.add_technical_indicator(RSI(symbol.close, 14)) # Once calculated
+    """
+    def __init__(self, directory, max_bytes=2**30):
+        """
+        @type directory: str
+        @param directory: Where the entries are stored, created when missing.
+        @type max_bytes: int
+        @param max_bytes: Size limit of all the entries.
+        """
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.index = None # Last index fingerprinted and its digest
+        self.index_digest = None
+        self.logger = logger.Logger(self.__class__.__name__)
+        self.logger.info('Initialized - %s' %self)
+    def __str__(self):
+        return 'IndicatorCache(directory=%s, max_bytes=%s)' %(self.directory, self.max_bytes)
+    def __repr__(self):
+        return self.__str__()
+
+    def address(self, technical_indicator, data_frame):
+        """
+        Returns the address of the technical indicator's values on the bars
+        of the data_frame, or None when it cannot be cached.
+        """
+        if technical_indicator.inputs is None:
+            return None
+        if data_frame.index is not self.index: # Indexes are immutable
+            self.index = data_frame.index
+            self.index_digest = hashlib.md5()
+            _update_digest(self.index_digest, str(getattr(self.index, 'tz', None)))
+            _update_digest(self.index_digest, self.index.values)
+        digest = self.index_digest.copy()
+        digest.update('%s %r' %(VERSION, technical_indicator.key()))
+        for column in technical_indicator.inputs:
+            _update_digest(digest, column)
+            if column in data_frame:
+                _update_digest(digest, data_frame[column].values)
+        return digest.hexdigest()
+
+    def load(self, address, data_frame):
+        """
+        Sets the columns stored at address in the data_frame when they are
+        in the cache.
+        @type address: str
+        @param address: See address().
+        @rtype: bool
+        @return: True when the columns were loaded.
+        """
+        path = self._path(address)
+        try:
+            values = np.load(path, mmap_mode='r')
+        except (IOError, ValueError):
+            return False
+        if len(values) != len(data_frame):
+            self.logger.warning('Ignoring corrupt entry: %s' %path)
+            return False
+        self.logger.debug('Loading %s' %path)
+        for column in values.dtype.names:
+            data_frame[column] = np.array(values[column])
+        _touch(path)
+        return True
+
+    def store(self, address, data_frame, columns):
+        """
+        Stores the columns of the data_frame at address, then removes the
+        least recently used entries if needed.
+        @type address: str
+        @param address: See address().
+        @type columns: list
+        @param columns: The columns set by the technical indicator.
+        """
+        values = np.empty(len(data_frame), dtype=[(str(column), data_frame[column].dtype) \
+                                                  for column in columns])
+        for column in columns:
+            values[str(column)] = data_frame[column].values
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as entry:
+            np.save(entry, values)
+        os.rename(temporary, self._path(address)) # Readers never see partial entries
+        self.logger.debug('Stored %s' %self._path(address))
+        self.evict()
+
+    def size(self):
+        """
+        Returns the number of bytes taken by the entries.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until they take no more
+        than max_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self.logger.debug('Evicting %s' %path)
+            try:
+                os.remove(path)
+            except OSError: # Already removed by another process
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        for path, _, _ in self._entries():
+            os.remove(path)
+
+    def _path(self, address):
+        """
+        Returns the path of the entry at address.
+        """
+        return os.path.join(self.directory, address + EXTENSION)
+
+    def _entries(self):
+        """
+        Returns the path, size and last use of every entry.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+def _update_digest(digest, value):
+    """
+    Adds a string or numpy array to the digest.
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            value = np.array([str(item) for item in value])
+        digest.update(str(value.dtype))
+        value = np.ascontiguousarray(value).view(np.uint8)
+    digest.update(value)
+
+def _touch(path):
+    """
+    Marks the entry as used now.
+    """
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
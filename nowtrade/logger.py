@@ -90,6 +90,15 @@ class Logger(object):
         self.console_logging_handler.setLevel(lvl)
         self.console_logging_handler.setFormatter(self.console_formatter)
         self.logger.addHandler(self.console_logging_handler)
+    def debug_enabled(self):
+        """
+        Returns True if debug logging statements reach at least one handler.
+        Useful to avoid building expensive debug messages for nothing.
+        """
+        for handler in self.logger.handlers:
+            if handler.level <= DEBUG:
+                return True
+        return False
     def debug(self, message):
         """
         Add debug logging statement.
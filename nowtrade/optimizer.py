@@ -0,0 +1,389 @@
+"""
+The optimizer module runs a strategy for every combination of a parameter
+grid in parallel and ranks the results of each backtest.
+"""
+import copy
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+from nowtrade import logger
+from nowtrade.strategy import VECTORIZED
+
+# Dataset, strategy factory and simulation mode of the current worker process.
+# Set once per process so that the data is never sent with the tasks.
+# Forked workers share the parent's memory pages until they are written to.
+_WORKER = {}
+
+class Optimizer(object):
+    """
+    Backtests a strategy for every combination of parameters.
+
+    The strategy_factory is called with a dataset and one keyword argument
+    per parameter and must return the Strategy to simulate.  The dataset
+    should already have its data loaded.  Every backtest gets its own
+    shallow copy of the dataset, technical indicators can be added to it
+    freely without affecting the other backtests.  Technical indicators
+    already added to the dataset are not calculated again by the backtests.
+    The technical indicators of a sweep over periods can be given to the
+    optimizer to be calculated beforehand in a batch (see
+    Dataset.add_technical_indicators()), the backtests then reuse them.
+
+    Example:
+        def factory(dataset, fast, slow):
+            ...
+            return Strategy(dataset, criteria_groups, trading_profile)
+        optimizer = Optimizer(dataset, factory, {'fast': [5, 10], 'slow': [20, 50]},
+                              technical_indicators=[SMA(close, period) \
+                                                    for period in [5, 10, 20, 50]])
+        results = optimizer.run()
+    """
+    def __init__(self, dataset, strategy_factory, parameter_grid, processes=None, \
+                 rank_by='net_profit', ascending=False, mode=VECTORIZED, \
+                 technical_indicators=None):
+        """
+        @type dataset: Dataset
+        @param dataset: The dataset (with its data loaded) shared by every backtest.
+        @type strategy_factory: function
+        @param strategy_factory: Module level function returning a Strategy.
+        @type parameter_grid: dict
+        @param parameter_grid: The list of values of every parameter.
+        @type processes: int
+        @param processes: Number of worker processes (defaults to the number
+        of CPUs).  A value of 1 runs every backtest in the current process.
+        @type rank_by: string
+        @param rank_by: The Report.overview() metric used to rank the results.
+        @type ascending: bool
+        @param ascending: Rank from the lowest to the highest metric.
+        @type mode: string
+        @param mode: The simulation mode of the strategies.
+        @type technical_indicators: list
+        @param technical_indicators: Technical indicators used by the
+        backtests, calculated beforehand in a batch.
+        """
+        self.dataset = dataset
+        self.strategy_factory = strategy_factory
+        self.parameter_grid = parameter_grid
+        self.processes = processes
+        self.rank_by = rank_by
+        self.ascending = ascending
+        self.mode = mode
+        self.technical_indicators = technical_indicators or []
+        self.cancelled = False
+        self.logger = logger.Logger(self.__class__.__name__)
+        self.logger.info('Initialized - %s' %self)
+    def __str__(self):
+        return 'Optimizer(dataset=%s, strategy_factory=%s, parameter_grid=%s, \
+processes=%s, rank_by=%s, ascending=%s, mode=%s, technical_indicators=%s)' \
+               %(self.dataset, self.strategy_factory.__name__, self.parameter_grid, \
+                 self.processes, self.rank_by, self.ascending, self.mode, \
+                 len(self.technical_indicators))
+    def __repr__(self):
+        return self.__str__()
+
+    def run(self, progress=None):
+        """
+        Runs every backtest and returns the ranked results.
+        @type progress: function
+        @param progress: Called after every backtest with the number of
+        backtests completed, the total number of backtests, the parameters
+        and the metrics of the backtest.  Can call cancel().
+        @rtype: pandas.DataFrame
+        @return: One row per backtest holding its parameters and its
+        Report.overview() metrics, best first.  Only the backtests
+        completed are returned when the optimizer is cancelled.
+        """
+        tasks = [(number, parameters, None, False) for number, parameters \
+                 in enumerate(parameter_combinations(self.parameter_grid))]
+        try:
+            return self._rank(self._run_tasks(self._batch_dataset(), tasks, progress))
+        finally:
+            self.cancelled = False
+
+    def _run_tasks(self, dataset, tasks, progress=None):
+        """
+        Runs the backtest of every task on the dataset provided and returns
+        the results completed in the order of the tasks.
+        A task is made of its number, its parameters, the (start, end) bars
+        of the dataset to use (None for all of them) and whether the equity
+        curve should be returned.
+        Nothing is run when the optimizer is already cancelled.
+        """
+        if self.cancelled or not tasks:
+            return []
+        self.logger.info('Running %s backtests' %len(tasks))
+        pool = None
+        if self.processes == 1:
+            _init_worker(dataset, self.strategy_factory, self.mode)
+            results = (_run_backtest(task) for task in tasks)
+        else:
+            pool = multiprocessing.Pool(self.processes, _init_worker, \
+                                        (dataset, self.strategy_factory, self.mode))
+            results = pool.imap_unordered(_run_backtest, tasks)
+        completed = []
+        try:
+            for result in results:
+                completed.append(result)
+                if progress is not None:
+                    progress(len(completed), len(tasks), result[1], result[2])
+                if self.cancelled:
+                    self.logger.info('Cancelled after %s backtests' %len(completed))
+                    break
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            _WORKER.clear()
+        return sorted(completed)
+
+    def _batch_dataset(self):
+        """
+        Returns the dataset when there are no technical_indicators, else a
+        copy of it holding them, calculated in a batch.
+        """
+        if not self.technical_indicators:
+            return self.dataset
+        dataset = _copy_dataset(self.dataset)
+        dataset.add_technical_indicators(self.technical_indicators)
+        dataset.technical_indicators = list(self.dataset.technical_indicators)
+        return dataset
+
+    def cancel(self):
+        """
+        Stops the optimizer once the current backtest completes.
+        Can be called from the progress function or from another thread.
+        A cancel issued before run() starts stops it before any backtest.
+        The flag is cleared when the run ends.
+        """
+        self.cancelled = True
+
+    def _rank(self, results):
+        """
+        Builds the table of results sorted by the rank_by metric.
+        """
+        parameters = sorted(self.parameter_grid)
+        rows = []
+        metrics = set()
+        for _, backtest_parameters, backtest_metrics, _ in results:
+            row = dict(backtest_parameters)
+            row.update(backtest_metrics)
+            rows.append(row)
+            metrics.update(backtest_metrics)
+        metrics.add(self.rank_by)
+        table = pd.DataFrame(rows, columns=parameters + sorted(metrics - set(parameters)))
+        table = table.sort_values(self.rank_by, ascending=self.ascending, \
+                                  kind='mergesort', na_position='last')
+        return table.reset_index(drop=True)
+
+class WalkForward(Optimizer):
+    """
+    Walk-forward analysis of a strategy.  The parameters are optimized on
+    every in-sample window and the best ones are backtested on the
+    out-of-sample window that follows.  The out-of-sample windows do not
+    overlap and their equity curves are stitched together.
+
+    The technical indicators of every combination of parameters are
+    calculated once over the whole dataset and shared by every window,
+    and the backtests of all the windows run in the same process pool.
+    """
+    def __init__(self, dataset, strategy_factory, parameter_grid, in_sample, \
+                 out_of_sample, anchored=False, **kwargs):
+        """
+        @type in_sample: int
+        @param in_sample: Number of bars of the in-sample windows.
+        @type out_of_sample: int
+        @param out_of_sample: Number of bars of the out-of-sample windows.
+        @type anchored: bool
+        @param anchored: In-sample windows always start on the first bar.
+        Other keyword arguments are the same as the Optimizer's.
+        """
+        self.in_sample = in_sample
+        self.out_of_sample = out_of_sample
+        self.anchored = anchored
+        self.equity_curve = pd.Series()
+        Optimizer.__init__(self, dataset, strategy_factory, parameter_grid, **kwargs)
+    def __str__(self):
+        return 'WalkForward(dataset=%s, strategy_factory=%s, parameter_grid=%s, \
+in_sample=%s, out_of_sample=%s, anchored=%s, processes=%s, rank_by=%s, ascending=%s, mode=%s, \
+technical_indicators=%s)' \
+               %(self.dataset, self.strategy_factory.__name__, self.parameter_grid, \
+                 self.in_sample, self.out_of_sample, self.anchored, self.processes, \
+                 self.rank_by, self.ascending, self.mode, len(self.technical_indicators))
+
+    def run(self, progress=None):
+        """
+        Runs the walk-forward analysis.  The stitched out-of-sample equity
+        curve is kept in the equity_curve attribute.
+        @type progress: function
+        @param progress: Same as Optimizer.run().
+        @rtype: pandas.DataFrame
+        @return: One row per window holding its first and last bars, the
+        best in-sample parameters with their in-sample rank_by metric, and
+        the out-of-sample Report.overview() metrics.  Nothing is returned
+        for windows that were not completed when the analysis is cancelled.
+        """
+        try:
+            return self._walk_forward(progress)
+        finally:
+            self.cancelled = False
+
+    def _walk_forward(self, progress):
+        """
+        Runs the in-sample and out-of-sample backtests of every window.
+        """
+        self.equity_curve = pd.Series()
+        combinations = parameter_combinations(self.parameter_grid)
+        windows = walk_forward_windows(len(self.dataset.data_frame), self.in_sample, \
+                                       self.out_of_sample, self.anchored)
+        dataset = self._calculate_technical_indicators(combinations)
+        tasks = []
+        for in_sample, _ in windows:
+            for parameters in combinations:
+                tasks.append((len(tasks), parameters, in_sample, False))
+        in_sample_results = self._run_tasks(dataset, tasks, progress)
+        columns = ['in_sample_start', 'in_sample_end', 'out_of_sample_start', \
+                   'out_of_sample_end'] + sorted(self.parameter_grid) + \
+                  ['in_sample_%s' %self.rank_by]
+        if self.cancelled:
+            return pd.DataFrame(columns=columns)
+        tasks = []
+        best_metrics = []
+        for window, (_, out_of_sample) in enumerate(windows):
+            _, parameters, metrics, _ = self._best(in_sample_results[\
+                window * len(combinations):(window + 1) * len(combinations)])
+            best_metrics.append(metrics.get(self.rank_by, np.nan))
+            tasks.append((window, parameters, out_of_sample, True))
+        out_of_sample_results = self._run_tasks(dataset, tasks, progress)
+        rows = []
+        for window, parameters, metrics, _ in out_of_sample_results:
+            in_sample, out_of_sample = windows[window]
+            row = {'in_sample_start': dataset.data_frame.index[in_sample[0]],
+                   'in_sample_end': dataset.data_frame.index[in_sample[1] - 1],
+                   'out_of_sample_start': dataset.data_frame.index[out_of_sample[0]],
+                   'out_of_sample_end': dataset.data_frame.index[out_of_sample[1] - 1],
+                   'in_sample_%s' %self.rank_by: best_metrics[window]}
+            row.update(parameters)
+            row.update(metrics)
+            rows.append(row)
+        self.equity_curve = _stitch([result[3] for result in out_of_sample_results])
+        metrics = set()
+        for row in rows:
+            metrics.update(row)
+        return pd.DataFrame(rows, columns=columns + sorted(metrics - set(columns)))
+
+    def _best(self, results):
+        """
+        Returns the result with the best rank_by metric, ranked the same
+        way as Optimizer.run().
+        """
+        metrics = pd.Series([result[2].get(self.rank_by, np.nan) for result in results])
+        ranked = metrics.sort_values(ascending=self.ascending, kind='mergesort', \
+                                     na_position='last')
+        return results[ranked.index[0]]
+
+    def _calculate_technical_indicators(self, combinations):
+        """
+        Returns a copy of the dataset holding the technical indicators of
+        every combination of parameters calculated over all the data.
+        Technical indicators shared by several combinations are only
+        calculated once.
+        """
+        dataset = _copy_dataset(self._batch_dataset())
+        dataset.reuse_technical_indicators = True
+        for parameters in combinations:
+            self.strategy_factory(dataset, **parameters)
+        dataset.technical_indicators = list(self.dataset.technical_indicators)
+        return dataset
+
+def walk_forward_windows(bars, in_sample, out_of_sample, anchored=False):
+    """
+    Returns the ((start, end), (start, end)) bars of the in-sample and
+    out-of-sample windows of a walk-forward analysis over a number of bars.
+    The last out-of-sample window can be shorter than the others.
+    IE: walk_forward_windows(10, 4, 3) -> [((0, 4), (4, 7)), ((3, 7), (7, 10))]
+    """
+    windows = []
+    start = 0
+    while start + in_sample < bars:
+        in_sample_start = 0 if anchored else start
+        windows.append(((in_sample_start, start + in_sample), \
+                        (start + in_sample, min(start + in_sample + out_of_sample, bars))))
+        start += out_of_sample
+    return windows
+
+def parameter_combinations(grid):
+    """
+    Returns the list of every combination of parameters in the grid.
+    @type grid: dict
+    @param grid: The list of values of every parameter.
+    IE: {'a': [1, 2], 'b': [3]} -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values)) \
+            for values in itertools.product(*[grid[name] for name in names])]
+
+def _init_worker(dataset, strategy_factory, mode):
+    """
+    Sets the dataset, strategy factory and simulation mode of the process.
+    """
+    _WORKER['dataset'] = dataset
+    _WORKER['strategy_factory'] = strategy_factory
+    _WORKER['mode'] = mode
+
+def _run_backtest(task):
+    """
+    Runs one backtest and returns its task number, parameters, metrics and
+    equity curve (None unless requested).
+    """
+    number, parameters, bars, equity = task
+    strategy = _WORKER['strategy_factory'](_copy_dataset(_WORKER['dataset'], bars), **parameters)
+    strategy.simulate(_WORKER['mode'])
+    equity_curve = None
+    if equity:
+        equity_curve = _equity_curve(strategy)
+    return number, parameters, _metrics(strategy.report.overview()), equity_curve
+
+def _copy_dataset(dataset, bars=None):
+    """
+    Returns a copy of the dataset sharing the data of the original.
+    @type bars: tuple
+    @param bars: The (start, end) bars of the data to keep (None for all).
+    """
+    dataset_copy = copy.copy(dataset)
+    data_frame = dataset.data_frame
+    if bars is not None:
+        data_frame = data_frame[bars[0]:bars[1]]
+    dataset_copy.data_frame = data_frame.copy(deep=False)
+    dataset_copy.technical_indicators = list(dataset.technical_indicators)
+    dataset_copy.indicator_graph = dict(dataset.indicator_graph)
+    return dataset_copy
+
+def _equity_curve(strategy):
+    """
+    Returns the capital of the strategy on every bar.
+    """
+    history = strategy.report.available_capital_history
+    return history.fillna(method='ffill').fillna(strategy.trading_profile.capital)
+
+def _metrics(overview):
+    """
+    Returns the numeric metrics of a Report.overview().
+    """
+    return dict((name, value) for name, value in overview.items() \
+                if isinstance(value, (int, long, float, np.number)))
+
+def _stitch(equity_curves):
+    """
+    Chains the equity curves of consecutive periods into a single curve
+    starting at the capital of the first one.
+    """
+    stitched = []
+    capital = None
+    for equity_curve in equity_curves:
+        if capital is None:
+            capital = equity_curve.iloc[0]
+        stitched.append(equity_curve / equity_curve.iloc[0] * capital)
+        capital = stitched[-1].iloc[-1]
+    if not stitched:
+        return pd.Series()
+    return pd.concat(stitched)
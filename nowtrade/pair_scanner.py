@@ -0,0 +1,196 @@
+"""
+The pair scanner module tests every pair of symbols of a universe for
+cointegration and ranks them by the statistics of their spread (IE:
+rebuilding a statistical arbitrage universe overnight).
+"""
+import multiprocessing
+import numpy as np
+import pandas as pd
+from nowtrade import logger
+from nowtrade.data_connection import NoDataException
+from nowtrade.dataset import Dataset
+from nowtrade.regression import ENGLE_GRANGER_CRITICAL_VALUES, engle_granger, \
+                                engle_granger_critical_value, rolling_ols, rolling_zscore
+from nowtrade.symbol_list import SymbolList
+
+# Close prices and lookback of the current worker process.  Set once per
+# process so that the data is never sent with the tasks.
+_WORKER = {}
+
+COLUMNS = ['y', 'x', 'bars', 'hedge_ratio', 'adf', 'cointegrated', 'half_life', \
+           'correlation', 'zscore']
+
+class PairScanner(object):
+    """
+    Tests the N * (N - 1) / 2 pairs of symbols of a symbol list for
+    cointegration in parallel.
+
+    Every pair is made of a symbol (y) and one that comes after it in the
+    symbol list (x).  The close of y is regressed on the close of x over
+    the bars where both are known, and the residuals (the spread) are
+    tested for a unit root (Engle-Granger, see regression.engle_granger()).
+    The more negative the test statistic (adf), the more the spread
+    reverts to its mean.  A pair is cointegrated when its statistic is
+    below the critical value for its number of bars in common.
+
+    Every pair also gets the half-life of the mean reversion of its spread
+    (in bars), the correlation of the closes and the zscore of the latest
+    spread based on the rolling regression of the last lookback bars (the
+    same as the Pair technical indicator).
+
+    Example:
+        scanner = PairScanner(SymbolList(symbols), connection, start_datetime=start)
+        pairs = scanner.run()
+        pairs[pairs['cointegrated']].head(20)
+    """
+    def __init__(self, symbol_list, data_connection, start_datetime=None, \
+                 end_datetime=None, periods=None, granularity=None, lookback=20, \
+                 significance=0.05, processes=None):
+        """
+        @type symbol_list: SymbolList
+        @param symbol_list: The symbols of the universe.
+        @type data_connection: DataConnection
+        @param data_connection: The connection every symbol is loaded from.
+        @type start_datetime: datetime
+        @type end_datetime: datetime
+        @type periods: int
+        @type granularity: int
+        @param granularity: Same as the Dataset's.
+        @type lookback: int
+        @param lookback: Number of bars of the rolling regression of the zscore.
+        @type significance: float
+        @param significance: Significance level of the cointegration test,
+        one of ENGLE_GRANGER_CRITICAL_VALUES.
+        @type processes: int
+        @param processes: Number of worker processes (defaults to the number
+        of CPUs).  A value of 1 scans every pair in the current process.
+        """
+        assert significance in ENGLE_GRANGER_CRITICAL_VALUES, \
+               'Significance must be one of %s' %sorted(ENGLE_GRANGER_CRITICAL_VALUES)
+        self.symbol_list = symbol_list
+        self.data_connection = data_connection
+        self.lookback = lookback
+        self.significance = significance
+        self.processes = processes
+        self.start_datetime = start_datetime
+        self.end_datetime = end_datetime
+        self.granularity = granularity
+        self.periods = periods
+        self.missing = [] # Symbols without data on the last run
+        self.logger = logger.Logger(self.__class__.__name__)
+        self.logger.info('Initialized - %s' %self)
+    def __str__(self):
+        return 'PairScanner(symbol_list=%s, data_connection=%s, start_datetime=%s, \
+end_datetime=%s, periods=%s, granularity=%s, lookback=%s, significance=%s, processes=%s)' \
+               %(len(list(self.symbol_list)), self.data_connection, self.start_datetime, \
+                 self.end_datetime, self.periods, self.granularity, self.lookback, \
+                 self.significance, self.processes)
+    def __repr__(self):
+        return self.__str__()
+
+    def load_closes(self):
+        """
+        Loads the close of every symbol with data and keeps the others in
+        the missing attribute.
+        @rtype: pandas.DataFrame
+        @return: One column per symbol, in the order of the symbol list.
+        """
+        closes = []
+        self.missing = []
+        for symbol in self.symbol_list:
+            dataset = Dataset(SymbolList([str(symbol)]), self.data_connection, \
+                              self.start_datetime, self.end_datetime, self.periods, \
+                              self.granularity)
+            try:
+                dataset.load_data()
+            except NoDataException:
+                pass
+            if dataset.data_frame.empty:
+                self.missing.append(str(symbol))
+                continue
+            closes.append(dataset.data_frame[symbol.close].rename(str(symbol)))
+        if self.missing:
+            self.logger.warning('No data for %s symbols: %s' %(len(self.missing), self.missing))
+        if not closes:
+            return pd.DataFrame()
+        return pd.concat(closes, axis=1)
+
+    def run(self, progress=None):
+        """
+        Scans every pair and returns them ranked.
+        @type progress: function
+        @param progress: Called after every pair with the number of pairs
+        scanned and the total number of pairs.
+        @rtype: pandas.DataFrame
+        @return: One row per pair (see COLUMNS) ranked by the test statistic
+        of the cointegration test, the most cointegrated first.  Pairs
+        without enough bars in common to be tested come last.
+        """
+        closes = self.load_closes()
+        symbols = list(closes.columns)
+        tasks = [(y_number, x_number) for y_number in range(len(symbols)) \
+                 for x_number in range(y_number + 1, len(symbols))]
+        self.logger.info('Scanning %s pairs of %s symbols' %(len(tasks), len(symbols)))
+        rows = []
+        results = _scan_all(tasks, (closes.values, self.lookback), self.processes)
+        for scanned, (y_number, x_number, statistics) in enumerate(results, 1):
+            rows.append((symbols[y_number], symbols[x_number]) + statistics)
+            if progress is not None:
+                progress(scanned, len(tasks))
+        pairs = pd.DataFrame(rows, columns=[column for column in COLUMNS \
+                                            if column != 'cointegrated'])
+        pairs.insert(COLUMNS.index('cointegrated'), 'cointegrated', \
+                     pairs['adf'] < engle_granger_critical_value(self.significance, \
+                                                                 pairs['bars'].values))
+        pairs = pairs.sort_values(['adf', 'y', 'x'], na_position='last')
+        return pairs.reset_index(drop=True)
+
+def _scan_all(tasks, settings, processes):
+    """
+    Yields the result of every task, scanned by a pool of worker processes
+    unless processes is 1.
+    """
+    if processes == 1 or not tasks:
+        _init_worker(*settings)
+        try:
+            for task in tasks:
+                yield _scan(task)
+        finally:
+            _WORKER.clear()
+        return
+    pool = multiprocessing.Pool(processes, _init_worker, settings)
+    try:
+        chunksize = max(1, len(tasks) // (4 * (processes or multiprocessing.cpu_count())))
+        for result in pool.imap_unordered(_scan, tasks, chunksize=chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _init_worker(closes, lookback):
+    """
+    Sets the close prices (one column per symbol) and lookback of the process.
+    """
+    _WORKER['closes'] = closes
+    _WORKER['lookback'] = lookback
+
+def _scan(task):
+    """
+    Returns the symbol numbers of the pair along with the number of bars in
+    common, hedge ratio, test statistic, half-life, correlation and latest
+    zscore of the pair (NaN when there are not enough bars in common).
+    """
+    y_number, x_number = task
+    closes, lookback = _WORKER['closes'], _WORKER['lookback']
+    known = np.isfinite(closes[:, y_number]) & np.isfinite(closes[:, x_number])
+    y_values, x_values = closes[known, y_number], closes[known, x_number]
+    bars = len(y_values)
+    if bars <= max(lookback, 3):
+        return y_number, x_number, (bars, np.nan, np.nan, np.nan, np.nan, np.nan)
+    _, hedge_ratio, statistic, half_life = engle_granger(y_values, x_values)
+    correlation = np.corrcoef(y_values, x_values)[0, 1]
+    # Only the last bars are needed by the zscore of the latest spread
+    y_values, x_values = y_values[-(2 * lookback - 1):], x_values[-(2 * lookback - 1):]
+    _, rolling_hedge_ratio = rolling_ols(y_values, x_values, lookback)
+    zscore = rolling_zscore(y_values - rolling_hedge_ratio * x_values, lookback)[-1]
+    return y_number, x_number, (bars, hedge_ratio, statistic, half_life, correlation, zscore)
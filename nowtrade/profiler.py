@@ -0,0 +1,69 @@
+"""
+The profiler module keeps track of the time spent in the different phases
+of a strategy simulation.
+"""
+import time
+import pandas as pd
+
+class Profiler(object):
+    """
+    Accumulates the wall time and number of calls of named sections.
+    Enabled on a strategy with Strategy.enable_profiler().
+    A section is a string or a tuple, IE: ('apply', criteria), which is
+    only converted to a string when building the table.
+    """
+    def __init__(self):
+        self.times = {}
+        self.calls = {}
+    def __str__(self):
+        return 'Profiler(sections=%s)' %len(self.calls)
+    def __repr__(self):
+        return 'Profiler(sections=%s)' %len(self.calls)
+
+    def call(self, section, function, *args):
+        """
+        Calls the function with the arguments provided, records the time it
+        took under section and returns its result.
+        """
+        start = time.time()
+        result = function(*args)
+        self.record(section, time.time() - start)
+        return result
+
+    def record(self, section, elapsed):
+        """
+        Adds one call to section that lasted elapsed seconds.
+        """
+        self.times[section] = self.times.get(section, 0.0) + elapsed
+        self.calls[section] = self.calls.get(section, 0) + 1
+
+    def reset(self):
+        """
+        Forgets everything recorded so far.
+        """
+        self.times = {}
+        self.calls = {}
+
+    def table(self):
+        """
+        Returns a DataFrame with the number of calls, total time, average
+        time (in seconds) and percentage of the time of the slowest section
+        of every section, the slowest first.  Sections can be nested, IE:
+        the time of process_new_data includes the time of merge.
+        """
+        sections = list(self.calls)
+        table = pd.DataFrame({'calls': [self.calls[section] for section in sections],
+                              'total_time': [self.times[section] for section in sections]},
+                             index=[_section_name(section) for section in sections],
+                             columns=['calls', 'total_time'])
+        table['average_time'] = table['total_time'] / table['calls']
+        table['percent'] = table['total_time'] / table['total_time'].max() * 100
+        return table.sort_values('total_time', ascending=False)
+
+def _section_name(section):
+    """
+    Returns the string representation of a section.
+    """
+    if isinstance(section, tuple):
+        return ' '.join(str(part) for part in section)
+    return section
@@ -0,0 +1,168 @@
+"""
+The regression module holds the linear regressions used by pairs trading
+(see the Pair technical indicator and the PairScanner).
+
+Rolling statistics are built from cumulative sums of the values and their
+products: the sum over any window is the difference of two cumulative
+sums, so a whole series costs O(n) whatever the window.  The cumulative
+sums are kept in extended precision (numpy.longdouble) and the values are
+centered first so that the differences stay precise on long series.
+Windows holding a NaN value are NaN, like the pandas rolling functions.
+"""
+import numpy as np
+
+# Response surface (beta infinity, beta 1, beta 2) of the critical values of
+# the Engle-Granger cointegration test of two series with a constant, by
+# significance level (MacKinnon, "Critical Values for Cointegration Tests",
+# 2010, table 2, N = 2).  See engle_granger_critical_value().
+ENGLE_GRANGER_CRITICAL_VALUES = {0.01: (-3.89644, -10.9519, -22.527),
+                                 0.05: (-3.33613, -6.1101, -6.823),
+                                 0.10: (-3.04445, -4.2412, -2.720)}
+
+def rolling_ols(y_values, x_values, window):
+    """
+    Ordinary least squares regression of y on x (with an intercept) over
+    the last window bars of every bar.
+    @type y_values: numpy.ndarray
+    @type x_values: numpy.ndarray
+    @type window: int
+    @rtype: tuple
+    @return: The intercept and slope (hedge ratio) arrays.  Bars before
+    the first full window and windows where x is constant are NaN.
+    """
+    y_values, y_center = _centered(y_values)
+    x_values, x_center = _centered(x_values)
+    x_sums = _window_sums(x_values, window)
+    y_sums = _window_sums(y_values, window)
+    xx_sums = _window_sums(x_values * x_values, window)
+    xy_sums = _window_sums(x_values * y_values, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = window * xx_sums - x_sums * x_sums
+        slope = (window * xy_sums - x_sums * y_sums) / variance
+        slope[~(variance > 1e-12 * window * xx_sums)] = np.nan # Constant x
+    intercept = (y_sums - slope * x_sums) / window + y_center - slope * x_center
+    return intercept, slope
+
+def rolling_zscore(values, window):
+    """
+    Number of standard deviations (sample) between every value and the
+    mean of the last window values, same as
+    (values - pandas.rolling_mean()) / pandas.rolling_std().
+    @type values: numpy.ndarray
+    @type window: int
+    @rtype: numpy.ndarray
+    """
+    centered, center = _centered(values)
+    sums = _window_sums(centered, window)
+    squares = _window_sums(centered * centered, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (squares - sums * sums / window) / (window - 1)
+        variance[variance < 0] = 0.0 # Rounding errors
+        return (np.asarray(values, dtype=np.float64) - (sums / window + center)) \
+               / np.sqrt(variance)
+
+def ols(y_values, x_values):
+    """
+    Ordinary least squares regression of y on x (with an intercept) over
+    the bars where both are known.
+    @rtype: tuple
+    @return: The intercept and slope, NaN when x is constant.
+    """
+    y_values = np.asarray(y_values, dtype=np.float64)
+    x_values = np.asarray(x_values, dtype=np.float64)
+    known = np.isfinite(y_values) & np.isfinite(x_values)
+    y_values, x_values = y_values[known], x_values[known]
+    if len(x_values) < 2:
+        return np.nan, np.nan
+    x_deviations = x_values - x_values.mean()
+    variance = np.dot(x_deviations, x_deviations)
+    if variance == 0:
+        return np.nan, np.nan
+    slope = np.dot(x_deviations, y_values - y_values.mean()) / variance
+    return y_values.mean() - slope * x_values.mean(), slope
+
+def dickey_fuller(values):
+    """
+    Dickey-Fuller regression of the changes of the values on their
+    previous value (with a constant): change = c + gamma * previous.
+    @rtype: tuple
+    @return: The t-statistic of gamma (the more negative, the more mean
+    reverting the values) and gamma.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) < 4:
+        return np.nan, np.nan
+    previous, changes = values[:-1], np.diff(values)
+    intercept, gamma = ols(changes, previous)
+    if gamma != gamma:
+        return np.nan, np.nan
+    residuals = changes - intercept - gamma * previous
+    deviations = previous - previous.mean()
+    variance = np.dot(residuals, residuals) / (len(changes) - 2)
+    standard_error = np.sqrt(variance / np.dot(deviations, deviations))
+    if standard_error == 0:
+        return np.nan, gamma
+    return gamma / standard_error, gamma
+
+def engle_granger(y_values, x_values):
+    """
+    Engle-Granger two-step cointegration test of y and x: the residuals of
+    the regression of y on x are tested for a unit root (see
+    dickey_fuller() and engle_granger_critical_value()).
+    @rtype: tuple
+    @return: The intercept, hedge ratio, test statistic and half-life (in
+    bars) of the mean reversion of the spread (NaN when not reverting).
+    """
+    y_values = np.asarray(y_values, dtype=np.float64)
+    x_values = np.asarray(x_values, dtype=np.float64)
+    intercept, hedge_ratio = ols(y_values, x_values)
+    statistic, gamma = dickey_fuller(y_values - intercept - hedge_ratio * x_values)
+    half_life = np.nan
+    if -1 < gamma < 0:
+        half_life = -np.log(2) / np.log(1 + gamma)
+    return intercept, hedge_ratio, statistic, half_life
+
+def engle_granger_critical_value(significance, bars):
+    """
+    Critical value of the Engle-Granger test statistic on a number of bars:
+    beta infinity + beta 1 / bars + beta 2 / bars ** 2 (see
+    ENGLE_GRANGER_CRITICAL_VALUES).  The two series are cointegrated at the
+    significance level when the statistic is below it.
+    @type significance: float
+    @param significance: One of ENGLE_GRANGER_CRITICAL_VALUES.
+    @type bars: int
+    @param bars: Number of bars tested, or an array of them.
+    @rtype: float
+    @return: The critical value, or an array of them.
+    """
+    beta_infinity, beta_1, beta_2 = ENGLE_GRANGER_CRITICAL_VALUES[significance]
+    bars = np.asarray(bars, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return beta_infinity + beta_1 / bars + beta_2 / (bars * bars)
+
+def _centered(values):
+    """
+    Returns the values minus their mean (of the known values) and the mean.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    known = np.isfinite(values)
+    center = values[known].mean() if known.any() else 0.0
+    return values - center, center
+
+def _window_sums(values, window):
+    """
+    Returns the sum of the last window values of every bar, NaN before the
+    first full window and for windows holding a NaN value.
+    """
+    nans = np.isnan(values)
+    totals = np.zeros(len(values) + 1, dtype=np.longdouble)
+    np.cumsum(np.where(nans, 0.0, values), dtype=np.longdouble, out=totals[1:])
+    nan_counts = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(nans, out=nan_counts[1:])
+    sums = np.full(len(values), np.nan)
+    if window > len(values):
+        return sums
+    sums[window - 1:] = (totals[window:] - totals[:-window]).astype(np.float64)
+    sums[window - 1:][nan_counts[window:] != nan_counts[:-window]] = np.nan
+    return sums
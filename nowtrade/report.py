@@ -29,6 +29,11 @@ class Report(object):
         self.available_capital_history = pd.Series(index=self.strategy.dataset.data_frame.index)
         self.ongoing_trades = {}
         self.trades = 0
+        # Running totals, the averages are calculated from these
+        self.total_gain = 0.0
+        self.total_trading_amount = 0.0
+        self.total_winning_gain = 0.0
+        self.total_losing_gain = 0.0
         self.average_gain = 0.0
         self.sharpe_ratio = 0.0
         self.average_trading_amount = 0.0
@@ -56,28 +61,43 @@ class Report(object):
         as technical indicators.  IE: P/L, ACTIONS, STATUS, etc
         This only updates the last data entry.
         """
-        if symbol not in self.ongoing_trades:
-            self.ongoing_trades[symbol] = None
         if 'PL_%s' %symbol not in data_frame:
             data_frame['PL_%s' %symbol] = pd.Series(index=data_frame.index)
         if 'CHANGE_VALUE_%s' %symbol not in data_frame:
             data_frame['CHANGE_VALUE_%s' %symbol] = pd.Series(index=data_frame.index)
         if 'CHANGE_PERCENT_%s' %symbol not in data_frame:
             data_frame['CHANGE_PERCENT_%s' %symbol] = pd.Series(index=data_frame.index)
+        profit_loss, change, percent_change = \
+            self.get_preprocess_metrics(symbol,
+                                        data_frame['ACTIONS_%s' %symbol][-1],
+                                        data_frame['STATUS_%s' %symbol][-1],
+                                        data_frame['%s_Open' %symbol][-1],
+                                        data_frame['%s_Close' %symbol][-1])
+        last = data_frame.index[-1]
+        data_frame.loc[last, 'PL_%s' %symbol] = profit_loss
+        data_frame.loc[last, 'CHANGE_VALUE_%s' %symbol] = change
+        data_frame.loc[last, 'CHANGE_PERCENT_%s' %symbol] = percent_change
+
+    def get_preprocess_metrics(self, symbol, action, status, open_value, close_value):
+        """
+        Same as add_preprocess_metrics() except the values of the current bar
+        are supplied directly and the (P/L, change value, change percent)
+        tuple is returned instead of being written to a data frame.
+        """
+        if symbol not in self.ongoing_trades:
+            self.ongoing_trades[symbol] = None
         trade = self.ongoing_trades[symbol]
-        action = data_frame['ACTIONS_%s' %symbol][-1]
         exiting = action == LONG_EXIT or action == SHORT_EXIT
+        self._require_finalize_calculations = True
         if trade and exiting: # Exiting Ongoing Trade
-            _exiting_ongoing_trade(data_frame, trade, action)
+            return _exiting_ongoing_trade(trade, action, open_value)
         elif trade: # Ongoing Trade
-            _ongoing_trade(data_frame, trade)
-        elif data_frame['ACTIONS_%s' %symbol][-1] != 0: # New Enter/Exit Trade
-            _new_trade(data_frame, symbol, self.trading_profile, self.available_money)
-        else: # Not in trade
-            data_frame['PL_%s' %symbol][-1] = np.nan
-            data_frame['CHANGE_VALUE_%s' %symbol][-1] = np.nan
-            data_frame['CHANGE_PERCENT_%s' %symbol][-1] = np.nan
-        self._require_finalize_calculations = True
+            return _ongoing_trade(trade, status, close_value)
+        elif action != 0: # New Enter/Exit Trade
+            return _new_trade(status, open_value, close_value,
+                              self.trading_profile, self.available_money)
+        # Not in trade
+        return np.nan, np.nan, np.nan
 
     def handle_action(self, symbol, data_frame):
         """
@@ -86,7 +106,13 @@ class Report(object):
         """
         datetime = data_frame.index[-1]
         data = data_frame.iloc[-1]
-        action = data['ACTIONS_%s' %symbol]
+        self.execute_action(symbol, data['ACTIONS_%s' %symbol], data, datetime)
+
+    def execute_action(self, symbol, action, data, datetime):
+        """
+        Same as handle_action() except the action, bar data (anything
+        providing the symbol's Open) and datetime are supplied directly.
+        """
         if action == LONG:
             self.long(data, datetime, symbol)
         elif action == SHORT:
@@ -107,7 +133,7 @@ class Report(object):
         slippage = money * self.trading_profile.slippage / 100
         self.total_fees += fee
         self.total_slippage += slippage
-        self.average_trading_amount += money
+        self.total_trading_amount += money
         self.available_money -= (money + fee + slippage)
         trade = Trade(datetime, 'LONG', symbol, price, shares, money, fee, slippage)
         self.ongoing_trades[symbol] = trade
@@ -135,7 +161,7 @@ class Report(object):
         slippage = money * self.trading_profile.slippage / 100
         self.total_fees += fee
         self.total_slippage += slippage
-        self.average_trading_amount += money
+        self.total_trading_amount += money
         self.available_money -= (money + fee + slippage)
         self.ongoing_trades[symbol] = Trade(datetime,
                                             'SHORT',
@@ -180,7 +206,7 @@ class Report(object):
         profit_loss -= slippage # Minus Slippage Out
         self.available_money += (money - fee - slippage)
         gains = profit_loss / (money - fee - slippage)
-        self.average_gain += gains
+        self.total_gain += gains
         self.capital += profit_loss
         self.trade_history[symbol].append(Trade(datetime,
                                                 'LONG_EXIT',
@@ -194,11 +220,11 @@ class Report(object):
         self.available_capital_history[datetime] = self.capital
         if gains > 0:
             self.winning_trades += 1
-            self.average_winning_gain += gains
+            self.total_winning_gain += gains
             self.gross_profit += profit_loss
         else:
             self.losing_trades += 1
-            self.average_losing_gain += gains
+            self.total_losing_gain += gains
             self.gross_loss += profit_loss
         self.trades += 1
 
@@ -224,7 +250,7 @@ class Report(object):
         profit_loss -= slippage # Minus Slippage Out
         self.available_money += (money - fee - slippage)
         gains = profit_loss / (money - fee - slippage)
-        self.average_gain += gains
+        self.total_gain += gains
         self.capital += profit_loss
         self.trade_history[symbol].append(Trade(datetime,
                                                 'SHORT_EXIT',
@@ -238,11 +264,11 @@ class Report(object):
         self.available_capital_history[datetime] = self.capital
         if gains > 0:
             self.winning_trades += 1
-            self.average_winning_gain += gains
+            self.total_winning_gain += gains
             self.gross_profit += profit_loss
         else:
             self.losing_trades += 1
-            self.average_losing_gain += gains
+            self.total_losing_gain += gains
             self.gross_loss += profit_loss
         self.trades += 1
 
@@ -250,20 +276,25 @@ class Report(object):
         """
         Finalizes all report metric calculations, such as average gains,
         average trading amount, average fees, average slippage, etc.
+        Can be called any number of times, IE: while a strategy is running.
         """
         if self.trades == 0:
             # No trades for this time period
             return
-        self.average_gain = self.average_gain / self.trades
-        self.average_trading_amount = self.average_trading_amount / self.trades
+        self.average_gain = self.total_gain / self.trades
+        self.average_trading_amount = self.total_trading_amount / self.trades
         self.average_fees = self.total_fees / self.trades
         self.average_slippage = self.total_slippage / self.trades
         if self.winning_trades != 0:
-            self.average_winning_gain = self.average_winning_gain / self.winning_trades
+            self.average_winning_gain = self.total_winning_gain / self.winning_trades
         if self.losing_trades != 0:
-            self.average_losing_gain = self.average_losing_gain / self.losing_trades
+            self.average_losing_gain = self.total_losing_gain / self.losing_trades
         self.percent_profitable = self.winning_trades * 1.0 / self.trades * 100
         self.net_profit = self.gross_profit + self.gross_loss
+        # Cover the bars added to the dataset since the report was created
+        index = self.available_capital_history.index.union(self.strategy.dataset.data_frame.index)
+        self.available_money_history = self.available_money_history.reindex(index)
+        self.available_capital_history = self.available_capital_history.reindex(index)
         # Capital history should start at trading_profile.capital, not at nan/0
         if np.isnan(self.available_capital_history[0]):
             self.available_capital_history[0] = self.trading_profile.capital
@@ -374,14 +405,11 @@ class Report(object):
         ret += 'Ongoing Trades: %s' %overview['ongoing_trades']
         return ret
 
-def _new_trade(data_frame, symbol, trading_profile, available_money):
+def _new_trade(status, open_value, close_value, trading_profile, available_money):
     """
-    Helper function that populates the dataframe with trade information
-    based on a new trade in the market.
+    Helper function that returns the trade information based on a new trade
+    in the market.
     """
-    status = data_frame['STATUS_%s' %symbol][-1]
-    open_value = data_frame['%s_Open' %symbol][-1]
-    close_value = data_frame['%s_Close' %symbol][-1]
     change = close_value - open_value
     shares = trading_profile.trading_amount.get_shares(open_value, available_money)
     fee = trading_profile.trading_fee.get_fee(open_value, shares)
@@ -390,32 +418,25 @@ def _new_trade(data_frame, symbol, trading_profile, available_money):
     percent_change = profit_loss / money
     if status < 0: # Shorting
         profit_loss = profit_loss * -1
-    data_frame['PL_%s' %symbol][-1] = profit_loss - fee
-    data_frame['CHANGE_VALUE_%s' %symbol][-1] = change
-    data_frame['CHANGE_PERCENT_%s' %symbol][-1] = percent_change
+    return profit_loss - fee, change, percent_change
 
-def _ongoing_trade(data_frame, trade):
+def _ongoing_trade(trade, status, close_value):
     """
-    Helper function that populates the dataframe with trade information
-    from an ongoing trade in the market.
+    Helper function that returns the trade information from an ongoing trade
+    in the market.
     """
-    status = data_frame['STATUS_%s' %trade.symbol][-1]
-    close_value = data_frame['%s_Close' %trade.symbol][-1]
     enter_change = close_value - trade.price
     percent_change = enter_change / trade.price
     profit_loss = percent_change * trade.money
     if status < 0: # Shorting
         profit_loss = profit_loss * -1
-    data_frame['PL_%s' %trade.symbol][-1] = profit_loss - trade.fee
-    data_frame['CHANGE_VALUE_%s' %trade.symbol][-1] = enter_change
-    data_frame['CHANGE_PERCENT_%s' %trade.symbol][-1] = percent_change
+    return profit_loss - trade.fee, enter_change, percent_change
 
-def _exiting_ongoing_trade(data_frame, trade, action):
+def _exiting_ongoing_trade(trade, action, open_value):
     """
-    Helper function that populates the dataframe with trade information
-    based on the exit action executed in the market.
+    Helper function that returns the trade information based on the exit
+    action executed in the market.
     """
-    open_value = data_frame['%s_Open' %trade.symbol][-1]
     enter_change = open_value - trade.price
     percent_change = enter_change / trade.price
     profit_loss = percent_change * trade.money
@@ -423,6 +444,4 @@ def _exiting_ongoing_trade(data_frame, trade, action):
         profit_loss = profit_loss * -1
     # We need to account for fees on both the enter and exit.
     fee = trade.fee * 2
-    data_frame['PL_%s' %trade.symbol][-1] = profit_loss - fee
-    data_frame['CHANGE_VALUE_%s' %trade.symbol][-1] = enter_change
-    data_frame['CHANGE_PERCENT_%s' %trade.symbol][-1] = percent_change
+    return profit_loss - fee, enter_change, percent_change
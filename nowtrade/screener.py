@@ -0,0 +1,300 @@
+"""
+The screener module evaluates criteria groups on the latest bar of every
+symbol of a large universe (IE: listing the symbols to trade at the open)
+without simulating any strategy.
+"""
+import multiprocessing
+import numpy as np
+import pandas as pd
+from nowtrade import logger
+from nowtrade.action import NO_ACTION, ACTIONS_MAP, determine_action
+from nowtrade.data_connection import NoDataException
+from nowtrade.dataset import Dataset
+from nowtrade.strategy import window_size, bars_required
+from nowtrade.symbol_list import SymbolList
+
+# Columns of every symbol loaded by the data connections
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close']
+
+# Data connection, criteria factory and dataset settings of the current
+# worker process.  Set once per process so they are never sent with the tasks.
+_WORKER = {}
+
+class Screener(object):
+    """
+    Evaluates the criteria groups of every symbol of a universe on its
+    latest bar.
+
+    The criteria_factory is called with a single symbol dataset and its
+    symbol.  It adds the technical indicators it needs to the dataset and
+    returns the criteria groups to evaluate.  Only the last lookback bars
+    of every symbol are used to calculate the technical indicators.
+    Indicators that depend on the whole history (IE: EMA, RSI) are
+    approximations of their values over all the data.
+
+    The lookback and the bars loaded are worked out on the first run()
+    and kept for the following ones:
+     - When not provided, the lookback is the number of bars required by
+       the criteria and the warm up of the technical indicators of the
+       first symbol, and is used for every symbol.  The criteria_factory
+       is called on an empty dataset of the first symbol to find them,
+       no data is loaded.  Provide it when the criteria_factory builds
+       different criteria for some symbols.
+     - Datasets using a number of periods only load the last lookback
+       bars.  The others load the bars since the first of the last
+       lookback bars of the first symbol with data, whose bars are loaded
+       once without any technical indicator.  Symbols with fewer bars
+       since then (IE: missing bars) are loaded again in full.
+
+    There is no position in a screener: the criteria groups are evaluated
+    as if the strategy was out of the market (IE: Not(InMarket) is True,
+    StopLoss and TakeProfit are False).
+
+    Example:
+        def factory(dataset, symbol):
+            sma = technical_indicator.SMA(symbol.close, 50)
+            dataset.add_technical_indicator(sma)
+            return [CriteriaGroup([CrossingAbove(symbol.close, sma)], Long(), symbol)]
+        screener = Screener(symbols, connection, factory, start_datetime=start)
+        results = screener.run()
+    """
+    def __init__(self, symbols, data_connection, criteria_factory, start_datetime=None, \
+                 end_datetime=None, periods=None, granularity=None, lookback=None, \
+                 processes=None):
+        """
+        @type symbols: list
+        @param symbols: The names of the symbols of the universe.
+        @type data_connection: DataConnection
+        @param data_connection: The connection every symbol is loaded from.
+        @type criteria_factory: function
+        @param criteria_factory: Module level function returning the
+        criteria groups of a symbol.
+        @type start_datetime: datetime
+        @type end_datetime: datetime
+        @type periods: int
+        @type granularity: int
+        @param granularity: Same as the Dataset's.
+        @type lookback: int
+        @param lookback: Number of bars of every symbol to use.
+        @type processes: int
+        @param processes: Number of worker processes (defaults to the number
+        of CPUs).  A value of 1 screens every symbol in the current process.
+        """
+        self.symbols = symbols
+        self.data_connection = data_connection
+        self.criteria_factory = criteria_factory
+        self.start_datetime = start_datetime
+        self.end_datetime = end_datetime
+        self.periods = periods
+        self.granularity = granularity
+        self.lookback = lookback
+        self.processes = processes
+        self.missing = [] # Symbols without data on the last run
+        self.bounds = None # Lookback and first datetime loaded, see _bounds()
+        self.logger = logger.Logger(self.__class__.__name__)
+        self.logger.info('Initialized - %s' %self)
+    def __str__(self):
+        return 'Screener(symbols=%s, data_connection=%s, criteria_factory=%s, \
+start_datetime=%s, end_datetime=%s, periods=%s, granularity=%s, lookback=%s, processes=%s)' \
+               %(len(self.symbols), self.data_connection, self.criteria_factory.__name__, \
+                 self.start_datetime, self.end_datetime, self.periods, self.granularity, \
+                 self.lookback, self.processes)
+    def __repr__(self):
+        return self.__str__()
+
+    def get_lookback(self):
+        """
+        Returns the number of bars used for every symbol: the lookback
+        provided or the bars required by the first symbol (None when
+        unknown, every bar is then used).
+        """
+        return self._bounds()[0]
+
+    def _bounds(self):
+        """
+        Returns the lookback and the first datetime to load of every symbol
+        not loaded by number of periods: the datetime of the first of the
+        last lookback bars of the first symbol with data (None when every
+        bar is loaded).  Worked out once and kept in the bounds attribute.
+        """
+        if self.bounds is None:
+            lookback = self.lookback
+            if lookback is None:
+                lookback = self._required_bars()
+            self.bounds = lookback, self._start(lookback)
+        return self.bounds
+
+    def _required_bars(self):
+        """
+        Returns the number of bars required by the criteria and the warm up
+        of the technical indicators of the first symbol (None when unknown).
+        The criteria_factory is called on a dataset without any bar.
+        """
+        if not self.symbols:
+            return None
+        symbol_list = SymbolList([self.symbols[0]])
+        symbol = list(symbol_list)[0]
+        dataset = Dataset(symbol_list, self.data_connection, *self._dataset_settings())
+        dataset.data_frame = pd.DataFrame(columns=['%s_%s' %(symbol, column) \
+                                                   for column in COLUMNS], \
+                                          index=pd.DatetimeIndex([]), dtype=np.float64)
+        criteria_groups = self.criteria_factory(dataset, symbol)
+        return bars_required(window_size(criteria_groups), dataset.technical_indicators)
+
+    def _start(self, lookback):
+        """
+        Returns the datetime of the first of the last lookback bars of the
+        first symbol with data, None when the datasets use a number of
+        periods or every bar is required.
+        """
+        if self.periods or not lookback or not self.symbols:
+            return None
+        _init_worker(self.data_connection, self.criteria_factory, \
+                     self._dataset_settings(), None, None)
+        try:
+            for symbol in self.symbols:
+                dataset = _load_dataset(symbol, *self._dataset_settings())
+                if not dataset.data_frame.empty:
+                    break
+        finally:
+            _WORKER.clear()
+        if len(dataset.data_frame) < lookback:
+            return None
+        return dataset.data_frame.index[len(dataset.data_frame) - lookback]
+
+    def run(self, progress=None):
+        """
+        Screens every symbol and returns the ones with an action.
+        @type progress: function
+        @param progress: Called after every symbol with the number of
+        symbols screened and the total number of symbols.
+        @rtype: pandas.DataFrame
+        @return: One row per symbol with an action on its latest bar,
+        holding the symbol, the datetime of the bar and the action, in the
+        order of the symbols.  The symbols that could not be loaded are
+        kept in the missing attribute.
+        """
+        lookback, start = self._bounds()
+        self.logger.info('Screening %s symbols (lookback=%s, start=%s)' \
+                         %(len(self.symbols), lookback, start))
+        tasks = list(enumerate(self.symbols))
+        settings = (self.data_connection, self.criteria_factory, \
+                    self._dataset_settings(), lookback, start)
+        pool = None
+        if self.processes != 1:
+            pool = multiprocessing.Pool(self.processes, _init_worker, settings)
+        completed = []
+        try:
+            if pool is None:
+                _init_worker(*settings)
+                results = (_screen(task) for task in tasks)
+            else:
+                chunksize = max(1, len(tasks) // (4 * _cpus(self.processes)))
+                results = pool.imap_unordered(_screen, tasks, chunksize=chunksize)
+            for screened, result in enumerate(results, 1):
+                completed.append(result)
+                if progress is not None:
+                    progress(screened, len(tasks))
+        finally:
+            _WORKER.clear()
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        completed.sort()
+        self.missing = [symbol for _, symbol, action, _ in completed if action is None]
+        if self.missing:
+            self.logger.warning('No data for %s symbols: %s' %(len(self.missing), self.missing))
+        rows = [(symbol, datetime, ACTIONS_MAP[action]) \
+                for _, symbol, action, datetime in completed \
+                if action is not None and action != NO_ACTION]
+        return pd.DataFrame(rows, columns=['symbol', 'datetime', 'action'])
+
+    def _dataset_settings(self):
+        """
+        Returns the start_datetime, end_datetime, periods and granularity
+        of the datasets.
+        """
+        return self.start_datetime, self.end_datetime, self.periods, self.granularity
+
+def _cpus(processes):
+    """
+    Returns the number of worker processes of the pool.
+    """
+    return processes or multiprocessing.cpu_count()
+
+def _init_worker(data_connection, criteria_factory, dataset_settings, lookback, start):
+    """
+    Sets the data connection, criteria factory, dataset settings, lookback
+    and first datetime to load (see Screener._bounds()) of the process.
+    """
+    _WORKER['data_connection'] = data_connection
+    _WORKER['criteria_factory'] = criteria_factory
+    _WORKER['dataset_settings'] = dataset_settings
+    _WORKER['lookback'] = lookback
+    _WORKER['start'] = start
+
+def _load(symbol):
+    """
+    Loads the last lookback bars of the symbol and returns its dataset and
+    criteria groups, or None when the symbol has no data.
+    """
+    start_datetime, end_datetime, periods, granularity = _WORKER['dataset_settings']
+    lookback, start = _WORKER['lookback'], _WORKER['start']
+    if periods and lookback:
+        periods = min(periods, lookback)
+    dataset = _load_dataset(symbol, start or start_datetime, end_datetime, periods, granularity)
+    if start is not None and len(dataset.data_frame) < lookback:
+        # Missing bars since the start, every bar is needed
+        dataset = _load_dataset(symbol, start_datetime, end_datetime, periods, granularity)
+    if dataset.data_frame.empty:
+        return None
+    if lookback:
+        # A copy so that the technical indicators are not set on a view
+        dataset.data_frame = dataset.data_frame[-lookback:].copy()
+    criteria_groups = _WORKER['criteria_factory'](dataset, list(dataset.symbol_list)[0])
+    return dataset, criteria_groups
+
+def _load_dataset(symbol, start_datetime, end_datetime, periods, granularity):
+    """
+    Returns the dataset of the symbol with its data loaded, empty when the
+    symbol has no data.
+    """
+    dataset = Dataset(SymbolList([symbol]), _WORKER['data_connection'], start_datetime, \
+                      end_datetime, periods, granularity)
+    try:
+        dataset.load_data()
+    except NoDataException:
+        pass
+    return dataset
+
+def _screen(task):
+    """
+    Evaluates the criteria groups of a symbol on its latest bar and returns
+    the task number, the symbol, the action (None without data) and the
+    datetime of the bar.
+    """
+    number, symbol = task
+    screened = _load(symbol)
+    if screened is None:
+        return number, symbol, None, None
+    dataset, criteria_groups = screened
+    data_frame = dataset.data_frame[-(window_size(criteria_groups) or len(dataset.data_frame)):]
+    data_frame = _out_of_market(data_frame, set(str(crit_group.symbol) \
+                                                for crit_group in criteria_groups))
+    cache = {} # Criteria shared by several criteria groups are applied once
+    action = determine_action([crit_group.get_result(data_frame, cache=cache) \
+                               for crit_group in criteria_groups])
+    return number, symbol, action, data_frame.index[-1]
+
+def _out_of_market(data_frame, symbols):
+    """
+    Returns a copy of the data_frame with the actions, status and P/L
+    columns of a strategy that never entered the market.
+    """
+    data_frame = data_frame.copy()
+    for symbol in symbols:
+        data_frame['ACTIONS_%s' %symbol] = NO_ACTION
+        data_frame['STATUS_%s' %symbol] = 0
+        for name in ['PL', 'CHANGE_VALUE', 'CHANGE_PERCENT']:
+            data_frame['%s_%s' %(name, symbol)] = np.nan
+    return data_frame
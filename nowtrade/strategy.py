@@ -2,32 +2,94 @@
 Strategy module iterates through all trading data, coordinates all criteria
 groups with actions, and feeds information to the report object for metrics.
 """
+import copy
+import cPickle
+import numpy as np
 import pandas as pd
 from nowtrade import logger
-from nowtrade.action import LONG, SHORT, NO_ACTION, LONG_EXIT, SHORT_EXIT, ACTIONS_MAP
+from nowtrade.action import NO_ACTION, ACTIONS_MAP, determine_action, status_change
+# Still importable from the strategy module
+from nowtrade.action import LONG, SHORT, LONG_EXIT, SHORT_EXIT # pylint: disable=unused-import
 from nowtrade import report
+from nowtrade.bar_store import BarStore
+from nowtrade.exit_kernel import exit_kernel, kernel_checks
+from nowtrade.profiler import Profiler
+from nowtrade.trace import Trace
 
-# In process_new_data, when iterating through cg_data, we get the warning defined here:
-# http://pandas.pydata.org/pandas-docs/stable/indexing.html#indexing-view-versus-copy
-# This issue doesn't seem to affect our particular case.
-# This warning is being surpressed with the following line:
-pd.options.mode.chained_assignment = None
+EVENT = 'event'
+VECTORIZED = 'vectorized'
+
+class InvalidSimulationMode(Exception):
+    """
+    Exception raised when an unknown simulation mode is requested.
+    """
+    pass
+
+def load(strategy, dataset):
+    """
+    Load a previously saved strategy.
+    @type dataset: Dataset
+    @param dataset: The dataset of the strategy, which can hold new bars.
+    """
+    strategy = cPickle.loads(strategy)
+    strategy.dataset = dataset
+    return strategy
+
+def load_from_file(filename, dataset):
+    """
+    Load a strategy from a previous one saved to file.
+    @type dataset: Dataset
+    @param dataset: The dataset of the strategy, which can hold new bars.
+    """
+    file_handler = open(filename, 'rb')
+    strategy = cPickle.load(file_handler)
+    file_handler.close()
+    strategy.dataset = dataset
+    return strategy
+
+class UnboundedStrategy(Exception):
+    """
+    Exception raised when the number of bars a bounded strategy or run()
+    must keep is unknown and no max_bars was given.
+    """
+    pass
+
+class InvalidStrategyBatch(Exception):
+    """
+    Exception raised when the strategies of a batch do not share the same
+    dataset.
+    """
+    pass
 
 class Strategy(object):
     """
     All strategies perform the enter and exit actions on the OPEN of the bar.
     On every day, criterias are checked, and actions are queued up for the next
     open. This prevents lookahead bias.
+
+    A bounded strategy only keeps the bars required by its criteria and the
+    warm up of the dataset's technical indicators in realtime_data_frame.
+    Memory and processing time per bar then stay constant no matter how
+    long the strategy runs (IE: live trading).  The number of bars kept can
+    be given with max_bars, it is required when a criteria or technical
+    indicator does not tell how many bars it needs.
     """
-    def __init__(self, dataset, criteria_groups, trading_profile):
+    def __init__(self, dataset, criteria_groups, trading_profile, bounded=False, \
+                 max_bars=None):
         self.dataset = dataset
         self.criteria_groups = criteria_groups
         self.trading_profile = trading_profile
+        self.bounded = bounded
+        self.max_bars = max_bars
         self.name = 'Strategy'
         self.report = report.Report(self, self.trading_profile)
-        self.realtime_data_frame = pd.DataFrame() # Used for backtesting
+        self.bars = BarStore() # Used for backtesting
+        self.window_size = None # Bars required by the criteria
         self.first_pass = True # Flag to execute certain actions on first bar of backtest
         self.upcoming_actions = {}
+        self.technical_indicators = [] # Streamed by run()
+        self.profiler = None
+        self.trace = None
         self.logger = logger.Logger(self.__class__.__name__)
         self.logger.info('Initialized - %s' %self)
 
@@ -38,15 +100,339 @@ class Strategy(object):
         return 'Strategy(dataset=%s, criteria_groups=%s, trading_profile=%s)' \
                 %(self.dataset, self.criteria_groups, self.trading_profile)
 
-    def simulate(self):
+    def simulate(self, mode=EVENT):
         """
         The entry point to start the strategy simulation.
+        @type mode: string
+        @param mode: 'event' feeds the dataset one bar at a time through
+        process_new_data().  'vectorized' evaluates every criteria that does
+        not depend on the strategy's positions over the whole dataset at once
+        and only steps through the bars to resolve actions and positions.
+        Both modes produce the same trades and report.  The vectorized mode
+        always keeps every bar, even for bounded strategies.
+        Stateful criteria start over (see Criteria.reset()), resume() is
+        used to carry on with new bars instead.
+        """
+        self.logger.info('Simulating strategy (mode=%s)...' %mode)
+        if mode == VECTORIZED:
+            self._simulate_vectorized()
+            return
+        elif mode != EVENT:
+            raise InvalidSimulationMode('Unknown simulation mode: %s' %mode)
+        self.bars = BarStore(len(self.dataset.data_frame))
+        self.window_size = None
+        self.first_pass = True
+        self._reset_criteria()
+        data_frame = self.dataset.data_frame
+        for i in range(len(data_frame)):
+            self.process_new_data(data_frame[i:i + 1])
+
+    def resume(self):
+        """
+        Simulates the bars of the dataset that come after the last bar
+        processed.  Used to bring a saved strategy up to date with the
+        new bars of its dataset without simulating the whole history again.
+        """
+        data_frame = self.dataset.data_frame
+        start = 0
+        if not self.bars.is_empty():
+            start = data_frame.index.searchsorted(self.bars.get_index(), side='right')
+        self.logger.info('Resuming strategy (%s new bars)...' %(len(data_frame) - start))
+        for i in range(start, len(data_frame)):
+            self.process_new_data(data_frame[i:i + 1])
+
+    def run(self, stream):
+        """
+        Simulates the bars of a stream as they come and yields the actions
+        emitted.  The stream can be any iterable of bars (IE: a chunked file
+        reader, a database cursor, a replay of recorded candles or a live
+        feed) and is never held in memory as a whole.
+        Only the bars required by the criteria and the warm up of the
+        technical indicators are kept, like a bounded strategy.  The
+        technical indicators of the dataset missing from the stream carry
+        their streaming state on from the new bars alone (see
+        TechnicalIndicator.update_new_bars()), so recursive indicators
+        (IE: EMA, RSI, DX) get the same values as simulate().  The others
+        are calculated again on the bars kept, which is only the same as
+        simulate() for the ones that are not recursive: a warning is logged
+        for the recursive ones without streaming state (IE: BBANDS with a
+        KAMA moving average).
+        @type stream: iterable
+        @param stream: pandas.DataFrame of one or more bars, or pandas.Series
+        of a single bar named after its datetime, holding the OHLC of every
+        symbol of the dataset.
+        @rtype: generator
+        @return: (datetime, actions) for every bar emitting actions, actions
+        being the get_next_action() of the symbols to trade on the next open.
+        """
+        self.logger.info('Running strategy on a stream...')
+        self.bars = BarStore()
+        self.window_size = self._get_window_size()
+        self.first_pass = True
+        self._reset_criteria()
+        self._bound_bar_store()
+        # Copies so the streaming state of the dataset's indicators is left alone
+        self.technical_indicators = copy.deepcopy(self.dataset.technical_indicators)
+        for indicator in self.technical_indicators:
+            if indicator.recursive and not indicator.streams():
+                self.logger.warning('%s is recursive and has no streaming state, its values '
+                                    'will differ from simulate()' %indicator)
+        for data in stream:
+            if isinstance(data, pd.Series):
+                data = data.to_frame().T
+            data = self._calculate_technical_indicators(data)
+            for i in range(len(data)):
+                self.process_new_data(data[i:i + 1])
+                if any(self.upcoming_actions.values()):
+                    actions = self.get_next_action()
+                    yield data.index[i], dict((symbol, actions[symbol]) for symbol in actions \
+                                              if actions[symbol]['action'] != NO_ACTION)
+
+    def _calculate_technical_indicators(self, data):
+        """
+        Returns the new bars with the technical indicators of the dataset
+        that they are missing.  Technical indicators whose streaming state
+        stopped on the last bar stored are only fed the new bars.  The
+        others, and the ones after them, are updated along the bars already
+        stored (whose values are kept so streaming carries on).
+        """
+        missing = [indicator for indicator in self.technical_indicators \
+                   if indicator.value not in data]
+        if not missing:
+            return data
+        data = data.copy()
+        last_bar = None
+        if not self.bars.is_empty():
+            last_bar = self.bars.get_index()
+        data_frame = None # New bars along the bars stored, only when required
+        for indicator in missing:
+            if data_frame is None:
+                if indicator.streamed == last_bar and indicator.update_new_bars(data):
+                    continue
+                data_frame = self._stored_bars(data)
+            indicator.update(data_frame)
+        if data_frame is None:
+            return data
+        return data_frame[-len(data):]
+
+    def _stored_bars(self, data):
         """
-        self.logger.info('Simulating strategy...')
-        self.realtime_data_frame = pd.DataFrame()
-        for row_data in self.dataset.data_frame.iterrows():
-            data = row_data[1].to_frame().T
-            self.process_new_data(data)
+        Returns the bars stored followed by the new bars of data, without
+        the actions, status and P/L columns of the strategy.
+        """
+        if self.bars.is_empty():
+            return data
+        strategy_columns = self._strategy_columns()
+        columns = [column for column in self.bars.column_names \
+                   if column in data or column not in strategy_columns]
+        return pd.concat([self.bars.tail()[columns], data])
+
+    def _reset_criteria(self):
+        """
+        Resets the stateful criteria of every criteria group.
+        """
+        for crit_group in self.criteria_groups:
+            for criteria in crit_group.criteria_list:
+                if criteria.stateful:
+                    criteria.reset()
+
+    def _strategy_columns(self):
+        """
+        Returns the actions, status and P/L columns of every symbol.
+        """
+        return set('%s_%s' %(name, symbol) for symbol in self.dataset.symbol_list \
+                   for name in ['ACTIONS', 'STATUS', 'PL', 'CHANGE_VALUE', 'CHANGE_PERCENT'])
+
+    def save(self):
+        """
+        Returns the pickled strategy as a string.  It holds everything
+        required to resume() the strategy later: the bars processed, the
+        upcoming actions, the report and the state of the criteria.
+        The dataset is not saved, it is supplied when loading the strategy.
+        """
+        return cPickle.dumps(self, cPickle.HIGHEST_PROTOCOL)
+
+    def save_to_file(self, filename):
+        """
+        Saves a strategy to file, see save().
+        """
+        file_handler = open(filename, 'wb')
+        cPickle.dump(self, file_handler, cPickle.HIGHEST_PROTOCOL)
+        file_handler.close()
+
+    def __getstate__(self):
+        values = dict(self.__dict__)
+        values['dataset'] = None
+        return values
+
+    @property
+    def realtime_data_frame(self):
+        """
+        DataFrame holding every bar processed so far along with the actions,
+        status and P/L columns of every symbol.
+        """
+        return self.bars.data_frame()
+
+    @realtime_data_frame.setter
+    def realtime_data_frame(self, data_frame):
+        self.bars = BarStore(max(len(data_frame), 1))
+        self.bars.merge(data_frame)
+
+    def _simulate_vectorized(self):
+        """
+        Should not use this directly.  Use simulate(mode='vectorized') instead.
+        Criteria that are not path dependent are evaluated once over the whole
+        dataset.  The remaining work (actions, status, P/L and path dependent
+        criteria) is a single pass over numpy arrays following the same rules
+        as process_new_data().
+        Single symbol strategies whose path dependent criteria are positions
+        and exits (InMarket, IsLong, IsShort, StopLoss, TakeProfit,
+        TrailingStop) resolve their actions with the exit kernel instead of
+        applying those criteria bar by bar.
+        """
+        data_frame = self.dataset.data_frame
+        bars = BarStore(len(data_frame))
+        bars.merge(data_frame)
+        groups, window = self.prepare_simulation(bars)
+        symbols = [str(symbol) for symbol in self.dataset.symbol_list]
+        kernel_groups = None
+        if self.trace is None: # The exit kernel does not apply the criteria
+            kernel_groups = _kernel_groups(groups, symbols)
+        if kernel_groups is None:
+            for i in range(len(data_frame)):
+                self._profile('simulate_bar', self.simulate_bar, groups, window, i)
+        else:
+            symbol = symbols[0]
+            actions, statuses, metrics, upcoming = \
+                self._profile('exit_kernel', exit_kernel, data_frame['%s_Open' %symbol].values,
+                              data_frame['%s_Close' %symbol].values, kernel_groups,
+                              self.report, symbol, self.bars.get_index)
+            self.bars.set_values('ACTIONS_%s' %symbol, actions)
+            self.bars.set_values('STATUS_%s' %symbol, statuses)
+            for column, name in enumerate(['PL', 'CHANGE_VALUE', 'CHANGE_PERCENT']):
+                self.bars.set_values('%s_%s' %(name, symbol), metrics[:, column])
+            self.upcoming_actions[symbol] = upcoming
+        self.first_pass = False
+
+    def prepare_simulation(self, bars):
+        """
+        Prepares a vectorized simulation over the bars provided.  Returns
+        the split criteria groups and the window handed to the path
+        dependent criteria.  Used by simulate(mode='vectorized') and
+        StrategyBatch.
+        """
+        self.bars = bars
+        for symbol in self.dataset.symbol_list:
+            self._create_actions_status_columns(symbol)
+        if self.trace is not None:
+            self.trace.set_index(self.dataset.data_frame.index)
+        cache = {} # Criteria shared by several criteria groups are evaluated once
+        copies = {} # Stateful criteria of this strategy, see _split_criteria_group()
+        groups = [self._split_criteria_group(crit_group, self.dataset.data_frame, cache, copies) \
+                  for crit_group in self.criteria_groups]
+        return groups, _BarWindow(self.bars.columns, self.bars.index)
+
+    def simulate_bar(self, groups, window, i):
+        """
+        Vectorized simulation of bar i, see prepare_simulation().
+        """
+        window.end = i + 1
+        for symbol in self.dataset.symbol_list:
+            self._process_bar(symbol, i)
+        cg_data = {}
+        cache = {}
+        for crit_group, mask, path_dependent in groups:
+            if crit_group.symbol not in cg_data:
+                cg_data[crit_group.symbol] = []
+            # Stateful criteria (TrailingStop) are applied on every bar
+            # since they update their own state, the others only as long
+            # as every criteria of the group is True.
+            passed = mask[i]
+            for criteria, key, position in path_dependent:
+                if passed or criteria.stateful:
+                    if key not in cache:
+                        cache[key] = self._profile(('apply', criteria), criteria.apply, window)
+                    if self.trace is not None:
+                        self.trace.set(crit_group, i, position, cache[key])
+                    passed = cache[key] and passed
+            if passed:
+                cg_data[crit_group.symbol].append(crit_group.raw_action())
+            else:
+                cg_data[crit_group.symbol].append(NO_ACTION)
+        for symbol in cg_data:
+            self.upcoming_actions[symbol] = self._determine_action(cg_data[symbol])
+
+    def _split_criteria_group(self, crit_group, data_frame, cache, copies):
+        """
+        Returns the criteria group, the combined result of its criteria that
+        are not path dependent for every bar and its path dependent criteria
+        along with their keys and positions.
+        Stateful criteria are replaced by the copies kept in copies, the
+        same for every criteria group of the strategy, so that strategies
+        sharing them (IE: StrategyBatch) do not share their state.  The
+        copies start over, see Criteria.reset().
+        """
+        path_dependent = []
+        for position, criteria in enumerate(crit_group.criteria_list):
+            if not criteria.path_dependent:
+                continue
+            key = criteria.key()
+            if criteria.stateful:
+                criteria = copy.deepcopy(criteria, copies)
+                criteria.reset()
+            path_dependent.append((criteria, key, position))
+        mask = crit_group.evaluate_all(data_frame, self.profiler, cache, self.trace)
+        return crit_group, mask, path_dependent
+
+    def _process_bar(self, symbol, position=-1):
+        """
+        Updates the action, status and P/L columns of the bar at position
+        and lets the report handle the action.
+        """
+        action = self.upcoming_actions.get(symbol, NO_ACTION)
+        self.bars.set('ACTIONS_%s' %symbol, action, position)
+        self.bars.set('STATUS_%s' %symbol, self._get_status(symbol, position), position)
+        open_value = self.bars.get('%s_Open' %symbol, position)
+        metrics = self._profile('add_preprocess_metrics', self.report.get_preprocess_metrics,
+                                str(symbol), action, self.bars.get('STATUS_%s' %symbol, position),
+                                open_value, self.bars.get('%s_Close' %symbol, position))
+        self.bars.set('PL_%s' %symbol, metrics[0], position)
+        self.bars.set('CHANGE_VALUE_%s' %symbol, metrics[1], position)
+        self.bars.set('CHANGE_PERCENT_%s' %symbol, metrics[2], position)
+        self._profile('handle_action', self.report.execute_action, symbol, action,
+                      {'%s_Open' %symbol: open_value}, self.bars.get_index(position))
+
+    def enable_profiler(self):
+        """
+        Records the wall time and number of calls of every phase of the
+        simulation: process_new_data, merge, add_preprocess_metrics,
+        handle_action, criteria_window, get_result of every criteria group
+        and apply of every criteria (simulate_bar and evaluate_all for the
+        vectorized mode).  Call profiler.table() once the simulation is done.
+        @rtype: Profiler
+        """
+        self.profiler = Profiler()
+        return self.profiler
+
+    def enable_trace(self):
+        """
+        Records the outcome of the criteria of every criteria group on every
+        bar of the simulation as packed bits (see Trace), to find out why
+        the strategy did or did not trade without DEBUG logging.  Use
+        trace.failing() or trace.outcomes() once the simulation is done.
+        The vectorized mode does not use the exit kernel when tracing.
+        @rtype: Trace
+        """
+        self.trace = Trace()
+        return self.trace
+
+    def _profile(self, section, function, *args):
+        """
+        Calls the function, timing it when the profiler is enabled.
+        """
+        if self.profiler is None:
+            return function(*args)
+        return self.profiler.call(section, function, *args)
 
     def process_new_data(self, data):
         """
@@ -58,31 +444,36 @@ class Strategy(object):
         contained in data. However, more data means more computationally
         intensive.
         """
+        self._profile('process_new_data', self._process_new_data, data)
+
+    def _process_new_data(self, data):
+        """
+        Should not use this directly.  Use process_new_data() instead.
+        """
         self.logger.debug(data.index[-1])
-        self.realtime_data_frame = self.realtime_data_frame.combine_first(data)
+        if self.window_size is None:
+            self.window_size = self._get_window_size()
+            if self.bounded:
+                self._bound_bar_store()
+        self._profile('merge', self.bars.merge, data)
         # Process Standard Metrics
         for symbol in self.dataset.symbol_list:
             if self.first_pass:
-                self._create_actions_status_columns(self.realtime_data_frame, symbol)
-            # Add previous action and status to dataset
-            # Keep track of market actions for each symbol
-            try:
-                self.realtime_data_frame['ACTIONS_%s' %symbol][-1] = self.upcoming_actions[symbol]
-            except KeyError:
-                self.realtime_data_frame['ACTIONS_%s' %symbol][-1] = NO_ACTION
-            # Keep track of market position for each symbol
-            self.realtime_data_frame['STATUS_%s' %symbol][-1] = self._get_status(symbol)
-            # Update the PL's
-            self.report.add_preprocess_metrics(str(symbol), self.realtime_data_frame)
-            # Update Report
-            self.report.handle_action(symbol, self.realtime_data_frame)
+                self._create_actions_status_columns(symbol)
+            # Keep track of market actions, positions and P/L for each symbol
+            self._process_bar(symbol)
         self.first_pass = False
-        # Process criteria
+        # Process criteria on the bars they require only
+        data_frame = self._profile('criteria_window', self.bars.tail, self.window_size or None)
+        if self.trace is not None:
+            self.trace.add_bar(data_frame.index[-1])
         cg_data = {}
+        cache = {} # Criteria shared by several criteria groups are applied once
         for crit_group in self.criteria_groups:
             if crit_group.symbol not in cg_data:
                 cg_data[crit_group.symbol] = []
-            cg_result = crit_group.get_result(self.realtime_data_frame)
+            cg_result = self._profile(('get_result', crit_group), crit_group.get_result, \
+                                      data_frame, self.profiler, cache, self.trace)
             cg_data[crit_group.symbol].append(cg_result)
         self.logger.debug('Criteria Group Data: %s' %cg_data)
         # Determine action based on all criteria group results
@@ -91,7 +482,37 @@ class Strategy(object):
             self.logger.debug('Upcoming Action for %s: %s' %(symbol, symbol_action))
             # Do the action on the Open of the next bar
             self.upcoming_actions[symbol] = symbol_action
-        self.logger.debug('New data:\n%s' %self.realtime_data_frame.tail(1).to_string())
+        if self.logger.debug_enabled():
+            self.logger.debug('New data:\n%s' %self.bars.tail(1).to_string())
+
+    def _get_window_size(self):
+        """
+        Returns the number of bars required by the criteria, or 0 when at
+        least one of them requires every bar.
+        """
+        return window_size(self.criteria_groups)
+
+    def _get_max_bars(self):
+        """
+        Returns the number of bars kept by a bounded strategy: max_bars when
+        given, else the bars required by the criteria and technical
+        indicators, or None when they are unknown.
+        """
+        if self.max_bars is not None:
+            return self.max_bars
+        return bars_required(self.window_size, self.dataset.technical_indicators)
+
+    def _bound_bar_store(self):
+        """
+        Replaces the bar store with one that only keeps the bars required.
+        """
+        max_bars = self._get_max_bars()
+        if max_bars is None:
+            raise UnboundedStrategy('Unknown number of bars required, max_bars must be given')
+        self.logger.info('Keeping the last %s bars' %max_bars)
+        bars = BarStore(max_bars=max_bars)
+        bars.merge(self.bars.data_frame())
+        self.bars = bars
 
     def get_next_action(self):
         """
@@ -101,7 +522,7 @@ class Strategy(object):
         actions = {}
         for symbol in self.upcoming_actions:
             action = self.upcoming_actions[symbol]
-            estimated_enter_value = self.realtime_data_frame['%s_Open' %symbol][-1]
+            estimated_enter_value = self.bars.get('%s_Open' %symbol)
             estimated_shares = self.trading_profile.trading_amount.get_shares(\
                                estimated_enter_value, self.report.available_money)
             actions[symbol] = {'action': action,
@@ -123,45 +544,143 @@ class Strategy(object):
             values = values.values
         except AttributeError:
             pass
-        if LONG in values and SHORT in values or \
-           LONG_EXIT in values and SHORT_EXIT in values:
-            return NO_ACTION
-        if LONG_EXIT in values:
-            return LONG_EXIT
-        if SHORT_EXIT in values:
-            return SHORT_EXIT
-        if LONG in values:
-            return LONG
-        if SHORT in values:
-            return SHORT
-        return NO_ACTION
-
-    def _get_status(self, symbol):
-        """
-        Helper method to get the current symbol status based the last action.
-        """
-        action = self.realtime_data_frame['ACTIONS_%s' %symbol][-1]
-        # Replace SHORT with -1 and SHORT_EXIT with 1
-        if action == SHORT:
-            action = -1
-        elif action == SHORT_EXIT:
-            action = 1
-        if len(self.realtime_data_frame) < 2:
+        return determine_action(values)
+
+    def _get_status(self, symbol, position=-1):
+        """
+        Helper method to get the symbol status at position based on its action.
+        """
+        action = status_change(self.bars.get('ACTIONS_%s' %symbol, position))
+        if position < 0:
+            position += len(self.bars)
+        if position < 1:
             return action
         else:
-            return self.realtime_data_frame['STATUS_%s' %symbol][-2] + action
+            return self.bars.get('STATUS_%s' %symbol, position - 1) + action
 
-    def _create_actions_status_columns(self, data_frame, symbol):
+    def _create_actions_status_columns(self, symbol):
         """
-        Helper method to create the symbol's actions and status column in
-        the data_frame.
+        Helper method to create the symbol's actions, status and P/L columns
+        in the bar store.
         """
-        cols = data_frame.columns
-        try:
-            cols.get_loc('ACTIONS_%s' %symbol)
-        except KeyError:
-            data_frame['ACTIONS_%s' %symbol] = NO_ACTION
-        try:
-            cols.get_loc('STATUS_%s' %symbol)
-        except KeyError:
-            data_frame['STATUS_%s' %symbol] = NO_ACTION
+        self.bars.add_column('ACTIONS_%s' %symbol, np.int64, NO_ACTION)
+        self.bars.add_column('STATUS_%s' %symbol, np.int64, NO_ACTION)
+        for name in ['PL', 'CHANGE_VALUE', 'CHANGE_PERCENT']:
+            self.bars.add_column('%s_%s' %(name, symbol))
+
+class StrategyBatch(object):
+    """
+    Simulates several strategies sharing the same dataset in a single pass
+    over its bars.  The market data is loaded once and shared read-only by
+    every strategy, each strategy only keeps its own actions, status and
+    P/L columns, criteria state and report.
+
+    The strategies are simulated the same way as simulate(mode='vectorized')
+    and produce the same reports.
+    """
+    def __init__(self, strategies):
+        self.strategies = strategies
+        self.logger = logger.Logger(self.__class__.__name__)
+        self.logger.info('Initialized - %s' %self)
+    def __str__(self):
+        return 'StrategyBatch(strategies=%s)' %self.strategies
+    def __repr__(self):
+        return 'StrategyBatch(strategies=%s)' %self.strategies
+
+    def simulate(self):
+        """
+        Simulates every strategy of the batch.
+        """
+        dataset = self.strategies[0].dataset
+        for strategy in self.strategies:
+            if strategy.dataset is not dataset:
+                raise InvalidStrategyBatch('Strategies must share the same dataset: %s' %strategy)
+        self.logger.info('Simulating %s strategies...' %len(self.strategies))
+        bars = BarStore(len(dataset.data_frame))
+        bars.merge(dataset.data_frame)
+        simulations = [(strategy,) + strategy.prepare_simulation(bars.share()) \
+                       for strategy in self.strategies]
+        for i in range(len(dataset.data_frame)):
+            for strategy, groups, window in simulations:
+                strategy.simulate_bar(groups, window, i)
+        for strategy in self.strategies:
+            strategy.first_pass = False
+
+    def reports(self):
+        """
+        Returns the report of every strategy, in the same order as the strategies.
+        """
+        return [strategy.report for strategy in self.strategies]
+
+def window_size(criteria_groups):
+    """
+    Returns the number of bars required by the criteria of the criteria
+    groups, or 0 when at least one of them requires every bar.
+    """
+    size = 1
+    for crit_group in criteria_groups:
+        for criteria in crit_group.criteria_list:
+            if not criteria.num_bars_required:
+                return 0
+            size = max(size, criteria.num_bars_required)
+    return size
+
+def bars_required(criteria_window_size, technical_indicators):
+    """
+    Returns the number of bars required by criteria needing
+    criteria_window_size bars (see window_size()) on top of the warm up of
+    the technical indicators, or None when it is unknown.
+    """
+    if not criteria_window_size:
+        return None
+    warm_up = 0
+    for technical_indicator in technical_indicators:
+        if technical_indicator.warm_up is None:
+            return None
+        warm_up = max(warm_up, technical_indicator.warm_up)
+    # The previous bar is always required to keep track of the status
+    return max(criteria_window_size + warm_up, 2)
+
+def _kernel_groups(groups, symbols):
+    """
+    Returns the criteria groups in the form expected by exit_kernel()
+    or None when the strategy can not be simulated by the exit kernel.
+    """
+    if len(symbols) != 1:
+        return None
+    symbol = symbols[0]
+    kernel_groups = []
+    for crit_group, mask, _ in groups:
+        checks = kernel_checks(crit_group.criteria_list, symbol)
+        if str(crit_group.symbol) != symbol or checks is None:
+            return None
+        kernel_groups.append((crit_group.raw_action(), mask, checks))
+    return kernel_groups
+
+class _BarWindow(object):
+    """
+    Lightweight stand-in for the realtime data frame used by the vectorized
+    simulation.  Every column is a numpy array truncated at the current bar.
+    Slicing the window (IE: window[-5:]) returns a window over those bars.
+    """
+    def __init__(self, columns, index):
+        self.columns = columns
+        self._index = index
+        self.start = 0
+        self.end = 0
+    def __getitem__(self, column):
+        if isinstance(column, slice):
+            start, end, _ = column.indices(len(self))
+            window = _BarWindow(self.columns, self._index)
+            window.start = self.start + start
+            window.end = self.start + max(start, end)
+            return window
+        return self.columns[column][self.start:self.end]
+    @property
+    def index(self):
+        """
+        The index (datetime64) of the bars of the window.
+        """
+        return self._index[self.start:self.end]
+    def __len__(self):
+        return self.end - self.start
@@ -0,0 +1,396 @@
+"""
+The streaming module holds the state technical indicators keep to calculate
+their value on a new bar in constant time (see TechnicalIndicator.update()).
+Every stream is fed the input values of one bar at a time through step()
+and returns the value(s) of the technical indicator on that bar.
+
+The values follow the same rules as the pandas and talib functions used by
+the results() of the technical indicators: talib skips the leading NaN
+values of its inputs and pandas rolling windows are NaN as long as they
+hold a NaN value.
+"""
+from collections import deque
+import talib
+
+NAN = float('nan')
+# Moving average types that can be streamed
+STREAMING_MA_TYPES = (talib.MA_Type.SMA, talib.MA_Type.EMA, talib.MA_Type.T3)
+
+def is_zero(value):
+    """
+    Same as the TA_IS_ZERO macro of talib.
+    """
+    return -0.00000001 < value < 0.00000001
+
+def true_range(high, low, previous_close):
+    """
+    Same as talib.TRANGE().
+    """
+    return max(high - low, abs(previous_close - high), abs(previous_close - low))
+
+class Window(object):
+    """
+    The last period values along with their running sum and sum of squares.
+    step() returns the same as pandas.rolling_mean() and talib.SMA().
+    """
+    def __init__(self, period):
+        self.period = period
+        self.values = deque()
+        self.total = 0.0
+        self.squares = 0.0
+        self.nans = 0
+    def push(self, value):
+        """
+        Adds the value of the next bar, dropping the oldest one.
+        """
+        if len(self.values) == self.period:
+            oldest = self.values.popleft()
+            if oldest != oldest:
+                self.nans -= 1
+            else:
+                self.total -= oldest
+                self.squares -= oldest * oldest
+        self.values.append(value)
+        if value != value:
+            self.nans += 1
+        else:
+            self.total += value
+            self.squares += value * value
+    def full(self):
+        """
+        True when the window holds period values and none of them is NaN.
+        """
+        return len(self.values) == self.period and not self.nans
+    def mean(self):
+        """
+        The mean of the values or NaN when the window is not full.
+        """
+        if not self.full():
+            return NAN
+        return self.total / self.period
+    def stddev(self):
+        """
+        Same as talib.STDDEV() (population standard deviation).
+        """
+        if not self.full():
+            return NAN
+        mean = self.total / self.period
+        variance = self.squares / self.period - mean * mean
+        if variance < 0.00000001:
+            return 0.0
+        return variance ** 0.5
+    def step(self, value):
+        """
+        Adds the value of the next bar and returns the mean.
+        """
+        self.push(value)
+        return self.mean()
+
+class Extreme(object):
+    """
+    The highest (or lowest) of the last period values, kept in a monotonic
+    deque.  Same as pandas.rolling_max() and pandas.rolling_min().
+    """
+    def __init__(self, period, highest=True):
+        self.period = period
+        self.highest = highest
+        self.candidates = deque() # (bar, value), best first
+        self.bars = 0
+        self.last_nan = None
+    def step(self, value):
+        """
+        Adds the value of the next bar and returns the extreme value.
+        """
+        self.bars += 1
+        if value != value:
+            self.last_nan = self.bars
+        else:
+            while self.candidates and (self.candidates[-1][1] <= value if self.highest \
+                                       else self.candidates[-1][1] >= value):
+                self.candidates.pop()
+            self.candidates.append((self.bars, value))
+        while self.candidates and self.candidates[0][0] <= self.bars - self.period:
+            self.candidates.popleft()
+        if self.bars < self.period or \
+           self.last_nan is not None and self.last_nan > self.bars - self.period:
+            return NAN
+        return self.candidates[0][1]
+
+class MovingAverage(object):
+    """
+    Same as the talib moving averages of type SMA, EMA and T3.
+    """
+    def __init__(self, period, ma_type=talib.MA_Type.SMA, vfactor=0.7):
+        self.period = period
+        self.ma_type = ma_type
+        self.window = Window(period)
+        self.k = 2.0 / (period + 1)
+        self.averages = [] # EMA or the 6 chained EMAs of T3 once seeded
+        self.total = 0.0 # Seed of the next average
+        self.count = 0
+        self.started = False
+        square = vfactor * vfactor
+        cube = -(square * vfactor)
+        self.coefficients = (cube, 3.0 * (square - cube), -6.0 * square - 3.0 * (vfactor - cube), \
+                             1.0 + 3.0 * vfactor - cube + 3.0 * square)
+    def step(self, value):
+        """
+        Adds the value of the next bar and returns the moving average.
+        """
+        if not self.started:
+            if value != value:
+                return NAN
+            self.started = True
+        if self.ma_type == talib.MA_Type.SMA:
+            return self.window.step(value)
+        if self.ma_type == talib.MA_Type.EMA:
+            return self._ema(value)
+        return self._t3(value)
+    def _ema(self, value):
+        """
+        EMA seeded with the SMA of the first period values.
+        """
+        if self.averages:
+            self.averages[0] = (value - self.averages[0]) * self.k + self.averages[0]
+            return self.averages[0]
+        self.total += value
+        self.count += 1
+        if self.count < self.period:
+            return NAN
+        self.averages.append(self.total / self.period)
+        return self.averages[0]
+    def _t3(self, value):
+        """
+        Every EMA is seeded with the SMA of the first period values of
+        the previous one.
+        """
+        last = value
+        for position, average in enumerate(self.averages):
+            self.averages[position] = self.k * last + (1.0 - self.k) * average
+            last = self.averages[position]
+        if len(self.averages) < 6:
+            self.total += last
+            self.count += 1
+            while self.count == self.period and len(self.averages) < 6:
+                self.averages.append(self.total / self.period)
+                self.total = self.averages[-1]
+                self.count = 1
+        if len(self.averages) < 6:
+            return NAN
+        return sum(coefficient * average for coefficient, average \
+                   in zip(self.coefficients, reversed(self.averages[2:])))
+
+class WilderAverage(object):
+    """
+    Wilder's smoothing seeded with the mean of the first period values,
+    as used by talib.RSI() and talib.ATR().
+    """
+    def __init__(self, period):
+        self.period = period
+        self.value = None
+        self.total = 0.0
+        self.count = 0
+    def step(self, value):
+        """
+        Adds the value of the next bar and returns the average.
+        """
+        if self.value is None:
+            self.total += value
+            self.count += 1
+            if self.count < self.period:
+                return NAN
+            self.value = self.total / self.period
+        else:
+            self.value *= self.period - 1
+            self.value += value
+            self.value /= self.period
+        return self.value
+
+class RSIStream(object):
+    """
+    Same as talib.RSI().
+    """
+    def __init__(self, period):
+        self.previous = None
+        self.gains = WilderAverage(period)
+        self.losses = WilderAverage(period)
+    def step(self, value):
+        """
+        Returns the RSI of the next bar.
+        """
+        if self.previous is None:
+            if value == value:
+                self.previous = value
+            return NAN
+        change = value - self.previous
+        self.previous = value
+        gain = self.gains.step(change if change >= 0 else 0.0)
+        loss = self.losses.step(-change if change < 0 else 0.0)
+        if gain != gain:
+            return NAN
+        if is_zero(gain + loss):
+            return 0.0
+        return 100.0 * (gain / (gain + loss))
+
+class ATRStream(object):
+    """
+    Same as talib.ATR().
+    """
+    def __init__(self, period):
+        self.period = period
+        self.previous_close = None
+        self.average = WilderAverage(period)
+    def step(self, high, low, close):
+        """
+        Returns the ATR of the next bar.
+        """
+        if self.previous_close is None:
+            if high == high and low == low and close == close:
+                self.previous_close = close
+            return NAN
+        bar_range = true_range(high, low, self.previous_close)
+        self.previous_close = close
+        if self.period == 1:
+            return bar_range
+        return self.average.step(bar_range)
+
+class BBANDSStream(object):
+    """
+    Same as talib.BBANDS() with a moving average in STREAMING_MA_TYPES.
+    """
+    def __init__(self, period, ma_type, devup, devdown):
+        self.average = MovingAverage(period, ma_type)
+        self.window = Window(period)
+        self.devup = devup
+        self.devdown = devdown
+    def step(self, value):
+        """
+        Returns the upper, middle and lower bands of the next bar.
+        """
+        middle = self.average.step(value)
+        if not self.average.started:
+            return NAN, NAN, NAN
+        self.window.push(value)
+        stddev = self.window.stddev()
+        if middle != middle or stddev != stddev:
+            return NAN, NAN, NAN
+        return middle + stddev * self.devup, middle, middle - stddev * self.devdown
+
+class STOCHStream(object):
+    """
+    Same as talib.STOCH() with moving averages in STREAMING_MA_TYPES.
+    """
+    def __init__(self, fast_k_period, slow_k_period, slow_k_ma_type, \
+                 slow_d_period, slow_d_ma_type):
+        self.started = False
+        self.highest = Extreme(fast_k_period, highest=True)
+        self.lowest = Extreme(fast_k_period, highest=False)
+        self.slowk = MovingAverage(slow_k_period, slow_k_ma_type)
+        self.slowd = MovingAverage(slow_d_period, slow_d_ma_type)
+    def step(self, high, low, close):
+        """
+        Returns the slow K and slow D of the next bar.
+        """
+        if not self.started:
+            if high != high or low != low or close != close:
+                return NAN, NAN
+            self.started = True
+        highest, lowest = self.highest.step(high), self.lowest.step(low)
+        if highest != highest or lowest != lowest:
+            return NAN, NAN
+        difference = (highest - lowest) / 100.0
+        fastk = (close - lowest) / difference if difference != 0 else 0.0
+        slowk = self.slowk.step(fastk)
+        slowd = self.slowd.step(slowk)
+        if slowd != slowd: # Both start on the first slow D
+            return NAN, NAN
+        return slowk, slowd
+
+class DXStream(object):
+    """
+    Same as talib.DX().  The smoothed directional movements and true range
+    are shared with ADXStream.
+    """
+    def __init__(self, period):
+        self.period = period
+        self.previous = None # High, low and close of the previous bar
+        self.bars = 0
+        self.plus_dm = 0.0
+        self.minus_dm = 0.0
+        self.true_range = 0.0
+        self.dx = 0.0 # Carried over when the directional index is undefined
+    def step(self, high, low, close):
+        """
+        Returns the DX of the next bar.
+        """
+        movement = self.directional_movement(high, low, close)
+        if movement is None:
+            return NAN
+        if movement[2] is not None:
+            self.dx = movement[2]
+        return self.dx
+    def directional_movement(self, high, low, close):
+        """
+        Adds the next bar and returns its +DI, -DI and directional index
+        (None when undefined), or None until period bars are smoothed.
+        """
+        if self.previous is None:
+            if high == high and low == low and close == close:
+                self.previous = (high, low, close)
+            return None
+        previous_high, previous_low, previous_close = self.previous
+        self.previous = (high, low, close)
+        self.bars += 1
+        up_move, down_move = high - previous_high, previous_low - low
+        plus_dm = up_move if up_move > 0 and up_move > down_move else 0.0
+        minus_dm = down_move if down_move > 0 and down_move > up_move else 0.0
+        bar_range = true_range(high, low, previous_close)
+        if self.bars < self.period:
+            self.plus_dm += plus_dm
+            self.minus_dm += minus_dm
+            self.true_range += bar_range
+            return None
+        self.plus_dm = self.plus_dm - self.plus_dm / self.period + plus_dm
+        self.minus_dm = self.minus_dm - self.minus_dm / self.period + minus_dm
+        self.true_range = self.true_range - self.true_range / self.period + bar_range
+        if is_zero(self.true_range):
+            return 0.0, 0.0, None
+        plus_di = 100.0 * (self.plus_dm / self.true_range)
+        minus_di = 100.0 * (self.minus_dm / self.true_range)
+        directional_index = None
+        if not is_zero(plus_di + minus_di):
+            directional_index = 100.0 * (abs(minus_di - plus_di) / (minus_di + plus_di))
+        return plus_di, minus_di, directional_index
+
+class ADXStream(DXStream):
+    """
+    Same as talib.ADX(), talib.PLUS_DI() and talib.MINUS_DI().
+    """
+    def __init__(self, period):
+        DXStream.__init__(self, period)
+        self.adx = 0.0
+    def step(self, high, low, close):
+        """
+        Returns the ADX, +DI and -DI of the next bar.
+        """
+        movement = self.directional_movement(high, low, close)
+        if movement is None:
+            return NAN, NAN, NAN
+        plus_di, minus_di, directional_index = movement
+        return self._adx(directional_index), plus_di, minus_di
+    def _adx(self, directional_index):
+        """
+        Returns the ADX once the directional index of the bar is known
+        (None when undefined).  The first value is the mean of the first
+        period directional indexes.
+        """
+        if self.bars < 2 * self.period:
+            if directional_index is not None:
+                self.adx += directional_index
+            if self.bars < 2 * self.period - 1:
+                return NAN
+            self.adx /= self.period
+            return self.adx
+        if directional_index is not None:
+            self.adx = (self.adx * (self.period - 1) + directional_index) / self.period
+        return self.adx
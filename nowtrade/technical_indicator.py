@@ -8,12 +8,32 @@ import numpy as np
 import talib
 import pandas as pd
 from nowtrade import logger
+from nowtrade import streaming
+from nowtrade import indicator_batch
+from nowtrade import regression
 
 class TechnicalIndicator(object):
     """
     The base class for all technical indicators.
     """
+    # Function calculating the values for many periods at once (None when
+    # not available), see Dataset.add_technical_indicators()
+    batch = None
     def __init__(self):
+        # Number of bars required before the first value can be calculated
+        # (None when unknown).  Recursive indicators (EMA, RSI, ADX, etc)
+        # still depend on every bar that came before.
+        self.warm_up = None
+        # True when the values depend on every bar that came before, whatever
+        # the warm up (IE: EMA, RSI, ADX).  See Strategy.run().
+        self.recursive = False
+        # Technical indicators given as input, see Dataset.add_technical_indicator()
+        self.dependencies = []
+        # Columns the values are calculated from (None when unknown), see
+        # IndicatorCache.  Set by _input() or by the technical indicator.
+        self.inputs = None
+        self.stream = None # Streaming state, see update()
+        self.streamed = None # Datetime of the last bar streamed
         self.logger = logger.Logger(self.__class__.__name__)
     def results(self, data_frame):
         """
@@ -21,46 +41,198 @@ class TechnicalIndicator(object):
         All the calculations happen here.
         """
         pass
+    def key(self):
+        """
+        Identity of the technical indicator: its class, parameters and
+        inputs (column labels).  Technical indicators with the same key
+        always give the same values on the same bars, so datasets only
+        calculate them once.
+        """
+        return (self.__class__,) + tuple((name, _key(value)) \
+                                         for name, value in sorted(vars(self).items()) \
+                                         if name not in _STATE)
+
+    def _input(self, data):
+        """
+        Returns the column label of an input of the technical indicator.
+        The input can be another technical indicator, whose value is used
+        and which becomes a dependency of this one.
+        """
+        if self.inputs is None:
+            self.inputs = []
+        if isinstance(data, TechnicalIndicator):
+            self.dependencies.append(data)
+            data = data.value
+        if isinstance(data, basestring):
+            self.inputs.append(data)
+        return data
+
+    def update(self, data_frame):
+        """
+        Brings the values of the technical indicator up to the last bar of
+        the data_frame.  See Dataset.update_technical_indicators().
+        Technical indicators keeping streaming state only process the bars
+        that came after the last one streamed, the others calculate their
+        results() again over every bar.
+        """
+        streaming_state = self._streaming()
+        if streaming_state is None:
+            self.results(data_frame)
+            return
+        self._stream(data_frame, *streaming_state)
+
+    def update_new_bars(self, data_frame):
+        """
+        Same as update() for a data_frame holding only the bars that came
+        after the last one streamed: the streaming state carries on without
+        the bars before them.  Returns False, leaving the data_frame alone,
+        when there is no streaming state to carry on (see streams()).
+        """
+        streaming_state = self._streaming()
+        if streaming_state is None or self.stream is None or \
+           data_frame.index[0] <= self.streamed:
+            return False
+        inputs, outputs = streaming_state[:2]
+        if any(column not in data_frame for column in inputs):
+            return False
+        self._step(data_frame, inputs, outputs, 0)
+        return True
+
+    def streams(self):
+        """
+        True when the technical indicator keeps streaming state, so update()
+        only processes the new bars.
+        """
+        return self._streaming() is not None
+
+    def _streaming(self):
+        """
+        Returns the inputs columns, outputs columns, streaming state class
+        and its arguments given to _stream() by update(), or None when the
+        technical indicator keeps no streaming state.
+        """
+        return None
+
+    def _stream(self, data_frame, inputs, outputs, stream_class, *args):
+        """
+        Feeds the values of the inputs columns on every bar after the last
+        one streamed to the step() of the streaming state and stores the
+        values it returns in the outputs columns.  A new streaming state,
+        stream_class(*args), is created and every bar is streamed again
+        when the last bar streamed is not in the data_frame anymore (or on
+        the first call).  See the streaming module.
+        """
+        if any(column not in data_frame for column in inputs):
+            for column in outputs:
+                data_frame[column] = np.nan
+            self.stream = None
+            self.streamed = None
+            return
+        start = 0
+        if self.streamed is not None and all(column in data_frame for column in outputs):
+            start = data_frame.index.searchsorted(self.streamed)
+            if start < len(data_frame) and data_frame.index[start] == self.streamed:
+                start += 1
+            else:
+                start = 0
+        if start == 0:
+            self.stream = stream_class(*args)
+        if start == len(data_frame):
+            return
+        self._step(data_frame, inputs, outputs, start)
+
+    def _step(self, data_frame, inputs, outputs, start):
+        """
+        Feeds the bars of the data_frame from start on to the streaming
+        state, see _stream().
+        """
+        columns = [data_frame[column].values for column in inputs]
+        values = np.array([self.stream.step(*row) for row in \
+                           zip(*[column[start:].tolist() for column in columns])], dtype=np.float64)
+        values = values.reshape(len(data_frame) - start, len(outputs))
+        for position, column in enumerate(outputs):
+            if start == 0:
+                data_frame[column] = values[:, position]
+                continue
+            location = data_frame.columns.get_loc(column)
+            for row, value in enumerate(values[:, position], start): # In place, no copy
+                data_frame.iat[row, location] = value
+        self.streamed = data_frame.index[-1]
+
+# Attributes that are not part of the key of a technical indicator
+_STATE = ('logger', 'dependencies', 'inputs', 'recursive', 'stream', 'streamed')
+
+def _key(value):
+    """
+    Hashable version of a technical indicator parameter.
+    """
+    try:
+        hash(value)
+    except TypeError: # IE: a list of periods
+        return str(value)
+    return value
+
+def _high_low_close(symbol):
+    """
+    Returns the high, low and close columns of the symbol.
+    """
+    return ['%s_%s' %(symbol, column) for column in ('High', 'Low', 'Close')]
+
+# Number of moving averages chained by the talib moving average types that
+# are not a single pass over the period
+_MA_PASSES = {talib.MA_Type.DEMA: 2, talib.MA_Type.TEMA: 3, talib.MA_Type.T3: 6}
+# Talib moving average types depending on every value that came before
+_RECURSIVE_MA_TYPES = (talib.MA_Type.EMA, talib.MA_Type.DEMA, talib.MA_Type.TEMA,
+                       talib.MA_Type.T3, talib.MA_Type.KAMA, talib.MA_Type.MAMA)
+
+def _ma_warm_up(period, ma_type):
+    """
+    Returns the number of bars required before the first value of a talib
+    moving average type can be calculated.
+    IE: _ma_warm_up(10, MA_Type.SMA) -> 10, _ma_warm_up(10, MA_Type.T3) -> 55
+    """
+    if ma_type == talib.MA_Type.MAMA:
+        return 33
+    if ma_type == talib.MA_Type.KAMA:
+        return period + 1
+    return _MA_PASSES.get(ma_type, 1) * (period - 1) + 1
 
 class Pair(TechnicalIndicator):
     """
     Pair is a helper TI created to aid in pairs trading.
+    The y data is regressed on the x data over the last lookback bars of
+    every bar, see regression.rolling_ols().
     Attributes:
-        ols -> Ordinary Least Squares of the pair
+        ols -> Residuals of the Ordinary Least Squares of the pair
         hedge_ratio -> The pair's hedge ratio
         spread -> The spread between the pair
         zscore -> The zscore between the pair
     """
     def __init__(self, y_data, x_data, lookback):
         TechnicalIndicator.__init__(self)
-        self.y_data = y_data
-        self.x_data = x_data
+        self.y_data = self._input(y_data)
+        self.x_data = self._input(x_data)
         self.lookback = lookback
-        self.value = 'PAIR_%s_%s_%s' %(y_data, x_data, lookback)
+        self.warm_up = 2 * lookback
+        self.value = 'PAIR_%s_%s_%s' %(self.y_data, self.x_data, lookback)
         self.ols = self.value
-        self.hedge_ratio = 'HEDGE_RATIO_%s_%s_%s' %(y_data, x_data, lookback)
-        self.spread = 'SPREAD_%s_%s_%s' %(y_data, x_data, lookback)
-        self.zscore = 'ZSCORE_%s_%s_%s' %(y_data, x_data, lookback)
+        self.hedge_ratio = 'HEDGE_RATIO_%s_%s_%s' %(self.y_data, self.x_data, lookback)
+        self.spread = 'SPREAD_%s_%s_%s' %(self.y_data, self.x_data, lookback)
+        self.zscore = 'ZSCORE_%s_%s_%s' %(self.y_data, self.x_data, lookback)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return self.value
     def __repr__(self):
         return self.value
     def results(self, data_frame):
-        y_value = data_frame[self.y_data]
-        x_value = data_frame[self.x_data]
-        if self.lookback >= len(x_value):
-            return ([self.value, self.hedge_ratio, self.spread, self.zscore], \
-                    [pd.Series(np.nan), pd.Series(np.nan), pd.Series(np.nan), pd.Series(np.nan)])
-        ols_result = pd.ols(y=y_value, x=x_value, window=self.lookback)
-        hedge_ratio = ols_result.beta['x']
+        y_value = data_frame[self.y_data].values
+        x_value = data_frame[self.x_data].values
+        intercept, hedge_ratio = regression.rolling_ols(y_value, x_value, self.lookback)
         spread = y_value - hedge_ratio * x_value
-        data_frame[self.value] = ols_result.resid
+        data_frame[self.value] = spread - intercept # Residuals of the regression
         data_frame[self.hedge_ratio] = hedge_ratio
         data_frame[self.spread] = spread
-        data_frame[self.zscore] = (spread - \
-                                   pd.rolling_mean(spread, self.lookback)) / \
-                                   pd.rolling_std(spread, self.lookback)
+        data_frame[self.zscore] = regression.rolling_zscore(spread, self.lookback)
 
 class Addition(TechnicalIndicator):
     """
@@ -68,9 +240,10 @@ class Addition(TechnicalIndicator):
     """
     def __init__(self, data1, data2):
         TechnicalIndicator.__init__(self)
-        self.data1 = data1
-        self.data2 = data2
-        self.value = 'ADDITION_%s_%s' %(data1, data2)
+        self.warm_up = 1
+        self.data1 = self._input(data1)
+        self.data2 = self._input(data2)
+        self.value = 'ADDITION_%s_%s' %(self.data1, self.data2)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Addition(data1=%s, data2=%s)' %(self.data1, self.data2)
@@ -88,9 +261,10 @@ class Subtraction(TechnicalIndicator):
     """
     def __init__(self, data1, data2):
         TechnicalIndicator.__init__(self)
-        self.data1 = data1
-        self.data2 = data2
-        self.value = 'SUBTRACTION_%s_%s' %(data1, data2)
+        self.warm_up = 1
+        self.data1 = self._input(data1)
+        self.data2 = self._input(data2)
+        self.value = 'SUBTRACTION_%s_%s' %(self.data1, self.data2)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Subtraction(data1=%s, data2=%s)' %(self.data1, self.data2)
@@ -108,9 +282,10 @@ class Multiplication(TechnicalIndicator):
     """
     def __init__(self, data1, data2):
         TechnicalIndicator.__init__(self)
-        self.data1 = data1
-        self.data2 = data2
-        self.value = 'MULTIPLICATION_%s_%s' %(data1, data2)
+        self.warm_up = 1
+        self.data1 = self._input(data1)
+        self.data2 = self._input(data2)
+        self.value = 'MULTIPLICATION_%s_%s' %(self.data1, self.data2)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Multiplication(data1=%s, data2=%s)' %(self.data1, self.data2)
@@ -128,9 +303,10 @@ class Division(TechnicalIndicator):
     """
     def __init__(self, data1, data2):
         TechnicalIndicator.__init__(self)
-        self.data1 = data1
-        self.data2 = data2
-        self.value = 'DIVISION_%s_%s' %(data1, data2)
+        self.warm_up = 1
+        self.data1 = self._input(data1)
+        self.data2 = self._input(data2)
+        self.value = 'DIVISION_%s_%s' %(self.data1, self.data2)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Division(data1=%s, data2=%s)' %(self.data1, self.data2)
@@ -149,9 +325,13 @@ class PercentChange(TechnicalIndicator):
     """
     def __init__(self, data1, data2):
         TechnicalIndicator.__init__(self)
-        self.data1 = data1
-        self.data2 = data2
-        self.value = 'PERCENT_CHANGE_%s_%s' %(data1, data2)
+        self.data1 = self._input(data1)
+        self.data2 = self._input(data2)
+        if isinstance(data2, basestring):
+            self.warm_up = 1
+        else:
+            self.warm_up = data2 + 1
+        self.value = 'PERCENT_CHANGE_%s_%s' %(self.data1, self.data2)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'PercentChange(data1=%s, data2=%s)' %(self.data1, self.data2)
@@ -170,11 +350,13 @@ class Max(TechnicalIndicator):
     A technical indicator that always returns the highest value in a series
     of a predefined period.
     """
+    batch = staticmethod(indicator_batch.rolling_max)
     def __init__(self, data, period):
         TechnicalIndicator.__init__(self)
-        self.data = data
+        self.data = self._input(data)
         self.period = period
-        self.value = 'MAX_%s_%s' %(data, period)
+        self.warm_up = period
+        self.value = 'MAX_%s_%s' %(self.data, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Max(data=%s, period=%s)' %(self.data, self.period)
@@ -185,17 +367,21 @@ class Max(TechnicalIndicator):
             data_frame[self.value] = pd.rolling_max(data_frame[self.data], self.period)
         except KeyError:
             data_frame[self.value] = np.nan
+    def _streaming(self):
+        return [self.data], [self.value], streaming.Extreme, self.period, True
 
 class Min(TechnicalIndicator):
     """
     A technical indicator that always returns the lowest value in a series
     of a predefined period.
     """
+    batch = staticmethod(indicator_batch.rolling_min)
     def __init__(self, data, period):
         TechnicalIndicator.__init__(self)
-        self.data = data
+        self.data = self._input(data)
         self.period = period
-        self.value = 'MIN_%s_%s' %(data, period)
+        self.warm_up = period
+        self.value = 'MIN_%s_%s' %(self.data, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Min(data=%s, period=%s)' %(self.data, self.period)
@@ -206,6 +392,8 @@ class Min(TechnicalIndicator):
             data_frame[self.value] = pd.rolling_min(data_frame[self.data], self.period)
         except KeyError:
             data_frame[self.value] = np.nan
+    def _streaming(self):
+        return [self.data], [self.value], streaming.Extreme, self.period, False
 
 class InvalidShift(Exception):
     """
@@ -223,9 +411,10 @@ class Shift(TechnicalIndicator):
         TechnicalIndicator.__init__(self)
         if period < 1:
             raise InvalidShift('Must be positive shift period')
-        self.data = data
+        self.data = self._input(data)
         self.period = period
-        self.value = 'SHIFT_%s_%s' %(data, period)
+        self.warm_up = period + 1
+        self.value = 'SHIFT_%s_%s' %(self.data, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'Shift(data=%s, period=%s)' %(self.data, self.period)
@@ -239,11 +428,13 @@ class SMA(TechnicalIndicator):
     A technical indicator that returns the simple moving average of a
     series/technical indicator.
     """
+    batch = staticmethod(indicator_batch.rolling_mean)
     def __init__(self, data, period):
         TechnicalIndicator.__init__(self)
-        self.data = data
+        self.data = self._input(data)
         self.period = period
-        self.value = 'SMA_%s_%s' %(data, period)
+        self.warm_up = period
+        self.value = 'SMA_%s_%s' %(self.data, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'SMA(data=%s, period=%s)' %(self.data, self.period)
@@ -251,6 +442,8 @@ class SMA(TechnicalIndicator):
         return self.value
     def results(self, data_frame):
         data_frame[self.value] = pd.rolling_mean(data_frame[self.data], self.period)
+    def _streaming(self):
+        return [self.data], [self.value], streaming.Window, self.period
 
 class EMA(TechnicalIndicator):
     """
@@ -258,9 +451,11 @@ class EMA(TechnicalIndicator):
     """
     def __init__(self, data, period):
         TechnicalIndicator.__init__(self)
-        self.data = data
+        self.data = self._input(data)
         self.period = period
-        self.value = 'EMA_%s_%s' %(data, period)
+        self.warm_up = period
+        self.recursive = True
+        self.value = 'EMA_%s_%s' %(self.data, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'EMA(data=%s, period=%s)' %(self.data, self.period)
@@ -271,6 +466,8 @@ class EMA(TechnicalIndicator):
             data_frame[self.value] = talib.EMA(data_frame[self.data].values, self.period)
         except KeyError:
             data_frame[self.value] = np.nan
+    def _streaming(self):
+        return [self.data], [self.value], streaming.MovingAverage, self.period, talib.MA_Type.EMA
 
 class RSI(TechnicalIndicator):
     """
@@ -279,9 +476,11 @@ class RSI(TechnicalIndicator):
     """
     def __init__(self, data, period):
         TechnicalIndicator.__init__(self)
-        self.data = data
+        self.data = self._input(data)
         self.period = period
-        self.value = 'RSI_%s_%s' %(data, period)
+        self.warm_up = period + 1
+        self.recursive = True
+        self.value = 'RSI_%s_%s' %(self.data, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'RSI(data=%s, period=%s)' %(self.data, self.period)
@@ -292,6 +491,8 @@ class RSI(TechnicalIndicator):
             data_frame[self.value] = talib.RSI(data_frame[self.data].values, timeperiod=self.period)
         except KeyError:
             data_frame[self.value] = np.nan
+    def _streaming(self):
+        return [self.data], [self.value], streaming.RSIStream, self.period
 
 class ATR(TechnicalIndicator):
     """
@@ -303,7 +504,10 @@ class ATR(TechnicalIndicator):
     def __init__(self, symbol, period):
         TechnicalIndicator.__init__(self)
         self.symbol = symbol
+        self.inputs = _high_low_close(symbol)
         self.period = period
+        self.warm_up = period + 1
+        self.recursive = True
         self.value = 'ATR_%s_%s' %(symbol, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
@@ -318,6 +522,8 @@ class ATR(TechnicalIndicator):
                                                timeperiod=self.period)
         except KeyError:
             data_frame[self.value] = np.nan
+    def _streaming(self):
+        return _high_low_close(self.symbol), [self.value], streaming.ATRStream, self.period
 
 class BBANDS(TechnicalIndicator):
     """
@@ -326,15 +532,17 @@ class BBANDS(TechnicalIndicator):
     """
     def __init__(self, data, period, devup=2, devdown=2, ma_type=talib.MA_Type.T3):
         TechnicalIndicator.__init__(self)
-        self.data = data
+        self.data = self._input(data)
         self.period = period
+        self.warm_up = _ma_warm_up(period, ma_type)
+        self.recursive = ma_type in _RECURSIVE_MA_TYPES
         self.devup = 2
         self.devdown = 2
         self.ma_type = ma_type
-        self.value = 'BBANDS_MIDDLE_%s_%s_%s_%s_%s' %(data, period, devup, devdown, ma_type)
-        self.upper = 'BBANDS_UPPER_%s_%s_%s_%s_%s' %(data, period, devup, devdown, ma_type)
+        self.value = 'BBANDS_MIDDLE_%s_%s_%s_%s_%s' %(self.data, period, devup, devdown, ma_type)
+        self.upper = 'BBANDS_UPPER_%s_%s_%s_%s_%s' %(self.data, period, devup, devdown, ma_type)
         self.middle = self.value
-        self.lower = 'BBANDS_LOWER_%s_%s_%s_%s_%s' %(data, period, devup, devdown, ma_type)
+        self.lower = 'BBANDS_LOWER_%s_%s_%s_%s_%s' %(self.data, period, devup, devdown, ma_type)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
         return 'BBANDS(data=%s, period=%s, devup=%s, devdown=%s, ma_type=%s)' \
@@ -355,6 +563,11 @@ class BBANDS(TechnicalIndicator):
             data_frame[self.upper] = np.nan
             data_frame[self.middle] = np.nan
             data_frame[self.lower] = np.nan
+    def _streaming(self):
+        if self.ma_type not in streaming.STREAMING_MA_TYPES:
+            return None
+        return [self.data], [self.upper, self.middle, self.lower], streaming.BBANDSStream, \
+               self.period, self.ma_type, self.devup, self.devdown
 
 class DX(TechnicalIndicator):
     """
@@ -366,7 +579,10 @@ class DX(TechnicalIndicator):
     def __init__(self, symbol, period):
         TechnicalIndicator.__init__(self)
         self.symbol = symbol
+        self.inputs = _high_low_close(symbol)
         self.period = period
+        self.warm_up = period + 1
+        self.recursive = True
         self.value = 'DX_%s_%s' %(symbol, period)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
@@ -382,6 +598,8 @@ class DX(TechnicalIndicator):
             data_frame[self.value] = directional_index
         except KeyError:
             data_frame[self.value] = np.nan
+    def _streaming(self):
+        return _high_low_close(self.symbol), [self.value], streaming.DXStream, self.period
 
 class ADX(TechnicalIndicator):
     """
@@ -393,7 +611,10 @@ class ADX(TechnicalIndicator):
     def __init__(self, symbol, period):
         TechnicalIndicator.__init__(self)
         self.symbol = symbol
+        self.inputs = _high_low_close(symbol)
         self.period = period
+        self.warm_up = 2 * period
+        self.recursive = True
         self.value = 'ADX_%s_%s' %(symbol, period)
         self.plus_di = '+DI_%s_%s' %(symbol, period)
         self.minus_di = '-DI_%s_%s' %(symbol, period)
@@ -423,6 +644,9 @@ class ADX(TechnicalIndicator):
             data_frame[self.value] = np.nan
             data_frame[self.plus_di] = np.nan
             data_frame[self.minus_di] = np.nan
+    def _streaming(self):
+        return _high_low_close(self.symbol), [self.value, self.plus_di, self.minus_di], \
+               streaming.ADXStream, self.period
 
 class ULTOSC(TechnicalIndicator):
     """
@@ -433,9 +657,11 @@ class ULTOSC(TechnicalIndicator):
     def __init__(self, symbol, period1, period2, period3):
         TechnicalIndicator.__init__(self)
         self.symbol = symbol
+        self.inputs = _high_low_close(symbol)
         self.period1 = period1
         self.period2 = period2
         self.period3 = period3
+        self.warm_up = max(period1, period2, period3) + 1
         self.value = 'ULTOSC_%s_%s_%s_%s' %(symbol, period1, period2, period3)
         self.logger.info('Initialized - %s' %self)
     def __str__(self):
@@ -466,11 +692,15 @@ class STOCH(TechnicalIndicator):
                  slow_d_ma_type=talib.MA_Type.SMA):
         TechnicalIndicator.__init__(self)
         self.symbol = str(symbol).upper()
+        self.inputs = _high_low_close(self.symbol)
         self.fast_k_period = fast_k_period
         self.slow_k_period = slow_k_period
         self.slow_k_ma_type = slow_k_ma_type
         self.slow_d_period = slow_d_period
         self.slow_d_ma_type = slow_d_ma_type
+        self.warm_up = fast_k_period + slow_k_period + slow_d_period
+        self.recursive = slow_k_ma_type in _RECURSIVE_MA_TYPES or \
+                         slow_d_ma_type in _RECURSIVE_MA_TYPES
         self.value = 'STOCH_K_%s_%s_%s_%s_%s_%s' %(self.symbol,
                                                    fast_k_period,
                                                    slow_k_period,
@@ -505,6 +735,13 @@ class STOCH(TechnicalIndicator):
         except KeyError:
             data_frame[self.slowk] = np.nan
             data_frame[self.slowd] = np.nan
+    def _streaming(self):
+        if self.slow_k_ma_type not in streaming.STREAMING_MA_TYPES or \
+           self.slow_d_ma_type not in streaming.STREAMING_MA_TYPES:
+            return None
+        return _high_low_close(self.symbol), [self.slowk, self.slowd], streaming.STOCHStream, \
+               self.fast_k_period, self.slow_k_period, self.slow_k_ma_type, \
+               self.slow_d_period, self.slow_d_ma_type
 
 class STOCHF(TechnicalIndicator):
     """
@@ -514,9 +751,12 @@ class STOCHF(TechnicalIndicator):
                  fast_d_ma_type=talib.MA_Type.SMA):
         TechnicalIndicator.__init__(self)
         self.symbol = str(symbol).upper()
+        self.inputs = _high_low_close(self.symbol)
         self.fast_k_period = fast_k_period
         self.fast_d_period = fast_d_period
         self.fast_d_ma_type = fast_d_ma_type
+        self.warm_up = fast_k_period + fast_d_period
+        self.recursive = fast_d_ma_type in _RECURSIVE_MA_TYPES
         self.value = 'STOCHF_K_%s_%s_%s_%s' %(self.symbol,
                                               fast_k_period,
                                               fast_d_period,
@@ -545,6 +785,12 @@ class STOCHF(TechnicalIndicator):
         except KeyError:
             data_frame[self.fastk] = np.nan
             data_frame[self.fastd] = np.nan
+    def _streaming(self):
+        if self.fast_d_ma_type not in streaming.STREAMING_MA_TYPES:
+            return None
+        # The fast K is the slow K of a 1 bar SMA
+        return _high_low_close(self.symbol), [self.fastk, self.fastd], streaming.STOCHStream, \
+               self.fast_k_period, 1, talib.MA_Type.SMA, self.fast_d_period, self.fast_d_ma_type
 
 class NeuralNetwork(TechnicalIndicator):
     """
@@ -553,6 +799,7 @@ class NeuralNetwork(TechnicalIndicator):
     """
     def __init__(self, network, name=None):
         TechnicalIndicator.__init__(self)
+        self.inputs = None # Any column
         self.network = network
         if name is not None:
             self.name = name
@@ -574,6 +821,7 @@ class Ensemble(TechnicalIndicator):
     """
     def __init__(self, ensemble, name=None):
         TechnicalIndicator.__init__(self)
+        self.inputs = None # Any column
         self.ensemble = ensemble
         if name is not None:
             self.name = name
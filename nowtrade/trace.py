@@ -0,0 +1,199 @@
+"""
+The trace module records the outcome of the criteria of every criteria group
+on every bar of a strategy simulation.  Used to find out why a strategy did
+or did not trade without logging every criteria result.
+"""
+import numpy as np
+import pandas as pd
+
+class Trace(object):
+    """
+    Keeps two packed bit arrays per criteria group, with one bit per
+    criteria per bar: whether the criteria was applied and whether it was
+    True.  A criteria group stops applying its criteria once one of them is
+    False (see CriteriaGroup.get_result()), the criteria it skipped are
+    reported as not applied.
+    Storage is about bars * criteria / 8 bytes for each of the two arrays.
+    """
+    def __init__(self, capacity=1024, growth=2):
+        self.capacity = capacity
+        self.growth = growth
+        self.bars = 0
+        self.index = np.empty(capacity, dtype='datetime64[ns]')
+        self.criteria_groups = [] # In the order they were first recorded
+        self.applied = {}
+        self.passed = {}
+
+    def __str__(self):
+        return 'Trace(bars=%s, criteria_groups=%s)' %(self.bars, len(self.criteria_groups))
+    def __repr__(self):
+        return 'Trace(bars=%s, criteria_groups=%s)' %(self.bars, len(self.criteria_groups))
+    def __len__(self):
+        return self.bars
+
+    @property
+    def nbytes(self):
+        """
+        Bytes used by the bits of the bars recorded so far.
+        """
+        return sum(self.applied[crit_group][:self.bars].nbytes + \
+                   self.passed[crit_group][:self.bars].nbytes \
+                   for crit_group in self.criteria_groups)
+
+    def add_bar(self, datetime):
+        """
+        Starts recording a new bar.
+        """
+        if self.bars == self.capacity:
+            self._resize(self.capacity * self.growth)
+        self.index[self.bars] = _datetime64(datetime)
+        self.bars += 1
+
+    def set_index(self, index):
+        """
+        Starts recording the bars of the index provided all at once
+        (IE: a vectorized simulation).  Forgets the bars recorded so far.
+        """
+        self.bars = 0
+        self.criteria_groups = []
+        self.applied = {}
+        self.passed = {}
+        if len(index) > self.capacity:
+            self.capacity = len(index)
+        self.index = np.empty(self.capacity, dtype='datetime64[ns]')
+        self.index[:len(index)] = pd.DatetimeIndex(index).values
+        self.bars = len(index)
+
+    def record(self, crit_group, applied, passed, row=-1):
+        """
+        Records the outcome of the criteria of a criteria group on a bar.
+        @type applied: list
+        @param applied: True for every criteria of the group applied.
+        @type passed: list
+        @param passed: True for every criteria of the group that was True.
+        @type row: int
+        @param row: Position of the bar, the last one by default.
+        """
+        row = self._position(row)
+        self._bits(crit_group, self.applied)[row] = np.packbits(applied)
+        self._bits(crit_group, self.passed)[row] = np.packbits(passed)
+
+    def record_all(self, crit_group, applied, passed):
+        """
+        Same as record() for every bar at once.
+        @type applied: numpy.ndarray
+        @param applied: (bars, criteria) bool array.
+        @type passed: numpy.ndarray
+        @param passed: (bars, criteria) bool array.
+        """
+        self._bits(crit_group, self.applied)[:self.bars] = np.packbits(applied, axis=1)
+        self._bits(crit_group, self.passed)[:self.bars] = np.packbits(passed, axis=1)
+
+    def set(self, crit_group, row, position, result):
+        """
+        Records the outcome of the criteria at position of a criteria group
+        on a bar, leaving the other criteria untouched.
+        """
+        row = self._position(row)
+        byte, mask = position // 8, np.uint8(0x80 >> position % 8)
+        self._bits(crit_group, self.applied)[row, byte] |= mask
+        if result:
+            self._bits(crit_group, self.passed)[row, byte] |= mask
+        else:
+            self._bits(crit_group, self.passed)[row, byte] &= ~mask
+
+    def outcomes(self, crit_group, datetime):
+        """
+        Returns (criteria, status) for every criteria of the criteria group
+        on the bar at datetime, status being None for the criteria that
+        were not applied.
+        """
+        row = self._row(datetime)
+        applied, passed = self._unpack(crit_group, row)
+        return [(criteria, bool(passed[position]) if applied[position] else None) \
+                for position, criteria in enumerate(crit_group.criteria_list)]
+
+    def failing(self, start, end=None, crit_group=None):
+        """
+        Returns the criteria that were False on the bars from start to end
+        (both included), or on the bar at start only when end is None.
+        @type crit_group: CriteriaGroup
+        @param crit_group: Only look at this criteria group.
+        @rtype: list
+        @return: (datetime, criteria group, criteria that were False) for
+        every bar and criteria group with at least one False criteria.
+        """
+        if end is None:
+            rows = [self._row(start)]
+        else:
+            index = self.index[:self.bars]
+            rows = range(index.searchsorted(_datetime64(start), side='left'),
+                         index.searchsorted(_datetime64(end), side='right'))
+        crit_groups = self.criteria_groups if crit_group is None else [crit_group]
+        failing = []
+        for row in rows:
+            for group in crit_groups:
+                if group not in self.applied:
+                    continue
+                applied, passed = self._unpack(group, row)
+                criteria_list = [criteria for position, criteria in enumerate(group.criteria_list) \
+                                 if applied[position] and not passed[position]]
+                if criteria_list:
+                    failing.append((pd.Timestamp(self.index[row]), group, criteria_list))
+        return failing
+
+    def _unpack(self, crit_group, row):
+        """
+        Returns the applied and passed bits of the criteria group on a bar.
+        """
+        criteria = len(crit_group.criteria_list)
+        return np.unpackbits(self.applied[crit_group][row])[:criteria], \
+               np.unpackbits(self.passed[crit_group][row])[:criteria]
+
+    def _bits(self, crit_group, bits):
+        """
+        Returns the bit array of the criteria group, creating it if needed.
+        """
+        if crit_group not in bits:
+            if crit_group not in self.criteria_groups:
+                self.criteria_groups.append(crit_group)
+            width = (len(crit_group.criteria_list) + 7) // 8
+            bits[crit_group] = np.zeros((self.capacity, width), dtype=np.uint8)
+        return bits[crit_group]
+
+    def _row(self, datetime):
+        """
+        Returns the position of the bar at datetime.
+        """
+        row = self.index[:self.bars].searchsorted(_datetime64(datetime))
+        if row == self.bars or self.index[row] != _datetime64(datetime):
+            raise KeyError('No bar recorded at %s' %datetime)
+        return row
+
+    def _position(self, row):
+        """
+        Converts a negative bar position.
+        """
+        if row < 0:
+            return row + self.bars
+        return row
+
+    def _resize(self, capacity):
+        """
+        Grows the arrays to hold capacity bars.
+        """
+        index = np.empty(capacity, dtype='datetime64[ns]')
+        index[:self.bars] = self.index[:self.bars]
+        self.index = index
+        for bits in (self.applied, self.passed):
+            for crit_group in bits:
+                resized = np.zeros((capacity, bits[crit_group].shape[1]), dtype=np.uint8)
+                resized[:self.bars] = bits[crit_group][:self.bars]
+                bits[crit_group] = resized
+        self.capacity = capacity
+
+def _datetime64(datetime):
+    """
+    Converts a datetime to the datetime64 values of the index.
+    """
+    return pd.Timestamp(datetime).to_datetime64()
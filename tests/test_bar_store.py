@@ -0,0 +1,130 @@
+"""
+Tests for the NowTrade BarStore object.
+"""
+import unittest
+import numpy as np
+from testing_data import msft_data
+from nowtrade.bar_store import BarStore
+
+class TestBarStore(unittest.TestCase):
+    """
+    Test the BarStore object.
+    """
+    def test_append(self):
+        """
+        Bars merged one at a time end up the same as combine_first().
+        """
+        store = BarStore(capacity=3)
+        for i in range(len(msft_data)):
+            store.merge(msft_data[i:i + 1])
+        self.assertEqual(len(store), 8)
+        self.assertTrue(store.capacity >= 8)
+        self.assertEqual(store.get('MSFT_Close'), 25.00)
+        self.assertEqual(store.get('MSFT_Close', 0), 25.89)
+        self.assertEqual(store.get_index(), msft_data.index[-1])
+        data_frame = store.data_frame()
+        self.assertTrue(data_frame.equals(msft_data))
+        self.assertEqual(len(store.tail(3)), 3)
+        self.assertEqual(store.tail(3).index[0], msft_data.index[5])
+        self.assertEqual(len(store.tail(20)), 8)
+        self.assertEqual(store.columns['MSFT_Volume'].dtype, np.int64)
+        # The DataFrames returned are copies
+        data_frame['MSFT_Close'] = 0
+        self.assertEqual(store.get('MSFT_Close'), 25.00)
+
+    def test_columns(self):
+        """
+        Typed columns and values set on the last bar.
+        """
+        store = BarStore()
+        store.merge(msft_data[:2])
+        store.add_column('ACTIONS_MSFT', np.int64, 0)
+        store.add_column('PL_MSFT')
+        self.assertTrue('ACTIONS_MSFT' in store)
+        store.set('ACTIONS_MSFT', 1)
+        store.set('PL_MSFT', 0.5, 0)
+        store.merge(msft_data[2:3])
+        self.assertEqual(store.get('ACTIONS_MSFT', -2), 1)
+        self.assertEqual(store.get('ACTIONS_MSFT'), 0)
+        self.assertEqual(store.get('PL_MSFT', 0), 0.5)
+        self.assertTrue(np.isnan(store.get('PL_MSFT')))
+        self.assertEqual(store.columns['ACTIONS_MSFT'].dtype, np.int64)
+        store.set_values('ACTIONS_MSFT', [2, 3, 4])
+        self.assertEqual([store.get('ACTIONS_MSFT', position) for position in range(3)], [2, 3, 4])
+
+    def test_missing_integers(self):
+        """
+        Integer columns missing values hold NaN like combine_first().
+        """
+        store = BarStore()
+        store.merge(msft_data[:2])
+        # Added after the bars
+        store.add_column('COUNT_MSFT', np.int64)
+        self.assertEqual(store.columns['COUNT_MSFT'].dtype, np.float64)
+        self.assertTrue(np.isnan(store.get('COUNT_MSFT')))
+        # Appended without a value
+        store.merge(msft_data[2:3][['MSFT_Open', 'MSFT_Close']])
+        self.assertEqual(store.columns['MSFT_Volume'].dtype, np.float64)
+        self.assertTrue(np.isnan(store.get('MSFT_Volume')))
+        self.assertEqual(store.get('MSFT_Volume', 0), msft_data['MSFT_Volume'][0])
+        expected = msft_data[:2].combine_first(msft_data[2:3][['MSFT_Open', 'MSFT_Close']])
+        self.assertTrue(store.data_frame()[msft_data.columns].equals(expected[msft_data.columns]))
+        # Explicit fill values are kept
+        store.add_column('ACTIONS_MSFT', np.int64, 0)
+        store.merge(msft_data[3:4])
+        self.assertEqual(store.columns['ACTIONS_MSFT'].dtype, np.int64)
+        self.assertEqual(store.get('ACTIONS_MSFT'), 0)
+
+    def test_combine(self):
+        """
+        Existing bars only get their missing values filled and older bars
+        are inserted in order.
+        """
+        store = BarStore()
+        store.merge(msft_data[2:5])
+        store.set('MSFT_Close', np.nan, 0)
+        store.set('MSFT_Open', 1.0, 1)
+        store.merge(msft_data[2:6])
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.get('MSFT_Close', 0), 26.86)
+        self.assertEqual(store.get('MSFT_Open', 1), 1.0)
+        store.merge(msft_data[:1])
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.get_index(0), msft_data.index[0])
+        self.assertEqual(store.get('MSFT_Open', 2), 1.0)
+
+    def test_max_bars(self):
+        """
+        Only the last max_bars bars are kept.
+        """
+        store = BarStore(max_bars=3)
+        for i in range(len(msft_data)):
+            store.merge(msft_data[i:i + 1])
+            self.assertEqual(store.capacity, 6)
+            self.assertEqual(len(store), min(i + 1, 3))
+        self.assertTrue(store.data_frame().equals(msft_data[-3:]))
+        # Older bars are ignored
+        store.merge(msft_data[:1])
+        self.assertTrue(store.data_frame().equals(msft_data[-3:]))
+        store = BarStore(max_bars=3)
+        store.merge(msft_data)
+        self.assertTrue(store.data_frame().equals(msft_data[-3:]))
+
+    def test_share(self):
+        """
+        Shared stores hold read-only views and their own columns.
+        """
+        store = BarStore()
+        store.merge(msft_data)
+        shared = store.share()
+        shared.add_column('ACTIONS_MSFT', np.int64, 0)
+        shared.set('ACTIONS_MSFT', 1)
+        self.assertFalse('ACTIONS_MSFT' in store)
+        self.assertTrue(shared.data_frame()[msft_data.columns].equals(msft_data))
+        with self.assertRaises(ValueError):
+            shared.set('MSFT_Close', 0)
+        store.set('MSFT_Close', 0)
+        self.assertEqual(shared.get('MSFT_Close'), 0)
+
+if __name__ == "__main__":
+    unittest.main()
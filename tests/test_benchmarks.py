@@ -0,0 +1,63 @@
+"""
+Tests for the NowTrade benchmarks.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from nowtrade import strategy
+from benchmarks import run
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'baseline.json')
+        self.baseline = {'rsi-1000-1-event': {'bars_per_second': 1000.0, 'peak_memory': 100.0},
+                         'adx-1000-1-event': {'bars_per_second': 500.0, 'peak_memory': 50.0}}
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_run_mode(self):
+        self.assertEqual(run.run_mode(1000, 10), strategy.EVENT)
+        self.assertEqual(run.run_mode(100000, 1), strategy.VECTORIZED)
+        self.assertEqual(run.run_mode(100000, 1, strategy.EVENT), strategy.EVENT)
+        self.assertEqual(run.run_mode(1000, 1, strategy.VECTORIZED), strategy.VECTORIZED)
+
+    def test_compare(self):
+        results = {'rsi-1000-1-event': {'bars_per_second': 900.0, 'peak_memory': 110.0},
+                   'adx-1000-1-event': {'bars_per_second': 300.0, 'peak_memory': 50.0},
+                   'crossover-1000-1-event': {'bars_per_second': 10.0, 'peak_memory': 500.0}}
+        table = run.compare(results, self.baseline)
+        self.assertEqual(list(table.index), sorted(results))
+        self.assertAlmostEqual(table.loc['rsi-1000-1-event', 'speed'], 0.9)
+        self.assertAlmostEqual(table.loc['rsi-1000-1-event', 'memory'], 1.1)
+        self.assertFalse(table.loc['rsi-1000-1-event', 'regression'])
+        self.assertAlmostEqual(table.loc['adx-1000-1-event', 'speed'], 0.6)
+        self.assertTrue(table.loc['adx-1000-1-event', 'regression'])
+        # Nothing to compare with
+        self.assertTrue(pd.isnull(table.loc['crossover-1000-1-event', 'speed']))
+        self.assertFalse(table.loc['crossover-1000-1-event', 'regression'])
+        table = run.compare(results, self.baseline, tolerance=0.5)
+        self.assertFalse(table['regression'].any())
+        results['rsi-1000-1-event']['peak_memory'] = 200.0
+        table = run.compare(results, self.baseline, tolerance=0.5)
+        self.assertTrue(table.loc['rsi-1000-1-event', 'regression'])
+
+    def test_baseline(self):
+        self.assertRaises(run.MissingBaseline, run.load_baseline, self.filename)
+        run.save_baseline(self.baseline, self.filename)
+        self.assertEqual(run.load_baseline(self.filename), self.baseline)
+        # Runs not done again are kept
+        result = {'bars_per_second': 2000.0, 'peak_memory': 90.0}
+        run.save_baseline({'rsi-1000-1-event': result}, self.filename)
+        baseline = run.load_baseline(self.filename)
+        self.assertEqual(baseline['rsi-1000-1-event'], result)
+        self.assertEqual(baseline['adx-1000-1-event'], self.baseline['adx-1000-1-event'])
+
+    def test_missing_baseline(self):
+        self.assertRaises(SystemExit, run.main, ['--baseline', self.filename])
+        self.assertFalse(os.path.exists(self.filename))
+
+if __name__ == '__main__':
+    unittest.main()
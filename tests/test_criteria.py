@@ -23,6 +23,14 @@ class TestCriteria(unittest.TestCase):
         self.three = Symbol('THREE')
         self.one_clone = Symbol('ONE_CLONE')
 
+    def assertEvaluateAll(self, crit, data):
+        """
+        The vectorized results match apply() on every bar.
+        """
+        results = crit.evaluate_all(data)
+        self.assertEqual(results.dtype, np.bool_)
+        self.assertEqual(list(results), list(criteria.Criteria.evaluate_all(crit, data)))
+
 class TestBarsSinceAction(TestCriteria):
     def test_bars_since_action(self):
         crit = criteria.BarsSinceAction(self.one, Long(), 2)
@@ -66,6 +74,27 @@ class TestBarsSinceAction(TestCriteria):
         crit = criteria.BarsSinceLong(self.one, 6, 'over')
         self.assertFalse(crit.apply(self.data))
 
+    def test_bars_since_action_evaluate_all(self):
+        for condition in [None, 'over', 'under']:
+            for periods in range(8):
+                crit = criteria.BarsSinceLong(self.one, periods, condition)
+                self.assertTrue(crit.stateful)
+                self.assertEqual(crit.num_bars_required, 1)
+                self.assertEvaluateAll(crit, self.data)
+
+    def test_bars_since_action_incremental(self):
+        for condition in [None, 'over', 'under']:
+            for periods in range(7):
+                crit = criteria.BarsSinceLong(self.one, periods, condition)
+                # One bar at a time, the same bar twice and starting over
+                for _ in range(2):
+                    crit.reset()
+                    for i in range(len(self.data)):
+                        expected = criteria.BarsSinceLong(self.one, periods, condition).apply(self.data[:i + 1])
+                        self.assertEqual(crit.apply(self.data[i:i + 1]), expected)
+                        self.assertEqual(crit.apply(self.data[:i + 1]), expected)
+                self.assertTrue(len(crit.occurences) <= 1)
+
 class TestInMarket(TestCriteria):
     def test_in_market(self):
         crit = criteria.InMarket(self.one)
@@ -98,6 +127,8 @@ class TestIsYear(TestCriteria):
         self.assertFalse(crit.apply(self.data).any())
         crit = criteria.IsYear(2010)
         self.assertTrue(crit.apply(self.data).all())
+        self.assertTrue(crit.evaluate_all(self.data).all())
+        self.assertFalse(criteria.IsYear(2012).evaluate_all(self.data).any())
 
 class TestIsMonth(TestCriteria):
     def test_is_month(self):
@@ -106,6 +137,8 @@ class TestIsMonth(TestCriteria):
         self.assertTrue(crit.apply(self.data).all())
         crit = criteria.IsMonth(1)
         self.assertFalse(crit.apply(self.data).any())
+        self.assertEvaluateAll(crit, self.data)
+        self.assertEvaluateAll(criteria.IsMonth(6), self.data)
 
 class TestIsDay(TestCriteria):
     def test_is_day(self):
@@ -114,6 +147,9 @@ class TestIsDay(TestCriteria):
         self.assertTrue(crit.apply(self.data)[-1])
         crit = criteria.IsDay(8)
         self.assertFalse(crit.apply(self.data)[-1])
+        self.assertEvaluateAll(crit, self.data)
+        self.assertEqual(list(crit.evaluate_all(self.data)), [False] * 7)
+        self.assertEvaluateAll(criteria.IsDay(7), self.data)
 
 class TestIsWeekDay(TestCriteria):
     def test_is_week_day(self):
@@ -124,6 +160,24 @@ class TestIsWeekDay(TestCriteria):
         self.assertTrue(crit.apply(self.data)[-4])
         crit = criteria.IsWeekDay(3)
         self.assertFalse(crit.apply(self.data)[-1])
+        self.assertEvaluateAll(crit, self.data)
+        self.assertEqual(crit.evaluate_all(self.data).sum(), 1)
+
+class TestCalendarFeatures(TestCriteria):
+    def test_calendar_features(self):
+        data = self.data.copy()
+        data['YEAR'] = data.index.year
+        data['MONTH'] = data.index.month
+        data['DAY'] = data.index.day
+        data['WEEKDAY'] = data.index.weekday
+        for crit in [criteria.IsYear(2010), criteria.IsMonth(6), criteria.IsDay(7),
+                     criteria.IsWeekDay(4)]:
+            self.assertEqual(list(crit.apply(data)), list(crit.apply(self.data)))
+            self.assertEvaluateAll(crit, data)
+        # The columns are used instead of the index
+        data['MONTH'] = 1
+        self.assertTrue(criteria.IsMonth(1).apply(data[-1:])[-1])
+        self.assertTrue(criteria.IsMonth(1).evaluate_all(data).all())
 
 class TestPositions(TestCriteria):
     def test_position(self):
@@ -241,6 +295,81 @@ class TestNot(TestCriteria):
         self.assertFalse(ret)
         ret = crit.apply(self.data.head(6))
         self.assertTrue(ret)
+        self.assertEvaluateAll(crit, self.data)
+        self.assertEvaluateAll(criteria.Not(criteria.IsWeekDay(3)), self.data)
+        self.assertEvaluateAll(criteria.Not(criteria.CrossingAbove(str(self.one), 7)), self.data)
+
+class TestAnyOf(TestCriteria):
+    def test_any_of(self):
+        above = criteria.Above(str(self.three), 9) # T, T, F, F, F, T, T
+        below = criteria.Below(str(self.two), 3) # F, F, F, T, T, T, T
+        month = criteria.IsMonth(6)
+        for crit, expected in [(criteria.And([above, below]), [False] * 5 + [True] * 2),
+                               (criteria.Or([above, below]), [True] * 2 + [False] + [True] * 4),
+                               (criteria.AnyOf([above, below, criteria.Not(month)], 2), [False] * 5 + [True] * 2),
+                               (criteria.Or([criteria.And([above, month]), criteria.Not(below)]), [True] * 3 + [False] * 2 + [True] * 2)]:
+            self.assertEqual(list(crit.evaluate_all(self.data)), expected)
+            self.assertEqual([crit.apply(self.data[:i + 1]) for i in range(len(self.data))], expected)
+            self.assertEvaluateAll(crit, self.data)
+        self.assertEqual(str(criteria.Or([month])), 'Or(criteria_list=[IsMonth_6])')
+        # Stops as soon as the result is known
+        missing = criteria.Above('MISSING', 1)
+        self.assertTrue(criteria.Or([month, missing]).apply(self.data))
+        self.assertFalse(criteria.And([criteria.Not(month), missing]).apply(self.data))
+        self.assertRaises(KeyError, criteria.And([month, missing]).apply, self.data)
+        crit = criteria.Or([above, criteria.TrailingStop(self.one, 1), criteria.IsLong(self.one)])
+        self.assertEqual((crit.path_dependent, crit.stateful, crit.num_bars_required), (True, True, 1))
+        self.assertEqual(crit.key(), (crit,))
+        self.assertEqual(criteria.And([above, below]).key(), criteria.And([above, below]).key())
+        self.assertIsNone(criteria.And([above, criteria.Above(str(self.one), 1, lookback=None)]).num_bars_required)
+        # Every criteria is only given the bars it requires
+        week_day = criteria.IsWeekDay(0)
+        week_day.apply = lambda data_frame: self.assertEqual(len(data_frame), 1) or data_frame.index.weekday == 0
+        crit = criteria.And([criteria.Above(str(self.three), 9, lookback=2), week_day])
+        self.assertEqual(crit.num_bars_required, 2)
+        self.assertTrue(crit.apply(self.data))
+
+class TestCountInLastBars(TestCriteria):
+    def test_count_in_last_bars(self):
+        above = criteria.Above(str(self.three), 9) # T, T, F, F, F, T, T
+        for crit, expected in [(criteria.ForBars(above, 2), [False, True, False, False, False, False, True]),
+                               (criteria.AnyOfLastBars(above, 3), [True, True, True, True, False, True, True]),
+                               (criteria.CountInLastBars(above, 4, 2), [False, True, True, True, False, False, True])]:
+            self.assertEqual(list(crit.evaluate_all(self.data)), expected)
+            # One bar at a time, like the strategy
+            self.assertEqual([crit.apply(self.data[i:i + 1]) for i in range(len(self.data))], expected)
+            # Starts over once reset, catching up on every bar of the data_frame
+            crit.reset()
+            self.assertEqual(crit.apply(self.data[:2]), expected[1])
+            self.assertEqual(crit.apply(self.data[:2]), expected[1])
+            self.assertEqual(crit.apply(self.data[2:3]), expected[2])
+        # First applied on a full window, rebuilds the results of the last periods bars
+        crit = criteria.CountInLastBars(above, 4, 2)
+        self.assertEqual(crit.num_bars_required, 4)
+        self.assertEqual(crit.apply(self.data[2:6]), False)
+        self.assertEqual(crit.apply(self.data[3:7]), True)
+        self.assertIsNone(criteria.ForBars(criteria.Above(str(self.three), 9, lookback=None), 2).num_bars_required)
+        crit = criteria.ForBars(criteria.IsMonth(6), 3)
+        self.assertEqual(str(crit), 'ForBars(criteria=IsMonth(month=6), periods=3)')
+        self.assertTrue(crit.apply(self.data))
+        self.assertEqual(crit.stateful, True)
+        self.assertEqual(criteria.AnyOfLastBars(criteria.InMarket(self.one), 3).path_dependent, True)
+
+class TestKey(TestCriteria):
+    def test_key(self):
+        self.assertEqual(criteria.Above(str(self.one), 10).key(),
+                         criteria.Above(str(self.one), 10).key())
+        self.assertNotEqual(criteria.Above(str(self.one), 10).key(),
+                            criteria.Above(str(self.one), 11).key())
+        self.assertNotEqual(criteria.Above(str(self.one), 10).key(),
+                            criteria.Below(str(self.one), 10).key())
+        self.assertEqual(criteria.Not(criteria.InMarket(self.one)).key(),
+                         criteria.Not(criteria.InMarket(self.one)).key())
+        self.assertEqual(criteria.StopLoss(self.one, 1).key(), criteria.StopLoss(self.one, 1).key())
+        # Stateful criteria are only identical to themselves
+        trailing_stop = criteria.TrailingStop(self.one, 1)
+        self.assertEqual(trailing_stop.key(), trailing_stop.key())
+        self.assertNotEqual(trailing_stop.key(), criteria.TrailingStop(self.one, 1).key())
 
 class TestStopLoss(TestCriteria):
     def test_stop_loss(self):
@@ -305,5 +434,16 @@ class TestTrailingStop(TestCriteria):
         self.assertFalse(crit.apply(self.data[:4]))
         self.assertTrue(crit.apply(self.data[:5]))
 
+    def test_trailing_stop_new_trade(self):
+        # The stop left over from the previous trade is not carried over
+        crit = criteria.TrailingStop(self.one, 0.019, short=False, percent=True)
+        crit.stop = 0.5
+        self.assertFalse(crit.apply(self.data[:2]))
+        self.assertAlmostEqual(crit.stop, 0.001)
+        crit = criteria.TrailingStop(self.one, 0.05, short=True, percent=True)
+        crit.stop = -0.5
+        self.assertFalse(crit.apply(self.data[:6]))
+        self.assertAlmostEqual(crit.stop, 0.03)
+
 if __name__ == "__main__":
     unittest.main()
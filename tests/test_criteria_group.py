@@ -1,7 +1,8 @@
 import unittest
 import pandas as pd
 import numpy as np
-from nowtrade import criteria_group, strategy
+from nowtrade import criteria, criteria_group, strategy
+from nowtrade.profiler import Profiler
 from nowtrade.action import Long, Short, LongExit, ShortExit
 from testing_data import DummyCriteria, msft_data
 
@@ -21,5 +22,81 @@ class TestCriteriaGroup(unittest.TestCase):
         out = cg.get_result(msft_data)
         self.assertEqual(out, strategy.NO_ACTION)
 
+    def test_short_circuit(self):
+        class CountingCriteria(DummyCriteria):
+            def __init__(self, value, stateful=False):
+                DummyCriteria.__init__(self, value)
+                self.stateful = stateful
+                self.num_bars_required = 1
+                self.calls = 0
+            def apply(self, data_frame):
+                self.calls += 1
+                return self.value
+        expensive = CountingCriteria(True)
+        expensive.cost = 5
+        selective = CountingCriteria(False)
+        stateful = CountingCriteria(True, stateful=True)
+        cg = criteria_group.CriteriaGroup([expensive, selective, stateful], LongExit(), 'MSFT')
+        data = msft_data.copy()
+        data['STATUS_MSFT'] = 1
+        for _ in range(criteria_group.REORDER_INTERVAL * 2):
+            self.assertEqual(cg.get_result(data), strategy.NO_ACTION)
+        # Stateful criteria are applied on every bar, the expensive one is
+        # skipped once the selective one is known to reject every bar
+        self.assertEqual(stateful.calls, criteria_group.REORDER_INTERVAL * 2)
+        self.assertEqual(selective.calls, criteria_group.REORDER_INTERVAL * 2)
+        self.assertTrue(expensive.calls < criteria_group.REORDER_INTERVAL)
+        self.assertEqual([cg.criteria_list[position] for position in cg._order][:2],
+                         [stateful, selective])
+        # Only timed on the last result before being ordered again
+        self.assertEqual(max(cg._timed_calls), 2)
+        cg.get_result(data, Profiler())
+        self.assertEqual(max(cg._timed_calls), 3)
+        selective.value = True
+        self.assertEqual(cg.get_result(data), strategy.LONG_EXIT)
+
+    def test_cache(self):
+        above = criteria.Above('MSFT_Close', 25.5)
+        long_group = criteria_group.CriteriaGroup([above], Long(), 'MSFT')
+        exit_group = criteria_group.CriteriaGroup([criteria.Above('MSFT_Close', 25.5)],
+                                                  ShortExit(), 'MSFT')
+        short_group = criteria_group.CriteriaGroup([criteria.Not(criteria.Above('MSFT_Close', 25.5))],
+                                                   Short(), 'MSFT')
+        data = msft_data[:1].copy()
+        data['STATUS_MSFT'] = -1
+        cache = {}
+        self.assertEqual(long_group.get_result(data, cache=cache), strategy.NO_ACTION)
+        self.assertEqual(exit_group.get_result(data, cache=cache), strategy.SHORT_EXIT)
+        self.assertEqual(short_group.get_result(data, cache=cache), strategy.NO_ACTION)
+        # Not(InMarket) is shared by the long and short groups and also
+        # gives the result of InMarket
+        self.assertEqual(len(cache), 4)
+        self.assertTrue(cache[above.key()])
+        self.assertTrue(cache[criteria.InMarket('MSFT').key()])
+        # Results in the cache are not applied again
+        cache = {above.key(): False}
+        self.assertEqual(exit_group.get_result(data, cache=cache), strategy.NO_ACTION)
+        data['STATUS_MSFT'] = 0
+        self.assertEqual(short_group.get_result(data, cache=cache), strategy.SHORT)
+        # Every bar at once
+        cache = {}
+        masks = [group.evaluate_all(msft_data, cache=cache) for group in [long_group, exit_group,
+                                                                          short_group]]
+        self.assertEqual(cache.keys(), [above.key()])
+        self.assertTrue((masks[0] == masks[1]).all())
+        self.assertTrue((masks[0] == ~masks[2]).all())
+
+    def test_evaluate_all(self):
+        cg = criteria_group.CriteriaGroup([criteria.Above('MSFT_Close', 25.5),
+                                           criteria.IsWeekDay(1)], Long(), 'MSFT')
+        # Not(InMarket) is path dependent and left out
+        self.assertEqual(list(cg.evaluate_all(msft_data)),
+                         [True, False, False, False, False, False, False, False])
+        profiler = Profiler()
+        cg.evaluate_all(msft_data, profiler)
+        self.assertEqual(sorted(profiler.table().index),
+                         ['evaluate_all Above(param1=MSFT_Close, param2=25.5, lookback=1)',
+                          'evaluate_all IsWeekDay(weekday=1)'])
+
 if __name__ == "__main__":
     unittest.main()
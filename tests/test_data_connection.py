@@ -3,9 +3,27 @@ import unittest
 from nowtrade.data_connection import YahooConnection, \
                             GoogleConnection, \
                             ForexiteConnection, \
-                            MongoDatabaseConnection
+                            MongoDatabaseConnection, \
+                            SyntheticConnection
 from testing_data import msft_data
 
+class TestSyntheticConnection(unittest.TestCase):
+    def test_get_data(self):
+        sc = SyntheticConnection(bars=100, seed=1)
+        data = sc.get_data('MSFT')
+        self.assertEqual(len(data), 100)
+        self.assertEqual(list(data.columns), ['MSFT_Open', 'MSFT_High', 'MSFT_Low',
+                                              'MSFT_Close', 'MSFT_Volume', 'MSFT_Adj Close'])
+        self.assertTrue((data['MSFT_High'] >= data[['MSFT_Open', 'MSFT_Close']].max(axis=1)).all())
+        self.assertTrue((data['MSFT_Low'] <= data[['MSFT_Open', 'MSFT_Close']].min(axis=1)).all())
+        # Seeded by symbol
+        self.assertTrue(data.equals(SyntheticConnection(bars=100, seed=1).get_data('msft')))
+        self.assertFalse((data.values == sc.get_data('AAPL').values).all())
+        self.assertFalse((data.values == SyntheticConnection(bars=100).get_data('MSFT').values).all())
+        # Limited to start/end
+        data = sc.get_data('MSFT', data.index[10], data.index[19])
+        self.assertEqual(len(data), 10)
+
 """
 Tests should not be accessing external resources.
 Commenting out all the DataConnection tests for now.
@@ -1,5 +1,6 @@
 import unittest
-from nowtrade import symbol_list, dataset, technical_indicator
+import numpy as np
+from nowtrade import symbol_list, dataset, technical_indicator, data_connection
 from testing_data import DummyDataConnection, msft_data
 
 class TestDataset(unittest.TestCase):
@@ -20,5 +21,117 @@ class TestDataset(unittest.TestCase):
         self.assertEqual(len(d.technical_indicators), 1)
         self.assertEqual(d.technical_indicators[0], addition)
 
+    def test_reuse_technical_indicators(self):
+        d = dataset.Dataset(self.sl, self.dc, None, None, 0)
+        d.load_data()
+        addition = technical_indicator.Addition(self.symbol.close, 1)
+        self.assertIs(d.add_technical_indicator(addition), addition)
+        d.data_frame[addition.value] = 0
+        # Identical technical indicators are only calculated once
+        identical = technical_indicator.Addition(self.symbol.close, 1)
+        self.assertEqual(identical.key(), addition.key())
+        self.assertIs(d.add_technical_indicator(identical), addition)
+        self.assertEqual(d.data_frame[addition.value][0], 0)
+        self.assertEqual(d.technical_indicators, [addition])
+        subtraction = technical_indicator.Subtraction(self.symbol.close, 1)
+        d.data_frame[subtraction.value] = 0
+        d.reuse_technical_indicators = True
+        d.add_technical_indicator(subtraction)
+        self.assertEqual(d.data_frame[subtraction.value][0], 0)
+        multiplication = technical_indicator.Multiplication(self.symbol.close, 1)
+        d.data_frame[multiplication.value] = 0
+        d.reuse_technical_indicators = False
+        d.add_technical_indicator(multiplication)
+        self.assertEqual(d.data_frame[multiplication.value][0], msft_data['MSFT_Close'][0])
+        self.assertEqual(len(d.technical_indicators), 3)
+
+    def test_technical_indicator_graph(self):
+        d = dataset.Dataset(self.sl, self.dc, None, None, 0)
+        d.load_data()
+        sma = technical_indicator.SMA(self.symbol.close, 2)
+        ema = technical_indicator.EMA(self.symbol.close, 2)
+        addition = technical_indicator.Addition(sma, ema)
+        self.assertEqual(addition.data1, sma.value)
+        self.assertEqual(addition.dependencies, [sma, ema])
+        # Dependencies are calculated first
+        d.add_technical_indicator(addition)
+        self.assertEqual(d.technical_indicators, [sma, ema, addition])
+        self.assertTrue(np.allclose(d.data_frame[addition.value],
+                                    d.data_frame[sma.value] + d.data_frame[ema.value],
+                                    equal_nan=True))
+        # Shared intermediate technical indicators are only calculated once
+        d.data_frame[sma.value] = 0
+        shift = technical_indicator.Shift(technical_indicator.SMA(self.symbol.close, 2), 1)
+        d.add_technical_indicator(shift)
+        self.assertEqual(d.technical_indicators, [sma, ema, addition, shift])
+        self.assertEqual(d.data_frame[shift.value][1], 0)
+        # Calculated again on new bars
+        d.data_frame = d.data_frame[[self.symbol.close]]
+        self.assertIs(d.add_technical_indicator(technical_indicator.SMA(self.symbol.close, 2)), sma)
+        self.assertEqual(d.data_frame[sma.value][1], msft_data['MSFT_Close'][:2].mean())
+
+    def test_add_technical_indicators(self):
+        d = dataset.Dataset(self.sl, self.dc, None, None, 0)
+        d.load_data()
+        existing = d.add_technical_indicator(technical_indicator.SMA(self.symbol.close, 3))
+        smas = [technical_indicator.SMA(self.symbol.close, period) for period in range(2, 6)]
+        maxes = [technical_indicator.Max(self.symbol.high, period) for period in range(2, 6)]
+        added = d.add_technical_indicators(smas + maxes + [technical_indicator.Min(smas[0], 2)])
+        self.assertEqual(added[:len(smas)], [smas[0], existing] + smas[2:])
+        self.assertEqual(d.technical_indicators, [existing] + added[:1] + added[2:])
+        expected = d.data_frame.copy()
+        for technical_indicator_added in added:
+            expected[technical_indicator_added.value] = np.nan
+            technical_indicator_added.results(expected)
+            self.assertTrue(np.allclose(d.data_frame[technical_indicator_added.value], \
+                                        expected[technical_indicator_added.value], equal_nan=True))
+        self.assertEqual(d.add_technical_indicators([]), [])
+
+    def test_update_technical_indicators(self):
+        d = dataset.Dataset(self.sl, self.dc, None, None, 0)
+        d.load_data()
+        new_bars = d.data_frame[-3:]
+        d.data_frame = d.data_frame[:-3]
+        sma = technical_indicator.SMA(self.symbol.close, 2)
+        addition = technical_indicator.Addition(sma.value, 1)
+        d.add_technical_indicator(sma)
+        d.add_technical_indicator(addition)
+        d.update_technical_indicators()
+        self.assertEqual(sma.streamed, d.data_frame.index[-1])
+        d.data_frame = d.data_frame.combine_first(new_bars)
+        d.update_technical_indicators()
+        self.assertEqual(sma.streamed, msft_data.index[-1])
+        expected = msft_data['MSFT_Close'].rolling(2).mean()
+        self.assertTrue(np.allclose(d.data_frame[sma.value], expected, equal_nan=True))
+        self.assertTrue(np.allclose(d.data_frame[addition.value], expected + 1, equal_nan=True))
+
+    def test_add_calendar_features(self):
+        d = dataset.Dataset(self.sl, self.dc, None, None, 0)
+        d.load_data()
+        d.add_calendar_features()
+        self.assertEqual(list(d.data_frame[dataset.YEAR]), list(msft_data.index.year))
+        self.assertEqual(list(d.data_frame[dataset.MONTH]), list(msft_data.index.month))
+        self.assertEqual(list(d.data_frame[dataset.DAY]), list(msft_data.index.day))
+        self.assertEqual(list(d.data_frame[dataset.WEEKDAY]), list(msft_data.index.weekday))
+        # Daily bars
+        self.assertNotIn(dataset.MINUTE_OF_DAY, d.data_frame)
+        self.assertNotIn(dataset.SESSION, d.data_frame)
+        intraday = dataset.Dataset(self.sl, data_connection.SyntheticConnection(bars=3000),
+                                   None, None, 0)
+        intraday.load_data()
+        intraday.add_calendar_features()
+        index = intraday.data_frame.index
+        self.assertEqual(list(intraday.data_frame[dataset.MINUTE_OF_DAY]),
+                         list(index.hour * 60 + index.minute))
+        sessions = intraday.data_frame[dataset.SESSION]
+        self.assertEqual(sessions[0], 10959) # 2000-01-03
+        self.assertTrue(np.array_equal(np.diff(sessions) > 0,
+                                       np.diff(intraday.data_frame[dataset.DAY]) != 0))
+        # Calculated again on the resampled bars
+        intraday.data_frame = intraday.data_frame.drop('MSFT_Adj Close', axis=1)
+        intraday.resample('H')
+        self.assertEqual(len(intraday.data_frame), 50)
+        self.assertEqual(list(intraday.data_frame[dataset.MINUTE_OF_DAY][:3]), [0, 60, 120])
+
 if __name__ == "__main__":
     unittest.main()
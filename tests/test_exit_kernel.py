@@ -0,0 +1,92 @@
+"""
+Tests for the NowTrade exit kernel.
+"""
+import unittest
+import numpy as np
+from nowtrade import symbol_list, data_connection, dataset, technical_indicator, \
+                     criteria, criteria_group, trading_profile, trading_amount, \
+                     trading_fee, strategy
+from nowtrade.exit_kernel import kernel_checks, exit_kernel
+from nowtrade.action import Long, Short, LongExit, ShortExit
+
+class TestExitKernel(unittest.TestCase):
+    """
+    Test the exit kernel against the event simulation.
+    """
+    def setUp(self):
+        self.sl = symbol_list.SymbolList(['SYN'])
+        self.symbol = self.sl.get('syn')
+        self.d = dataset.Dataset(self.sl, data_connection.SyntheticConnection(bars=1000),
+                                 None, None, 0)
+        self.d.load_data()
+        self.fast = technical_indicator.SMA(self.symbol.close, 5)
+        self.slow = technical_indicator.SMA(self.symbol.close, 20)
+        self.d.add_technical_indicator(self.fast)
+        self.d.add_technical_indicator(self.slow)
+        self.tp = trading_profile.TradingProfile(100000, trading_amount.CapitalPercentage(20),
+                                                 trading_fee.StaticFee(1), slippage=0.1)
+
+    def get_criteria_groups(self):
+        symbol = self.symbol
+        return [
+            criteria_group.CriteriaGroup([criteria.CrossingAbove(self.fast, self.slow)], Long(), symbol),
+            criteria_group.CriteriaGroup([criteria.CrossingBelow(self.fast, self.slow)], Short(), symbol),
+            criteria_group.CriteriaGroup([criteria.TrailingStop(symbol, 0.002, percent=True)],
+                                         LongExit(), symbol),
+            criteria_group.CriteriaGroup([criteria.StopLoss(symbol, 0.1)], LongExit(), symbol),
+            criteria_group.CriteriaGroup([criteria.TakeProfit(symbol, 50)], LongExit(), symbol),
+            criteria_group.CriteriaGroup([criteria.TrailingStop(symbol, 0.2, short=True)],
+                                         ShortExit(), symbol),
+            criteria_group.CriteriaGroup([criteria.StopLoss(symbol, 0.001, short=True, percent=True)],
+                                         ShortExit(), symbol),
+            criteria_group.CriteriaGroup([criteria.TakeProfit(symbol, 50, short=True)],
+                                         ShortExit(), symbol)]
+
+    def test_kernel_checks(self):
+        stop_loss = criteria.StopLoss(self.symbol, 0.1)
+        in_market = criteria.InMarket(self.symbol)
+        above = criteria.Above(self.symbol.close, 100)
+        checks = kernel_checks([above, stop_loss, criteria.Not(in_market)], 'SYN')
+        self.assertEqual(checks, [(stop_loss, False), (in_market, True)])
+        self.assertEqual(kernel_checks([above], 'SYN'), [])
+        self.assertEqual(kernel_checks([stop_loss], 'OTHER'), None)
+        self.assertEqual(kernel_checks([criteria.Not(stop_loss)], 'SYN'), None)
+        self.assertEqual(kernel_checks([criteria.BarsSinceLong(self.symbol, 2)], 'SYN'), None)
+
+    def test_exit_kernel(self):
+        strat = strategy.Strategy(self.d, self.get_criteria_groups(), self.tp)
+        strat.simulate()
+        event_data_frame = strat.realtime_data_frame
+        event_pretty_overview = strat.report.pretty_overview()
+        event_upcoming_actions = strat.upcoming_actions
+        self.assertTrue(strat.report.overview()['trades'] > 10)
+        groups = []
+        for crit_group in self.get_criteria_groups():
+            mask = crit_group.evaluate_all(self.d.data_frame)
+            groups.append((crit_group.raw_action(), mask,
+                           kernel_checks(crit_group.criteria_list, 'SYN')))
+        strat = strategy.Strategy(self.d, self.get_criteria_groups(), self.tp)
+        actions, statuses, metrics, upcoming = exit_kernel(self.d.data_frame['SYN_Open'].values,
+                                                           self.d.data_frame['SYN_Close'].values,
+                                                           groups, strat.report, 'SYN',
+                                                           lambda position: self.d.data_frame.index[position])
+        self.assertTrue(np.array_equal(actions, event_data_frame['ACTIONS_SYN'].values))
+        self.assertTrue(np.array_equal(statuses, event_data_frame['STATUS_SYN'].values))
+        for column, name in enumerate(['PL', 'CHANGE_VALUE', 'CHANGE_PERCENT']):
+            self.assertTrue(np.allclose(metrics[:, column], event_data_frame['%s_SYN' %name].values,
+                                        equal_nan=True))
+        self.assertEqual(upcoming, event_upcoming_actions['SYN'])
+        self.assertEqual(strat.report.pretty_overview(), event_pretty_overview)
+        # Used by the vectorized simulation
+        strat = strategy.Strategy(self.d, self.get_criteria_groups(), self.tp)
+        profiler = strat.enable_profiler()
+        strat.simulate(mode='vectorized')
+        self.assertEqual(profiler.calls['exit_kernel'], 1)
+        self.assertEqual(strat.upcoming_actions, event_upcoming_actions)
+        self.assertEqual(strat.report.pretty_overview(), event_pretty_overview)
+        for column in event_data_frame.columns:
+            self.assertTrue(np.allclose(strat.realtime_data_frame[column],
+                                        event_data_frame[column], equal_nan=True))
+
+if __name__ == "__main__":
+    unittest.main()
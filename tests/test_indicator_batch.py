@@ -0,0 +1,44 @@
+"""
+Tests for the NowTrade indicator batch functions.
+"""
+import unittest
+import numpy as np
+import pandas as pd
+from nowtrade import indicator_batch
+
+class TestIndicatorBatch(unittest.TestCase):
+    """
+    Test the batch functions against their pandas equivalent.
+    """
+    def setUp(self):
+        self.values = np.cumsum(np.random.RandomState(0).randn(300)) + 100
+        self.values[[10, 150, 151]] = np.nan
+        self.periods = range(1, 40) + [64, 100, 299, 300, 301]
+
+    def check(self, batch, function):
+        """
+        Compares the rows returned by the batch with the pandas function.
+        """
+        results = batch(self.values, self.periods)
+        self.assertEqual(results.shape, (len(self.periods), len(self.values)))
+        for row, period in enumerate(self.periods):
+            expected = function(pd.Series(self.values), period).values
+            self.assertTrue(np.allclose(results[row], expected, equal_nan=True), period)
+
+    def test_rolling_mean(self):
+        self.check(indicator_batch.rolling_mean, pd.rolling_mean)
+
+    def test_rolling_max(self):
+        self.check(indicator_batch.rolling_max, pd.rolling_max)
+
+    def test_rolling_min(self):
+        self.check(indicator_batch.rolling_min, pd.rolling_min)
+
+    def test_invalid_period(self):
+        self.assertRaises(indicator_batch.InvalidPeriod, indicator_batch.rolling_mean, \
+                          self.values, [5, 0])
+        self.assertRaises(indicator_batch.InvalidPeriod, indicator_batch.rolling_max, \
+                          self.values, [-1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests for the NowTrade IndicatorCache object.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from nowtrade import symbol_list, dataset, technical_indicator, indicator_batch
+from nowtrade.indicator_cache import IndicatorCache
+from testing_data import DummyDataConnection
+
+class CountingADX(technical_indicator.ADX):
+    """
+    ADX counting the number of times it is calculated.
+    """
+    calculated = 0
+    def results(self, data_frame):
+        CountingADX.calculated += 1
+        technical_indicator.ADX.results(self, data_frame)
+
+class CountingSMA(technical_indicator.SMA):
+    """
+    SMA keeping the periods calculated in a batch.
+    """
+    periods = []
+    @staticmethod
+    def batch(values, periods):
+        CountingSMA.periods.extend(periods)
+        return indicator_batch.rolling_mean(values, periods)
+
+class CountingClose(technical_indicator.TechnicalIndicator):
+    """
+    Technical indicator that does not declare its inputs.
+    """
+    calculated = 0
+    def __init__(self, symbol):
+        technical_indicator.TechnicalIndicator.__init__(self)
+        self.value = 'CLOSE_%s' %symbol
+        self.symbol = str(symbol)
+    def results(self, data_frame):
+        CountingClose.calculated += 1
+        data_frame[self.value] = data_frame['%s_Close' %self.symbol]
+
+class TestIndicatorCache(unittest.TestCase):
+    """
+    Test the IndicatorCache object.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = IndicatorCache(os.path.join(self.directory, 'cache'))
+        self.symbol = symbol_list.SymbolList(['msft']).get('msft')
+        CountingADX.calculated = 0
+        CountingSMA.periods = []
+        CountingClose.calculated = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def dataset(self):
+        """
+        Returns a dataset using the cache.
+        """
+        data = dataset.Dataset(symbol_list.SymbolList(['msft']), DummyDataConnection(), \
+                               None, None, 0)
+        data.load_data()
+        data.indicator_cache = self.cache
+        return data
+
+    def test_load(self):
+        first = self.dataset()
+        adx = CountingADX(self.symbol, 5)
+        first.add_technical_indicator(adx)
+        self.assertEqual(CountingADX.calculated, 1)
+        self.assertEqual(len(self.cache._entries()), 1)
+        second = self.dataset()
+        second.add_technical_indicator(CountingADX(self.symbol, 5))
+        self.assertEqual(CountingADX.calculated, 1)
+        for column in [adx.value, adx.plus_di, adx.minus_di]:
+            self.assertTrue(np.allclose(first.data_frame[column], second.data_frame[column], \
+                                        equal_nan=True))
+        # Different parameters or input values are different entries
+        second.add_technical_indicator(CountingADX(self.symbol, 6))
+        third = self.dataset()
+        third.data_frame[self.symbol.high] += 1
+        third.add_technical_indicator(CountingADX(self.symbol, 5))
+        self.assertEqual(CountingADX.calculated, 3)
+        self.assertEqual(len(self.cache._entries()), 3)
+
+    def test_dependencies(self):
+        sma = technical_indicator.SMA(self.symbol.close, 3)
+        addition = technical_indicator.Addition(sma, 1)
+        self.dataset().add_technical_indicator(addition)
+        self.assertEqual(len(self.cache._entries()), 2)
+        data = self.dataset()
+        data.data_frame[self.symbol.close] *= 2
+        data.add_technical_indicator(technical_indicator.Addition( \
+            technical_indicator.SMA(self.symbol.close, 3), 1))
+        self.assertTrue(np.allclose(data.data_frame[addition.value], \
+                                    data.data_frame[sma.value] + 1, equal_nan=True))
+        self.assertEqual(len(self.cache._entries()), 4)
+
+    def test_batch(self):
+        first = self.dataset()
+        first.add_technical_indicator(CountingSMA(self.symbol.close, 3))
+        first.add_technical_indicators([CountingSMA(self.symbol.close, period) \
+                                        for period in [2, 3, 4]])
+        self.assertEqual(sorted(CountingSMA.periods), [2, 4])
+        self.assertEqual(len(self.cache._entries()), 3)
+        second = self.dataset()
+        smas = second.add_technical_indicators([CountingSMA(self.symbol.close, period) \
+                                                for period in [2, 3, 4, 5]])
+        self.assertEqual(sorted(CountingSMA.periods), [2, 4, 5])
+        self.assertEqual(len(self.cache._entries()), 4)
+        for sma in smas[:-1]:
+            self.assertTrue(np.allclose(first.data_frame[sma.value], \
+                                        second.data_frame[sma.value], equal_nan=True))
+        self.assertEqual(second.technical_indicators, smas)
+
+    def test_not_cached(self):
+        network = technical_indicator.NeuralNetwork(None, name='network')
+        self.assertEqual(self.cache.address(network, self.dataset().data_frame), None)
+        # Inputs never declared with _input(), never stored nor loaded
+        first = self.dataset()
+        first.add_technical_indicator(CountingClose(self.symbol))
+        self.assertEqual(len(self.cache._entries()), 0)
+        second = self.dataset()
+        second.data_frame[self.symbol.close] += 1
+        second.add_technical_indicator(CountingClose(self.symbol))
+        self.assertEqual(CountingClose.calculated, 2)
+        self.assertTrue(np.allclose(second.data_frame['CLOSE_MSFT'], \
+                                    second.data_frame[self.symbol.close]))
+
+    def test_evict(self):
+        data = self.dataset()
+        data.add_technical_indicator(technical_indicator.SMA(self.symbol.close, 2))
+        data.add_technical_indicator(technical_indicator.SMA(self.symbol.close, 3))
+        (first, size, _), (second, _, _) = sorted(self.cache._entries())
+        os.utime(first, (1000, 1000))
+        os.utime(second, (2000, 2000))
+        self.cache.max_bytes = 2 * size
+        data.add_technical_indicator(technical_indicator.SMA(self.symbol.close, 4))
+        paths = [path for path, _, _ in self.cache._entries()]
+        self.assertEqual(len(paths), 2)
+        self.assertNotIn(first, paths)
+        self.assertIn(second, paths)
+        self.assertEqual(self.cache.size(), 2 * size)
+        self.cache.clear()
+        self.assertEqual(self.cache.size(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Tests for the NowTrade Optimizer object.
+"""
+import unittest
+from testing_data import DummyDataConnection
+from nowtrade import symbol_list, dataset, technical_indicator, criteria, \
+                     criteria_group, trading_profile, trading_amount, \
+                     trading_fee, strategy
+from nowtrade.optimizer import Optimizer, WalkForward, parameter_combinations, \
+                               walk_forward_windows
+from nowtrade.action import Long, LongExit
+
+def sma_strategy(data, period, bars):
+    """
+    Strategy factory used by the optimizer tests.
+    """
+    symbol = data.symbol_list.get('msft')
+    sma = technical_indicator.SMA(symbol.close, period)
+    data.add_technical_indicator(sma)
+    enter_crit_group = criteria_group.CriteriaGroup([criteria.Above(symbol.close, sma)],
+                                                    Long(), symbol)
+    exit_crit_group = criteria_group.CriteriaGroup([criteria.BarsSinceLong(symbol, bars)],
+                                                   LongExit(), symbol)
+    tp = trading_profile.TradingProfile(10000, trading_amount.StaticAmount(5000),
+                                        trading_fee.StaticFee(0))
+    return strategy.Strategy(data, [enter_crit_group, exit_crit_group], tp)
+
+class TestOptimizer(unittest.TestCase):
+    """
+    Test the Optimizer object.
+    """
+    def setUp(self):
+        self.sl = symbol_list.SymbolList(['MSFT'])
+        self.d = dataset.Dataset(self.sl, DummyDataConnection(), None, None, 0)
+        self.d.load_data()
+        self.grid = {'period': [2, 3], 'bars': [1, 2, 3]}
+
+    def test_parameter_combinations(self):
+        self.assertEqual(parameter_combinations({'a': [1, 2], 'b': [3]}),
+                         [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}])
+        self.assertEqual(len(parameter_combinations(self.grid)), 6)
+
+    def test_optimizer(self):
+        progress = []
+        optimizer = Optimizer(self.d, sma_strategy, self.grid, processes=1)
+        results = optimizer.run(lambda *args: progress.append(args))
+        self.assertEqual(len(results), 6)
+        self.assertEqual(len(progress), 6)
+        self.assertEqual(progress[-1][:2], (6, 6))
+        self.assertEqual(list(results.columns[:2]), ['bars', 'period'])
+        self.assertTrue(results['net_profit'].is_monotonic_decreasing)
+        # The dataset is left untouched
+        self.assertEqual(len(self.d.data_frame.columns), 6)
+        self.assertEqual(len(self.d.technical_indicators), 0)
+        # Same results in parallel
+        parallel_results = Optimizer(self.d, sma_strategy, self.grid, processes=2).run()
+        self.assertTrue(parallel_results.equals(results))
+        # Same results as a single backtest
+        best = sma_strategy(self.d, results['period'][0], results['bars'][0])
+        best.simulate()
+        self.assertAlmostEqual(best.report.overview()['net_profit'], results['net_profit'][0])
+        self.assertEqual(best.report.overview()['trades'], results['trades'][0])
+
+    def test_technical_indicators(self):
+        results = Optimizer(self.d, sma_strategy, self.grid, processes=1).run()
+        close = self.sl.get('msft').close
+        smas = [technical_indicator.SMA(close, period) for period in self.grid['period']]
+        optimizer = Optimizer(self.d, sma_strategy, self.grid, processes=1, \
+                              technical_indicators=smas)
+        self.assertTrue(optimizer.run().equals(results))
+        # Calculated once, on a copy of the dataset
+        self.assertEqual(len(self.d.data_frame.columns), 6)
+        self.assertEqual(len(self.d.technical_indicators), 0)
+        walk_forward = WalkForward(self.d, sma_strategy, self.grid, 4, 2, processes=1, \
+                                   technical_indicators=smas)
+        self.assertEqual(len(walk_forward.run()), 2)
+
+    def test_cancel(self):
+        optimizer = Optimizer(self.d, sma_strategy, self.grid, processes=1)
+        results = optimizer.run(lambda completed, *args: completed == 2 and optimizer.cancel())
+        self.assertEqual(len(results), 2)
+        self.assertFalse(optimizer.cancelled)
+        # Cancelled before the run starts
+        optimizer.cancel()
+        self.assertEqual(len(optimizer.run()), 0)
+        self.assertFalse(optimizer.cancelled)
+
+class TestWalkForward(unittest.TestCase):
+    """
+    Test the WalkForward object.
+    """
+    def setUp(self):
+        self.sl = symbol_list.SymbolList(['MSFT'])
+        self.d = dataset.Dataset(self.sl, DummyDataConnection(), None, None, 0)
+        self.d.load_data()
+        self.grid = {'period': [2, 3], 'bars': [1, 2]}
+
+    def test_walk_forward_windows(self):
+        self.assertEqual(walk_forward_windows(10, 4, 3),
+                         [((0, 4), (4, 7)), ((3, 7), (7, 10))])
+        self.assertEqual(walk_forward_windows(10, 4, 3, anchored=True),
+                         [((0, 4), (4, 7)), ((0, 7), (7, 10))])
+        self.assertEqual(walk_forward_windows(4, 4, 3), [])
+
+    def test_walk_forward(self):
+        walk_forward = WalkForward(self.d, sma_strategy, self.grid, 4, 2, processes=1)
+        results = walk_forward.run()
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results['in_sample_start'][1], self.d.data_frame.index[2])
+        self.assertEqual(results['out_of_sample_start'][0], self.d.data_frame.index[4])
+        self.assertEqual(results['out_of_sample_end'][1], self.d.data_frame.index[-1])
+        self.assertTrue('in_sample_net_profit' in results)
+        self.assertEqual(list(walk_forward.equity_curve.index), list(self.d.data_frame.index[4:]))
+        self.assertEqual(walk_forward.equity_curve[0], 10000)
+        # The dataset is left untouched
+        self.assertEqual(len(self.d.data_frame.columns), 6)
+        # Same results in parallel
+        parallel = WalkForward(self.d, sma_strategy, self.grid, 4, 2, processes=2)
+        self.assertTrue(parallel.run().equals(results))
+        self.assertTrue(parallel.equity_curve.equals(walk_forward.equity_curve))
+        # Out-of-sample results of the first window
+        for period in [2, 3]:
+            self.d.add_technical_indicator(technical_indicator.SMA(self.sl.get('msft').close, period))
+        self.d.data_frame = self.d.data_frame[4:6]
+        self.d.reuse_technical_indicators = True
+        best = sma_strategy(self.d, results['period'][0], results['bars'][0])
+        best.simulate()
+        self.assertEqual(best.report.overview()['trades'], results['trades'][0])
+
+    def test_cancel(self):
+        walk_forward = WalkForward(self.d, sma_strategy, self.grid, 4, 2, processes=1)
+        results = walk_forward.run(lambda completed, *args: walk_forward.cancel())
+        self.assertEqual(len(results), 0)
+        self.assertTrue('in_sample_net_profit' in results)
+        self.assertEqual(len(walk_forward.equity_curve), 0)
+        self.assertFalse(walk_forward.cancelled)
+
+if __name__ == "__main__":
+    unittest.main()
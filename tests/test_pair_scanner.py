@@ -0,0 +1,57 @@
+"""
+Tests for the NowTrade PairScanner object.
+"""
+import unittest
+import datetime
+import numpy as np
+from nowtrade import symbol_list, data_connection
+from nowtrade.pair_scanner import PairScanner, COLUMNS
+
+START = datetime.datetime(2000, 01, 01)
+
+class PairConnection(data_connection.SyntheticConnection):
+    """
+    Synthetic connection where PAIR is cointegrated with BASE and MISSING
+    has no data.
+    """
+    def get_data(self, symbol, start=None, end=None, **kwargs):
+        if str(symbol) == 'MISSING':
+            raise data_connection.NoDataException()
+        if str(symbol) != 'PAIR':
+            return data_connection.SyntheticConnection.get_data(self, symbol, start, end, \
+                                                                **kwargs)
+        data = data_connection.SyntheticConnection.get_data(self, 'BASE', start, end, **kwargs)
+        noise = np.random.RandomState(0).normal(0, 0.1, len(data))
+        data['BASE_Close'] = 2 * data['BASE_Close'] + 5 + noise
+        return data.rename(columns=lambda name: name.replace('BASE', 'PAIR'))
+
+class TestPairScanner(unittest.TestCase):
+    """
+    Test the PairScanner object.
+    """
+    def setUp(self):
+        self.symbols = symbol_list.SymbolList(['BASE', 'SYM0', 'PAIR', 'SYM1', 'MISSING'])
+        self.connection = PairConnection(bars=500, volatility=0.01)
+
+    def test_pair_scanner(self):
+        progress = []
+        scanner = PairScanner(self.symbols, self.connection, start_datetime=START, processes=1)
+        pairs = scanner.run(lambda *args: progress.append(args))
+        self.assertEqual(scanner.missing, ['MISSING'])
+        self.assertEqual(len(progress), 6)
+        self.assertEqual(list(pairs.columns), COLUMNS)
+        self.assertEqual(len(pairs), 6)
+        self.assertEqual((pairs['y'][0], pairs['x'][0]), ('BASE', 'PAIR'))
+        self.assertTrue(pairs['cointegrated'][0])
+        self.assertAlmostEqual(pairs['hedge_ratio'][0], 0.5, places=2)
+        self.assertEqual(pairs['bars'][0], 500)
+        self.assertTrue((np.diff(pairs['adf']) >= 0).all())
+
+    def test_pair_scanner_pool(self):
+        scanner = PairScanner(self.symbols, self.connection, start_datetime=START, processes=2)
+        expected = PairScanner(self.symbols, self.connection, start_datetime=START,
+                               processes=1).run()
+        self.assertTrue(scanner.run().equals(expected))
+
+if __name__ == "__main__":
+    unittest.main()
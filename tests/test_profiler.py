@@ -0,0 +1,69 @@
+"""
+Tests for the NowTrade Profiler object.
+"""
+import unittest
+from testing_data import DummyDataConnection
+from nowtrade import symbol_list, dataset, criteria, criteria_group, \
+                     trading_profile, trading_amount, trading_fee, strategy
+from nowtrade.profiler import Profiler
+from nowtrade.action import Long, LongExit
+
+class TestProfiler(unittest.TestCase):
+    """
+    Test the Profiler object.
+    """
+    def setUp(self):
+        self.sl = symbol_list.SymbolList(['MSFT'])
+        self.symbol = self.sl.get('msft')
+        self.d = dataset.Dataset(self.sl, DummyDataConnection(), None, None, 0)
+        self.d.load_data()
+
+    def get_strategy(self):
+        enter_crit_group = criteria_group.CriteriaGroup([criteria.Above(self.symbol.close, 25.88)],
+                                                        Long(), self.symbol)
+        exit_crit_group = criteria_group.CriteriaGroup([criteria.BarsSinceLong(self.symbol, 2)],
+                                                       LongExit(), self.symbol)
+        tp = trading_profile.TradingProfile(10000, trading_amount.StaticAmount(5000),
+                                            trading_fee.StaticFee(0))
+        return strategy.Strategy(self.d, [enter_crit_group, exit_crit_group], tp)
+
+    def test_profiler(self):
+        profiler = Profiler()
+        self.assertEqual(profiler.call('sum', sum, [1, 2]), 3)
+        profiler.call(('apply', 'Above'), sum, [1])
+        profiler.record('sum', 1.0)
+        self.assertEqual(profiler.calls['sum'], 2)
+        table = profiler.table()
+        self.assertEqual(list(table.index), ['sum', 'apply Above'])
+        self.assertEqual(list(table.columns), ['calls', 'total_time', 'average_time', 'percent'])
+        self.assertEqual(table['percent']['sum'], 100)
+        self.assertEqual(str(profiler), 'Profiler(sections=2)')
+        profiler.reset()
+        self.assertEqual(len(profiler.table()), 0)
+
+    def test_strategy_profiler(self):
+        strat = self.get_strategy()
+        self.assertTrue(strat.profiler is None)
+        profiler = strat.enable_profiler()
+        strat.simulate()
+        table = profiler.table()
+        for section in ['process_new_data', 'merge', 'criteria_window',
+                        'add_preprocess_metrics', 'handle_action']:
+            self.assertEqual(table['calls'][section], len(self.d.data_frame))
+        self.assertEqual(table.index[0], 'process_new_data')
+        applies = [section for section in table.index if section.startswith('apply')]
+        self.assertEqual(len(applies), 4)
+        self.assertTrue((table['calls'][applies] <= len(self.d.data_frame)).all())
+        # The position checks are applied first, on every bar
+        self.assertEqual(table['calls']['apply Not(criteria=InMarket(symbol=MSFT))'],
+                         len(self.d.data_frame))
+        self.assertEqual(len([section for section in table.index
+                              if section.startswith('get_result')]), 2)
+        # Vectorized mode
+        strat = self.get_strategy()
+        profiler = strat.enable_profiler()
+        strat.simulate(strategy.VECTORIZED)
+        self.assertEqual(profiler.table()['calls']['simulate_bar'], len(self.d.data_frame))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Tests for the NowTrade regression functions.
+"""
+import unittest
+import numpy as np
+import pandas as pd
+from nowtrade import regression
+
+class TestRegression(unittest.TestCase):
+    """
+    Test the regression functions.
+    """
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.x_values = np.cumsum(random.randn(500)) + 1000
+        self.noise = np.zeros(500)
+        for bar in range(1, 500): # Mean reverting
+            self.noise[bar] = 0.5 * self.noise[bar - 1] + random.randn()
+        self.y_values = 2 * self.x_values + 10 + self.noise
+        self.x_values[100] = np.nan
+
+    def test_rolling_ols(self):
+        intercept, slope = regression.rolling_ols(self.y_values, self.x_values, 20)
+        self.assertTrue(np.isnan(slope[:19]).all())
+        self.assertTrue(np.isnan(slope[100:120]).all())
+        for bar in [19, 99, 120, 499]:
+            expected = np.polyfit(self.x_values[bar - 19:bar + 1], \
+                                  self.y_values[bar - 19:bar + 1], 1)
+            self.assertAlmostEqual(slope[bar], expected[0])
+            self.assertAlmostEqual(intercept[bar], expected[1], places=5)
+        _, slope = regression.rolling_ols(self.y_values, np.ones(500), 20)
+        self.assertTrue(np.isnan(slope).all())
+
+    def test_rolling_zscore(self):
+        values = pd.Series(self.x_values)
+        expected = (values - pd.rolling_mean(values, 20)) / pd.rolling_std(values, 20)
+        self.assertTrue(np.allclose(regression.rolling_zscore(self.x_values, 20), \
+                                    expected, equal_nan=True))
+
+    def test_engle_granger(self):
+        _, hedge_ratio, statistic, half_life = \
+            regression.engle_granger(self.y_values, self.x_values)
+        self.assertAlmostEqual(hedge_ratio, 2, delta=0.05)
+        self.assertLess(statistic, regression.engle_granger_critical_value(0.01, 499))
+        self.assertAlmostEqual(half_life, 1, delta=0.5)
+        random_walk = np.cumsum(np.random.RandomState(1).randn(500))
+        statistic = regression.engle_granger(random_walk, self.x_values)[2]
+        self.assertGreater(statistic, regression.engle_granger_critical_value(0.10, 499))
+        self.assertTrue(np.isnan(regression.engle_granger([1, 2], [1, 1])[2]))
+
+    def test_engle_granger_critical_value(self):
+        # MacKinnon (2010) asymptotic values and a sample of 100 bars
+        self.assertAlmostEqual(regression.engle_granger_critical_value(0.05, np.inf), -3.33613)
+        self.assertAlmostEqual(regression.engle_granger_critical_value(0.05, 100), \
+                               -3.33613 - 6.1101 / 100 - 6.823 / 100 ** 2)
+        values = regression.engle_granger_critical_value(0.01, [50, 100, 1000])
+        self.assertTrue((np.diff(values) > 0).all())
+        self.assertLess(regression.engle_granger_critical_value(0.01, 100), \
+                        regression.engle_granger_critical_value(0.10, 100))
+
+if __name__ == "__main__":
+    unittest.main()
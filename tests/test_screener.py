@@ -0,0 +1,123 @@
+"""
+Tests for the NowTrade Screener object.
+"""
+import unittest
+import datetime
+from nowtrade import symbol_list, data_connection, dataset, technical_indicator, \
+                     criteria, criteria_group
+from nowtrade.screener import Screener
+from nowtrade.action import Long, Short
+
+SYMBOLS = ['SYM%s' %number for number in range(20)]
+START = datetime.datetime(2000, 01, 01)
+
+def sma_criteria(data, symbol):
+    """
+    Criteria factory used by the screener tests.
+    """
+    sma = technical_indicator.SMA(symbol.close, 20)
+    data.add_technical_indicator(sma)
+    return [criteria_group.CriteriaGroup([criteria.Above(symbol.close, sma),
+                                          criteria.Not(criteria.InMarket(symbol))],
+                                         Long(), symbol),
+            criteria_group.CriteriaGroup([criteria.Below(symbol.close, sma),
+                                          criteria.StopLoss(symbol, 1)],
+                                         Short(), symbol)]
+
+class MissingSymbolConnection(data_connection.SyntheticConnection):
+    """
+    Synthetic connection without data for the MISSING symbol.
+    """
+    def get_data(self, symbol, start=None, end=None, **kwargs):
+        if str(symbol) == 'MISSING':
+            raise data_connection.NoDataException()
+        return data_connection.SyntheticConnection.get_data(self, symbol, start, end, **kwargs)
+
+class RecordingConnection(MissingSymbolConnection):
+    """
+    Synthetic connection keeping the symbol, start and number of bars of
+    every load.  The GAPPED symbol is missing bars near the end.
+    """
+    def __init__(self, *args, **kwargs):
+        MissingSymbolConnection.__init__(self, *args, **kwargs)
+        self.loads = []
+    def get_data(self, symbol, start=None, end=None, **kwargs):
+        data = MissingSymbolConnection.get_data(self, symbol, None, end, **kwargs)
+        if str(symbol) == 'GAPPED':
+            data = data.drop(data.index[-30:-5])
+        data = data[start:]
+        self.loads.append((str(symbol), start, len(data)))
+        return data
+
+class TestScreener(unittest.TestCase):
+    """
+    Test the Screener object.
+    """
+    def setUp(self):
+        self.connection = MissingSymbolConnection(bars=500)
+
+    def expected(self, symbols=SYMBOLS):
+        """
+        Symbols whose close is above their SMA on the last bar of all the data.
+        """
+        names = symbols
+        symbols = []
+        for name in names:
+            data = dataset.Dataset(symbol_list.SymbolList([name]), self.connection, START)
+            data.load_data()
+            symbol = list(data.symbol_list)[0]
+            sma = technical_indicator.SMA(symbol.close, 20)
+            data.add_technical_indicator(sma)
+            if data.data_frame[symbol.close][-1] > data.data_frame[sma.value][-1]:
+                symbols.append(name)
+        return symbols
+
+    def test_screener(self):
+        progress = []
+        screener = Screener(SYMBOLS + ['MISSING'], self.connection, sma_criteria,
+                            start_datetime=START, processes=1)
+        self.assertEqual(screener.get_lookback(), 21)
+        results = screener.run(lambda *args: progress.append(args))
+        self.assertEqual(len(progress), 21)
+        self.assertEqual(screener.missing, ['MISSING'])
+        self.assertEqual(list(results.columns), ['symbol', 'datetime', 'action'])
+        self.assertEqual(list(results['symbol']), self.expected())
+        self.assertTrue((results['action'] == 'LONG').all())
+        self.assertTrue((results['datetime'] == self.connection.get_data('SYM0').index[-1]).all())
+
+    def test_screener_pool(self):
+        screener = Screener(SYMBOLS, self.connection, sma_criteria, start_datetime=START,
+                            lookback=100, processes=2)
+        results = screener.run()
+        self.assertEqual(list(results['symbol']), self.expected())
+        self.assertEqual(screener.missing, [])
+
+    def test_bounded_load(self):
+        self.connection = RecordingConnection(bars=500)
+        first = self.connection.get_data('SYM0').index[-21]
+        self.connection.loads = []
+        symbols = ['SYM0', 'SYM1', 'GAPPED'] + SYMBOLS[2:]
+        screener = Screener(symbols, self.connection, sma_criteria, start_datetime=START,
+                            processes=1)
+        results = screener.run()
+        # The first symbol is loaded in full, the others from its last 21 bars
+        # unless they are missing bars since then
+        self.assertEqual(self.connection.loads[:5], [('SYM0', START, 500), ('SYM0', first, 21),
+                                                     ('SYM1', first, 21), ('GAPPED', first, 5),
+                                                     ('GAPPED', START, 475)])
+        self.assertTrue(all(bars == 21 for _, _, bars in self.connection.loads[5:]))
+        self.assertEqual(list(results['symbol']), self.expected(symbols))
+        # Only once
+        self.connection.loads = []
+        self.assertEqual(list(screener.run()['symbol']), self.expected(symbols))
+        self.assertEqual(self.connection.loads[:4], [('SYM0', first, 21), ('SYM1', first, 21),
+                                                     ('GAPPED', first, 5), ('GAPPED', START, 475)])
+        # The lookback is worked out without loading any bar
+        self.connection.loads = []
+        screener = Screener(symbols, self.connection, sma_criteria, start_datetime=START,
+                            processes=1)
+        self.assertEqual(screener._required_bars(), 21)
+        self.assertEqual(self.connection.loads, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,16 @@
+import os
+import tempfile
 import unittest
 import datetime
 import numpy as np
 import pandas as pd
-from testing_data import DummyDataConnection
+from testing_data import DummyDataConnection, DummyCriteria
 from nowtrade import symbol_list, data_connection, dataset, technical_indicator, \
                      criteria, criteria_group, trading_profile, trading_amount, \
                      trading_fee, report, strategy
 from nowtrade.report import InvalidExit
-from nowtrade.action import Long, Short, LongExit, ShortExit, SHORT_EXIT
+from nowtrade.action import Long, Short, LongExit, ShortExit, SHORT_EXIT, LONG, LONG_EXIT, \
+                            NO_ACTION
 
 class TestStrategy(unittest.TestCase):
     def setUp(self):
@@ -195,6 +198,38 @@ class TestStrategy(unittest.TestCase):
         self.assertEqual(strat.realtime_data_frame.iloc[4]['ACTIONS_MSFT'], -1)
         self.assertEqual(strat.realtime_data_frame.iloc[5]['ACTIONS_MSFT'], 0)
 
+    def test_trailing_stop_every_trade(self):
+        synthetic = dataset.Dataset(self.sl, data_connection.SyntheticConnection(bars=500, volatility=0.01),
+                                    None, None, 0)
+        synthetic.load_data()
+        sma = technical_indicator.SMA(self.symbol.close, 5)
+        synthetic.add_technical_indicator(sma)
+        trailing_stop = criteria.TrailingStop(self.symbol, 1)
+        groups = [criteria_group.CriteriaGroup([criteria.Above(self.symbol.close, sma)], Long(), self.symbol),
+                  criteria_group.CriteriaGroup([trailing_stop], LongExit(), self.symbol)]
+        tp = trading_profile.TradingProfile(10000, trading_amount.StaticAmount(5000), trading_fee.StaticFee(0))
+        strat = strategy.Strategy(synthetic, groups, tp)
+        strat.simulate()
+        self.assertTrue(strat.report.overview()['trades'] > 10)
+        # Every trade exits on the bar after its change first falls below its own stop
+        actions = strat.realtime_data_frame['ACTIONS_MSFT'].values
+        changes = strat.realtime_data_frame['CHANGE_VALUE_MSFT'].values
+        for entry in np.flatnonzero(actions == LONG):
+            stop = -1
+            exit_bar = entry + 1
+            while exit_bar < len(actions) and changes[exit_bar - 1] >= stop:
+                stop = max(stop, changes[exit_bar - 1] - 1)
+                exit_bar += 1
+            if exit_bar < len(actions):
+                self.assertEqual(actions[exit_bar], LONG_EXIT)
+                self.assertEqual(list(actions[entry + 1:exit_bar]), [NO_ACTION] * (exit_bar - entry - 1))
+        # The stop left over by the last trade does not change the next simulation
+        pretty_overview = strat.report.pretty_overview()
+        for mode in ['event', 'vectorized']:
+            strat = strategy.Strategy(synthetic, groups, tp)
+            strat.simulate(mode=mode)
+            self.assertEqual(strat.report.pretty_overview(), pretty_overview)
+
     def test_trailing_stop_short_strategy(self):
         enter_crit = criteria.Above(self.symbol.close, 25.88)
         exit_crit = criteria.TrailingStop(self.symbol, -0.2)
@@ -236,5 +271,274 @@ class TestStrategy(unittest.TestCase):
         self.assertEqual(next_action['action'], SHORT_EXIT)
         self.assertEqual(next_action['enter_on'], 'OPEN')
 
+    def _vectorized_strategies(self):
+        sma2 = technical_indicator.SMA(self.symbol.close, 2)
+        sma3 = technical_indicator.SMA(self.symbol.close, 3)
+        self.d.add_technical_indicator(sma2)
+        self.d.add_technical_indicator(sma3)
+        tp = trading_profile.TradingProfile(10000, trading_amount.StaticAmount(5000), trading_fee.StaticFee(5))
+        return [
+            [criteria_group.CriteriaGroup([criteria.Above(self.symbol.close, 25.88)], Long(), self.symbol),
+             criteria_group.CriteriaGroup([criteria.BarsSinceLong(self.symbol, 2)], LongExit(), self.symbol)],
+            [criteria_group.CriteriaGroup([criteria.Above(self.symbol.close, 25.88)], Short(), self.symbol),
+             criteria_group.CriteriaGroup([criteria.TrailingStop(self.symbol, 0.2, short=True)], ShortExit(), self.symbol)],
+            [criteria_group.CriteriaGroup([criteria.CrossingBelow(sma2, sma3)], Long(), self.symbol),
+             criteria_group.CriteriaGroup([criteria.Below(self.symbol.close, sma2)], Short(), self.symbol),
+             criteria_group.CriteriaGroup([criteria.StopLoss(self.symbol, 0.1)], LongExit(), self.symbol),
+             criteria_group.CriteriaGroup([criteria.InRange(self.symbol.close, 25, 26)], ShortExit(), self.symbol)]], tp
+
+    def test_vectorized_strategy(self):
+        groups_list, tp = self._vectorized_strategies()
+        for groups in groups_list:
+            strat = strategy.Strategy(self.d, groups, tp)
+            strat.simulate()
+            event_overview = strat.report.overview()
+            event_pretty_overview = strat.report.pretty_overview()
+            event_data_frame = strat.realtime_data_frame
+            event_upcoming_actions = strat.upcoming_actions
+            strat = strategy.Strategy(self.d, groups, tp)
+            strat.simulate(mode='vectorized')
+            vectorized_overview = strat.report.overview()
+            self.assertEqual(strat.upcoming_actions, event_upcoming_actions)
+            self.assertEqual(vectorized_overview['trades'], event_overview['trades'])
+            self.assertEqual(strat.report.pretty_overview(), event_pretty_overview)
+            self.assertEqual(vectorized_overview.get('net_profit'), event_overview.get('net_profit'))
+            self.assertEqual(vectorized_overview['ongoing_trades'], event_overview['ongoing_trades'])
+            for column in event_data_frame.columns:
+                self.assertTrue(np.allclose(strat.realtime_data_frame[column], event_data_frame[column], equal_nan=True))
+        with self.assertRaises(strategy.InvalidSimulationMode):
+            strat.simulate(mode='invalid')
+
+    def test_strategy_batch(self):
+        groups_list, tp = self._vectorized_strategies()
+        pretty_overviews = []
+        data_frames = []
+        for groups in groups_list:
+            strat = strategy.Strategy(self.d, groups, tp)
+            strat.simulate()
+            pretty_overviews.append(strat.report.pretty_overview())
+            data_frames.append(strat.realtime_data_frame)
+        strategies = [strategy.Strategy(self.d, groups, tp) for groups in groups_list]
+        batch = strategy.StrategyBatch(strategies)
+        batch.simulate()
+        for i, strat_report in enumerate(batch.reports()):
+            self.assertEqual(strat_report.pretty_overview(), pretty_overviews[i])
+            for column in data_frames[i].columns:
+                self.assertTrue(np.allclose(strategies[i].realtime_data_frame[column],
+                                            data_frames[i][column], equal_nan=True))
+        # Market data is shared
+        self.assertTrue(np.may_share_memory(strategies[0].bars.columns['MSFT_Close'],
+                                            strategies[1].bars.columns['MSFT_Close']))
+        self.assertFalse(np.may_share_memory(strategies[0].bars.columns['ACTIONS_MSFT'],
+                                             strategies[1].bars.columns['ACTIONS_MSFT']))
+        other_dataset = dataset.Dataset(self.sl, self.dc, None, None, 0)
+        other_dataset.load_data()
+        with self.assertRaises(strategy.InvalidStrategyBatch):
+            strategy.StrategyBatch([strategies[0], strategy.Strategy(other_dataset, [], tp)]).simulate()
+
+    def test_strategy_batch_shared_criteria(self):
+        _, tp = self._vectorized_strategies()
+        synthetic = dataset.Dataset(self.sl, data_connection.SyntheticConnection(bars=500, volatility=0.01),
+                                    None, None, 0)
+        synthetic.load_data()
+        sma = technical_indicator.SMA(self.symbol.close, 5)
+        synthetic.add_technical_indicator(sma)
+        # Strategies of a batch can share criteria, stateful or not
+        for exit_criteria in [criteria.BarsSinceLong(self.symbol, 3),
+                              criteria.ForBars(criteria.InMarket(self.symbol), 4)]:
+            groups_list = [[criteria_group.CriteriaGroup([criteria.Above(self.symbol.close, sma)], Long(), self.symbol),
+                            criteria_group.CriteriaGroup([exit_criteria], LongExit(), self.symbol)],
+                           [criteria_group.CriteriaGroup([criteria.Below(self.symbol.close, sma)], Long(), self.symbol),
+                            criteria_group.CriteriaGroup([exit_criteria], LongExit(), self.symbol)]]
+            pretty_overviews = []
+            for groups in groups_list:
+                strat = strategy.Strategy(synthetic, groups, tp)
+                strat.simulate()
+                pretty_overviews.append(strat.report.pretty_overview())
+            self.assertNotEqual(pretty_overviews[0], pretty_overviews[1])
+            batch = strategy.StrategyBatch([strategy.Strategy(synthetic, groups, tp) for groups in groups_list])
+            batch.simulate()
+            self.assertEqual([strat_report.pretty_overview() for strat_report in batch.reports()],
+                             pretty_overviews)
+
+    def test_simulate_again_on_new_data(self):
+        _, tp = self._vectorized_strategies()
+        synthetic = dataset.Dataset(self.sl, data_connection.SyntheticConnection(bars=400, volatility=0.01),
+                                    None, None, 0)
+        synthetic.load_data()
+        sma = technical_indicator.SMA(self.symbol.close, 5)
+        synthetic.add_technical_indicator(sma)
+        datasets = []
+        for bars in [slice(None, 200), slice(200, None)]:
+            datasets.append(dataset.Dataset(self.sl, self.dc, None, None, 0))
+            datasets[-1].data_frame = synthetic.data_frame[bars]
+        def groups(exit_criteria):
+            return [criteria_group.CriteriaGroup([criteria.Above(self.symbol.close, sma)], Long(), self.symbol),
+                    criteria_group.CriteriaGroup([exit_criteria], LongExit(), self.symbol)]
+        # Stateful criteria start over on every simulation
+        for exit_criteria in [lambda: criteria.BarsSinceLong(self.symbol, 3),
+                              lambda: criteria.ForBars(criteria.InMarket(self.symbol), 4)]:
+            for mode in ['event', 'vectorized']:
+                strat = strategy.Strategy(datasets[1], groups(exit_criteria()), tp)
+                strat.simulate(mode)
+                pretty_overview = strat.report.pretty_overview()
+                shared_groups = groups(exit_criteria())
+                strategy.Strategy(datasets[0], shared_groups, tp).simulate(mode)
+                strat = strategy.Strategy(datasets[1], shared_groups, tp)
+                strat.simulate(mode)
+                self.assertEqual(strat.report.pretty_overview(), pretty_overview)
+
+    def test_bar_window(self):
+        data_frame = self.d.data_frame
+        window = strategy._BarWindow(dict((column, data_frame[column].values) for column in data_frame),
+                                     data_frame.index.values)
+        window.end = 5
+        self.assertEqual(len(window), 5)
+        self.assertTrue(np.array_equal(window['MSFT_Close'], data_frame['MSFT_Close'].values[:5]))
+        last_bars = window[-2:]
+        self.assertEqual(len(last_bars), 2)
+        self.assertTrue(np.array_equal(last_bars['MSFT_Close'], data_frame['MSFT_Close'].values[3:5]))
+        self.assertTrue(np.array_equal(last_bars.index, data_frame.index.values[3:5]))
+        self.assertEqual(len(last_bars[:1]), 1)
+        self.assertEqual(last_bars[:1]['MSFT_Close'][0], data_frame['MSFT_Close'][3])
+        self.assertEqual(len(window[-10:]), 5)
+
+    def test_resume_strategy(self):
+        groups_list, tp = self._vectorized_strategies()
+        for i, groups in enumerate(groups_list):
+            strat = strategy.Strategy(self.d, groups, tp)
+            strat.simulate()
+            full_pretty_overview = strat.report.pretty_overview()
+            full_data_frame = strat.realtime_data_frame
+            partial_dataset = dataset.Dataset(self.sl, self.dc, None, None, 0)
+            partial_dataset.data_frame = self.d.data_frame[:5]
+            strat = strategy.Strategy(partial_dataset, groups, tp)
+            strat.simulate(mode='vectorized' if i else 'event')
+            strat.report.overview()
+            if i:
+                strat = strategy.load(strat.save(), self.d)
+            else:
+                file_handle, filename = tempfile.mkstemp()
+                os.close(file_handle)
+                strat.save_to_file(filename)
+                strat = strategy.load_from_file(filename, self.d)
+                os.remove(filename)
+            self.assertEqual(len(strat.realtime_data_frame), 5)
+            strat.resume()
+            self.assertEqual(strat.report.pretty_overview(), full_pretty_overview)
+            for column in full_data_frame.columns:
+                self.assertTrue(np.allclose(strat.realtime_data_frame[column],
+                                            full_data_frame[column], equal_nan=True))
+
+    def test_run_strategy(self):
+        groups_list, tp = self._vectorized_strategies()
+        raw_data_frame = self.d.data_frame[['MSFT_Open', 'MSFT_High', 'MSFT_Low', 'MSFT_Close',
+                                            'MSFT_Volume', 'MSFT_Adj Close']]
+        for groups in groups_list:
+            strat = strategy.Strategy(self.d, groups, tp)
+            strat.simulate()
+            pretty_overview = strat.report.pretty_overview()
+            actions = strat.realtime_data_frame['ACTIONS_MSFT']
+            strat = strategy.Strategy(self.d, groups, tp)
+            # Chunks of bars, a single bar and bars holding the indicators
+            stream = iter([raw_data_frame[:3], raw_data_frame.iloc[3], self.d.data_frame[4:]])
+            emitted = list(strat.run(stream))
+            self.assertTrue(len(emitted) > 0)
+            for timestamp, symbol_actions in emitted:
+                position = actions.index.get_loc(timestamp) + 1
+                if position < len(actions):
+                    self.assertEqual(symbol_actions['MSFT']['action'], actions[position])
+            self.assertEqual(len(emitted), len(actions[actions != 0]) + \
+                                           int(emitted[-1][0] == actions.index[-1]))
+            self.assertEqual(strat.report.pretty_overview(), pretty_overview)
+            self.assertEqual(strat.bars.max_bars, strat._get_max_bars())
+
+    def test_run_strategy_recursive_indicators(self):
+        synthetic = dataset.Dataset(self.sl, data_connection.SyntheticConnection(bars=800, volatility=0.01),
+                                    None, None, 0)
+        synthetic.load_data()
+        close = self.symbol.close
+        ema = technical_indicator.EMA(close, 30)
+        rsi = technical_indicator.RSI(close, 14)
+        synthetic.add_technical_indicator(ema)
+        synthetic.add_technical_indicator(rsi)
+        tp = trading_profile.TradingProfile(10000, trading_amount.StaticAmount(5000), trading_fee.StaticFee(5))
+        groups = [criteria_group.CriteriaGroup([criteria.Above(close, ema), criteria.Below(rsi, 60)],
+                                               Long(), self.symbol),
+                  criteria_group.CriteriaGroup([criteria.Below(close, ema), criteria.IsLong(self.symbol)],
+                                               LongExit(), self.symbol)]
+        strat = strategy.Strategy(synthetic, groups, tp)
+        strat.simulate()
+        pretty_overview = strat.report.pretty_overview()
+        strat = strategy.Strategy(synthetic, groups, tp)
+        raw_data_frame = synthetic.data_frame[['MSFT_Open', 'MSFT_High', 'MSFT_Low', 'MSFT_Close',
+                                               'MSFT_Volume', 'MSFT_Adj Close']]
+        # One bar at a time, only the last few bars are kept
+        list(strat.run(raw_data_frame.iloc[i] for i in range(len(raw_data_frame))))
+        self.assertTrue(strat.bars.max_bars < 40)
+        self.assertEqual(strat.report.pretty_overview(), pretty_overview)
+        for column in [ema.value, rsi.value]:
+            self.assertTrue(np.allclose(strat.realtime_data_frame[column],
+                                        synthetic.data_frame[column][-strat.bars.max_bars:]))
+        # The streaming state of the dataset's indicators is left alone
+        self.assertEqual(ema.streamed, None)
+
+    def test_run_strategy_dx(self):
+        synthetic = dataset.Dataset(self.sl, data_connection.SyntheticConnection(bars=500, volatility=0.01),
+                                    None, None, 0)
+        synthetic.load_data()
+        close = self.symbol.close
+        dx = technical_indicator.DX(self.symbol, 14)
+        sma = technical_indicator.SMA(close, 10)
+        synthetic.add_technical_indicator(dx)
+        synthetic.add_technical_indicator(sma)
+        tp = trading_profile.TradingProfile(10000, trading_amount.StaticAmount(5000), trading_fee.StaticFee(5))
+        groups = [criteria_group.CriteriaGroup([criteria.Above(dx, 25), criteria.Above(close, sma)],
+                                               Long(), self.symbol),
+                  criteria_group.CriteriaGroup([criteria.Below(dx, 20), criteria.IsLong(self.symbol)],
+                                               LongExit(), self.symbol)]
+        strat = strategy.Strategy(synthetic, groups, tp)
+        strat.simulate()
+        pretty_overview = strat.report.pretty_overview()
+        strat = strategy.Strategy(synthetic, groups, tp)
+        raw_data_frame = synthetic.data_frame[['MSFT_Open', 'MSFT_High', 'MSFT_Low', 'MSFT_Close',
+                                               'MSFT_Volume', 'MSFT_Adj Close']]
+        # Chunks of a few bars
+        list(strat.run(raw_data_frame[i:i + 7] for i in range(0, len(raw_data_frame), 7)))
+        self.assertTrue(strat.bars.max_bars < 20)
+        self.assertEqual(strat.report.pretty_overview(), pretty_overview)
+        for column in [dx.value, sma.value]:
+            self.assertTrue(np.allclose(strat.realtime_data_frame[column],
+                                        synthetic.data_frame[column][-strat.bars.max_bars:]))
+
+    def test_bounded_strategy(self):
+        groups_list, tp = self._vectorized_strategies()
+        for groups in groups_list:
+            strat = strategy.Strategy(self.d, groups, tp)
+            strat.simulate()
+            unbounded_pretty_overview = strat.report.pretty_overview()
+            unbounded_data_frame = strat.realtime_data_frame
+            strat = strategy.Strategy(self.d, groups, tp, bounded=True)
+            strat.simulate()
+            self.assertEqual(strat.report.pretty_overview(), unbounded_pretty_overview)
+            self.assertEqual(strat.bars.max_bars, strat._get_max_bars())
+            self.assertTrue(len(strat.realtime_data_frame) < len(unbounded_data_frame))
+            bounded_data_frame = strat.realtime_data_frame
+            for column in unbounded_data_frame.columns:
+                self.assertTrue(np.allclose(bounded_data_frame[column],
+                                            unbounded_data_frame[column][-len(bounded_data_frame):],
+                                            equal_nan=True))
+        # Criteria requiring every bar
+        groups = [criteria_group.CriteriaGroup([DummyCriteria(False)], Long(), self.symbol)]
+        strat = strategy.Strategy(self.d, groups, tp, bounded=True)
+        with self.assertRaises(strategy.UnboundedStrategy):
+            strat.simulate()
+        with self.assertRaises(strategy.UnboundedStrategy):
+            list(strat.run([self.d.data_frame]))
+        strat = strategy.Strategy(self.d, groups, tp, bounded=True, max_bars=3)
+        strat.simulate()
+        self.assertEqual(strat.bars.max_bars, 3)
+        self.assertEqual(len(strat.realtime_data_frame), 3)
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 import numpy as np
 import pandas as pd
-from nowtrade import technical_indicator
+import talib
+from nowtrade import technical_indicator, data_connection
 from nowtrade.neural_network import NeuralNetwork
 from nowtrade.ensemble import Ensemble
 from testing_data import msft_data, msft_close_name
@@ -22,6 +23,25 @@ class TestTechnicalIndicator(unittest.TestCase):
     def setUp(self):
         self.data = pd.DataFrame([[0, 5, 10.0], [5, 4, 12.0], [10, 3, 8.0], [15, 2, 6.0], [20, 1, 9.0], [25, 0, 10.0]], columns=['one', 'two', 'three'])
 
+class TestPair(TestTechnicalIndicator):
+    def test_pair(self):
+        data = self.data.copy()
+        ti = technical_indicator.Pair('three', 'two', 3)
+        ti.results(data)
+        self.assertTrue(np.isnan(data[ti.hedge_ratio][1]))
+        slope, intercept = np.polyfit(data['two'][1:4], data['three'][1:4], 1)
+        self.assertAlmostEqual(data[ti.hedge_ratio][3], slope)
+        self.assertAlmostEqual(data[ti.spread][3], 6.0 - slope * 2)
+        self.assertAlmostEqual(data[ti.value][3], 6.0 - slope * 2 - intercept)
+        spread = data[ti.spread]
+        zscore = (spread - pd.rolling_mean(spread, 3)) / pd.rolling_std(spread, 3)
+        self.assertTrue(np.allclose(data[ti.zscore], zscore, equal_nan=True))
+        # Not enough data
+        data = self.data.copy()
+        ti = technical_indicator.Pair('three', 'two', 10)
+        ti.results(data)
+        self.assertTrue(np.isnan(data[ti.value]).all())
+
 class TestAddition(TestTechnicalIndicator):
     def test_addition(self):
         data = msft_data.copy()
@@ -170,6 +190,10 @@ class TestBBANDS(TestTechnicalIndicator):
         self.assertAlmostEqual(data[ti.value][7], 24.90451697)
         self.assertAlmostEqual(data[ti.middle][7], 24.90451697)
         self.assertAlmostEqual(data[ti.lower][7], 24.69451697)
+        # First value on the 7th bar
+        self.assertEqual(ti.warm_up, 7)
+        sma = technical_indicator.BBANDS('MSFT_Close', 5, ma_type=talib.MA_Type.SMA)
+        self.assertEqual(sma.warm_up, 5)
 
 class TestDX(TestTechnicalIndicator):
     def test_dx(self):
@@ -232,6 +256,67 @@ class TestSTOCHF(TestTechnicalIndicator):
         self.assertAlmostEqual(data[ti.fastk][4], 2.95857988)
         self.assertAlmostEqual(data[ti.fastd][4], 7.96783955)
 
+class TestUpdate(TestTechnicalIndicator):
+    def test_update(self):
+        data = data_connection.SyntheticConnection(bars=300, volatility=0.01).get_data('SYN')
+        rsi = technical_indicator.RSI('SYN_Close', 14)
+        indicators = [technical_indicator.SMA('SYN_Close', 10),
+                      technical_indicator.EMA('SYN_Close', 10), rsi,
+                      technical_indicator.ATR('SYN', 14),
+                      technical_indicator.Max('SYN_High', 7),
+                      technical_indicator.Min('SYN_Low', 7),
+                      technical_indicator.BBANDS('SYN_Close', 5),
+                      technical_indicator.BBANDS('SYN_Close', 20, ma_type=talib.MA_Type.SMA),
+                      technical_indicator.STOCH('SYN'),
+                      technical_indicator.STOCH('SYN', 14, 3, talib.MA_Type.EMA,
+                                                5, talib.MA_Type.T3),
+                      technical_indicator.ADX('SYN', 14),
+                      technical_indicator.DX('SYN', 14),
+                      technical_indicator.STOCHF('SYN', 5, 3, talib.MA_Type.EMA),
+                      technical_indicator.STOCHF('SYN', 14, 5, talib.MA_Type.T3),
+                      technical_indicator.SMA(rsi.value, 5),
+                      technical_indicator.Addition('SYN_Close', 1)]
+        batch = data.copy()
+        for ti in indicators:
+            ti.results(batch)
+        streamed = data[:50].copy()
+        for ti in indicators:
+            ti.update(streamed)
+        for bar in range(50, len(data)):
+            streamed = streamed.append(data[bar:bar + 1])
+            for ti in indicators:
+                ti.update(streamed)
+            self.assertEqual(indicators[0].streamed, data.index[bar])
+        self.assertEqual(sorted(streamed.columns), sorted(batch.columns))
+        for column in batch.columns:
+            self.assertTrue(np.allclose(streamed[column], batch[column], equal_nan=True), column)
+        # Starts over when the last bar streamed is gone
+        streamed = data[:20].copy()
+        indicators[0].update(streamed)
+        self.assertTrue(np.allclose(streamed[indicators[0].value], batch[indicators[0].value][:20],
+                                    equal_nan=True))
+
+    def test_update_new_bars(self):
+        data = data_connection.SyntheticConnection(bars=100, volatility=0.01).get_data('SYN')
+        dx = technical_indicator.DX('SYN', 14)
+        batch = data.copy()
+        dx.results(batch)
+        # Nothing streamed yet
+        self.assertFalse(dx.update_new_bars(data[:50].copy()))
+        streamed = [data[:50].copy()]
+        dx.update(streamed[0])
+        for bar in range(50, len(data)):
+            streamed.append(data[bar:bar + 1].copy())
+            self.assertTrue(dx.update_new_bars(streamed[-1]))
+        self.assertTrue(np.allclose(pd.concat(streamed)[dx.value], batch[dx.value], equal_nan=True))
+        # Bars already streamed
+        self.assertFalse(dx.update_new_bars(data[-1:].copy()))
+        # No streaming state
+        bbands = technical_indicator.BBANDS('SYN_Close', 10, ma_type=talib.MA_Type.KAMA)
+        self.assertTrue(bbands.recursive)
+        self.assertFalse(bbands.streams())
+        self.assertFalse(bbands.update_new_bars(data[:50].copy()))
+
 class TestNeuralNetwork(TestTechnicalIndicator):
     def test_neural_network(self):
         data = msft_data.copy()
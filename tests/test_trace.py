@@ -0,0 +1,81 @@
+"""
+Tests for the NowTrade Trace object.
+"""
+import unittest
+import numpy as np
+from testing_data import DummyDataConnection
+from nowtrade import symbol_list, dataset, criteria, criteria_group, \
+                     trading_profile, trading_amount, trading_fee, strategy
+from nowtrade.trace import Trace
+from nowtrade.action import Long, LongExit
+
+class TestTrace(unittest.TestCase):
+    """
+    Test the Trace object.
+    """
+    def setUp(self):
+        self.sl = symbol_list.SymbolList(['MSFT'])
+        self.symbol = self.sl.get('msft')
+        self.d = dataset.Dataset(self.sl, DummyDataConnection(), None, None, 0)
+        self.d.load_data()
+        self.index = self.d.data_frame.index
+
+    def get_strategy(self):
+        enter_crit_group = criteria_group.CriteriaGroup([criteria.Above(self.symbol.close, 25.88)],
+                                                        Long(), self.symbol)
+        exit_crit_group = criteria_group.CriteriaGroup([criteria.BarsSinceLong(self.symbol, 2)],
+                                                       LongExit(), self.symbol)
+        tp = trading_profile.TradingProfile(10000, trading_amount.StaticAmount(5000),
+                                            trading_fee.StaticFee(0))
+        return strategy.Strategy(self.d, [enter_crit_group, exit_crit_group], tp)
+
+    def test_trace(self):
+        trace = Trace(capacity=2)
+        group = criteria_group.CriteriaGroup([criteria.IsMonth(i) for i in range(1, 11)],
+                                             Long(), self.symbol)
+        for datetime in self.index:
+            trace.add_bar(datetime)
+            trace.record(group, [True] * 2 + [False] * 9, [True, False] + [False] * 9)
+        trace.set(group, 3, 10, True)
+        self.assertEqual(len(trace), 8)
+        self.assertEqual(trace.nbytes, 8 * 2 * 2) # 11 criteria fit in 2 bytes
+        self.assertEqual(str(trace), 'Trace(bars=8, criteria_groups=1)')
+        outcomes = trace.outcomes(group, self.index[3])
+        self.assertEqual([status for _, status in outcomes], [True, False] + [None] * 8 + [True])
+        self.assertEqual(outcomes[1][0], group.criteria_list[1])
+        failing = trace.failing(self.index[1], self.index[2])
+        self.assertEqual(len(failing), 2)
+        self.assertEqual(failing[0], (self.index[1], group, [group.criteria_list[1]]))
+        self.assertEqual(len(trace.failing(self.index[0], self.index[-1], crit_group=group)), 8)
+        with self.assertRaises(KeyError):
+            trace.failing('2010-06-05')
+
+    def test_strategy_trace(self):
+        strat = self.get_strategy()
+        trace = strat.enable_trace()
+        strat.simulate()
+        enter_crit_group = strat.criteria_groups[0]
+        above, not_in_market = enter_crit_group.criteria_list
+        self.assertEqual(len(trace), len(self.index))
+        # Close of 24.79 on 2010-06-08
+        self.assertEqual(trace.failing(self.index[-2], crit_group=enter_crit_group),
+                         [(self.index[-2], enter_crit_group, [above])])
+        # In the market since the 2010-06-02 open
+        self.assertFalse(dict(trace.outcomes(enter_crit_group, self.index[2]))[not_in_market])
+        # Every criteria is applied when the group passes
+        self.assertEqual(trace.outcomes(enter_crit_group, self.index[0]),
+                         [(above, True), (not_in_market, True)])
+        vectorized = self.get_strategy()
+        vectorized_trace = vectorized.enable_trace()
+        vectorized.simulate(mode='vectorized')
+        self.assertEqual(len(vectorized_trace), len(self.index))
+        # Criteria that are not path dependent are evaluated on every bar
+        vectorized_group = vectorized.criteria_groups[0]
+        self.assertTrue(np.all([dict(vectorized_trace.outcomes(vectorized_group, datetime))
+                                [vectorized_group.criteria_list[0]] is not None \
+                                for datetime in self.index]))
+        self.assertFalse(dict(vectorized_trace.outcomes(vectorized_group, self.index[2]))
+                         [vectorized_group.criteria_list[1]])
+
+if __name__ == "__main__":
+    unittest.main()